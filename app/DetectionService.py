@@ -0,0 +1,410 @@
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from .detector.YoloDetector import YoloDetector
+from .detector.DetectionPipeline import DetectionPipeline
+from .utils.roi import ROI_CONFIG_FILE, load_roi_config
+from .utils.io_control import SERIAL_PORT, IOController, create_device
+from .utils.clip_recorder import DEFECTS_DIR, ClipRecorder, FrameRingBuffer, describe_detections
+from .utils.metrics import MetricsServer, record_batch, registry
+from .utils.camera_config import load_camera_config
+from .utils.capture_thread import CaptureThread
+from .utils.frame_source import open_capture
+from .utils.shm_inference import InferenceProcessPool
+
+# 服务配置的默认值，配置文件中同名的键覆盖这些值；摄像头相关的键见load_camera_config
+SERVICE_DEFAULTS = {
+    "model": "best.pt",
+    "backend": "torch",
+    "conf": 0.25,
+    "imgsz": 640,
+    "latency_target_ms": None,
+    "min_imgsz": 320,
+    "max_imgsz": 1280,
+    "min_batch": None,
+    "processes": 0,
+    "threads": None,
+    "tile": None,
+    "tile_overlap": 0.2,
+    "tile_iou": 0.5,
+    "change_threshold": 2.0,
+    "roi_config": ROI_CONFIG_FILE,
+    "detect_every": 1,
+    "confirm_frames": 1,
+    "io_device": "auto",
+    "serial_port": SERIAL_PORT,
+    "clip_pre": 3.0,
+    "clip_post": 2.0,
+    "metrics_port": None,
+    "stats_interval": 10.0,
+    "realtime": True,
+    "loop": True,
+}
+
+
+def load_service_config(path):
+    """
+    读取无界面检测服务的配置
+
+    配置文件为JSON，除SERVICE_DEFAULTS中的键外，还包含与摄像头配置文件相同的
+    cameras、policy、max_batch、deadline_ms
+
+    参数:
+        path: 配置文件路径
+
+    返回:
+        配置字典，摄像头配置在"camera_config"键下
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    unknown = set(raw) - set(SERVICE_DEFAULTS) - {"cameras", "policy", "max_batch", "deadline_ms"}
+    if unknown:
+        raise ValueError(f"配置文件中有无法识别的键: {', '.join(sorted(unknown))}")
+
+    config = dict(SERVICE_DEFAULTS)
+    config.update({key: value for key, value in raw.items() if key in SERVICE_DEFAULTS})
+    config["camera_config"] = load_camera_config(path)
+    return config
+
+
+class EventLog:
+    """
+    结构化日志，每个事件写成一行JSON，便于日志采集系统解析
+
+    所有事件都带有time（ISO时间）和event（事件类型）字段
+    """
+
+    def __init__(self, path=None):
+        """
+        参数:
+            path: 日志文件路径，为None时写到标准输出
+        """
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.stream = open(path, 'a', encoding='utf-8')
+        else:
+            self.stream = sys.stdout
+
+    def log(self, event, **fields):
+        """
+        写入一个事件
+
+        参数:
+            event: 事件类型
+            fields: 事件字段，必须可以序列化为JSON
+        """
+        record = {"time": datetime.datetime.now().isoformat(timespec="milliseconds"), "event": event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+class DetectionService:
+    """
+    无界面的实时检测服务
+
+    与MainWindow共用DetectionPipeline（变化门控/隔帧跟踪 -> 调度 -> 结果后处理），
+    不依赖PyQt：采集在CaptureThread中进行，推理在调用run()的线程中同步执行，
+    配置了processes时交给多进程推理池，run()的线程只负责提交批次和处理返回的结果；
+    确认的缺陷发送信号、后台保存片段并写入结构化日志。没有操作员确认，检测到缺陷后继续运行
+    """
+
+    POLL_INTERVAL = 0.005  # 没有待推理的画面时的等待时间（秒）
+    CLIP_BUFFER_SLACK = 5.0  # 环形缓冲区比缺陷片段多保留的时长（秒）
+
+    def __init__(self, config, event_log=None, start_time=None):
+        """
+        初始化服务，加载并预热模型
+
+        参数:
+            config: load_service_config()返回的配置
+            event_log: 结构化日志，为None时写到标准输出
+            start_time: 进程启动时的time.perf_counter()，用于统计启动耗时，为None时从创建服务开始计时
+        """
+        self.config = config
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.log = event_log or EventLog()
+        self.stop_event = threading.Event()
+
+        cameras = config["camera_config"]["cameras"]
+        self.camera_config = config["camera_config"]
+        self.camera_count = len(cameras)
+        self.rois = [camera["roi"] or roi for camera, roi in
+                     zip(cameras, load_roi_config(config["roi_config"], self.camera_count))]
+        # 变化门控、隔帧跟踪、推理调度和延迟控制与MainWindow共用同一条流水线
+        latency_target = config["latency_target_ms"] / 1000 if config["latency_target_ms"] else None
+        self.pipeline = DetectionPipeline(
+            self.camera_config, self.rois, config["change_threshold"], config["detect_every"],
+            config["confirm_frames"], config["processes"], config["imgsz"], latency_target,
+            config["min_imgsz"], config["max_imgsz"], config["min_batch"], on_latency_change=self.on_latency_change)
+        # 用单张和满批次的1280x720空白图像预热，第一批实际画面不再承担延迟初始化的开销
+        detector_args = {"model_path": config["model"], "conf_threshold": config["conf"],
+                         "backend": config["backend"], "imgsz": self.pipeline.imgsz,
+                         "tile_size": config["tile"], "tile_overlap": config["tile_overlap"],
+                         "tile_iou": config["tile_iou"]}
+        max_batch = self.pipeline.max_batch
+        warmup_batches = sorted({1, max_batch})
+        self.pool = None
+        self.jobs = {}  # 推理池中未返回的批次，{任务ID: (摄像头ID列表, 图像列表, 采集时间戳列表)}
+        if config["processes"] > 0:
+            self.pool = InferenceProcessPool(detector_args, config["processes"], config["threads"], max_batch,
+                                             warmup_batches=warmup_batches, rois=self.rois)
+            timings = self.pool.start()
+            self.detector = self.pool
+            load_time, warmup_time = timings["load"], timings["warmup"]
+        else:
+            load_start = time.perf_counter()
+            self.detector = YoloDetector(**detector_args)
+            load_time = time.perf_counter() - load_start
+            warmup_time = self.detector.warmup(warmup_batches, rois=self.rois)
+        self.pipeline.detector = self.detector
+        self.log.log("model_ready", model=config["model"], backend=self.detector.backend,
+                     processes=config["processes"], load_s=round(load_time, 2), warmup_s=round(warmup_time, 2))
+
+        self.clip_enabled = config["clip_pre"] + config["clip_post"] > 0
+        buffer_seconds = config["clip_pre"] + config["clip_post"] + self.CLIP_BUFFER_SLACK
+        self.frame_buffers = [FrameRingBuffer(buffer_seconds) if self.clip_enabled else None
+                              for _ in range(self.camera_count)]
+        self.captures = [None] * self.camera_count
+        self.capture_threads = [None] * self.camera_count
+
+        self.io_controller = None
+        self.clip_recorder = None
+        self.metrics_server = None
+
+        # 统计计数：每个统计周期内的新帧数，完成检测的帧数由流水线统计
+        self.frame_counts = [0] * self.camera_count
+        self.defect_count = 0
+        self.stats_time = time.time()
+
+    def start(self):
+        """
+        打开所有摄像头并启动后台线程
+
+        返回:
+            全部摄像头都打开时返回True
+        """
+        for i, camera in enumerate(self.camera_config["cameras"]):
+            capture = open_capture(camera["source"], camera["device"], self.config["realtime"], self.config["loop"])
+            if capture is None:
+                self.log.log("camera_error", camera=i + 1, source=camera["source"], device=camera["device"])
+                self.close()
+                return False
+            self.captures[i] = capture
+            buffer = self.frame_buffers[i]
+            thread = CaptureThread(capture, name=f"capture-{i}", camera=i + 1,
+                                   on_frame=buffer.push if buffer is not None else None)
+            thread.start()
+            self.capture_threads[i] = thread
+            self.log.log("camera_opened", camera=i + 1, source=camera["source"], device=camera["device"])
+
+        self.io_controller = IOController(create_device(self.config["io_device"], self.config["serial_port"]))
+        self.io_controller.start()
+        self.clip_recorder = ClipRecorder(DEFECTS_DIR, self.config["clip_pre"], self.config["clip_post"])
+        self.clip_recorder.start()
+        if self.config["metrics_port"] is not None:
+            try:
+                self.metrics_server = MetricsServer(registry, self.config["metrics_port"])
+                self.metrics_server.start()
+            except OSError as e:
+                self.log.log("metrics_error", error=str(e))
+                self.metrics_server = None
+
+        self.log.log("started", cameras=self.camera_count, backend=self.detector.backend,
+                     device=str(self.detector.device), policy=self.camera_config["policy"],
+                     metrics=self.metrics_server.address if self.metrics_server is not None else None,
+                     startup_s=round(time.perf_counter() - self.start_time, 2))
+        self.stats_time = time.time()
+        return True
+
+    def run(self):
+        """运行检测循环，直到stop()被调用"""
+        while not self.stop_event.is_set():
+            if not self.step():
+                self.stop_event.wait(self.POLL_INTERVAL)
+            if time.time() - self.stats_time >= self.config["stats_interval"]:
+                self.log_stats()
+
+    def step(self):
+        """
+        取各摄像头的新帧，推理调度器选出的一批画面并处理结果；
+        使用推理池时提交批次直到各检测进程都有任务，再处理已返回的结果
+
+        返回:
+            本次运行了推理或处理了推理结果时返回True
+        """
+        for i, thread in enumerate(self.capture_threads):
+            if self.pipeline.offer(i, *thread.latest()):
+                self.frame_counts[i] += 1
+        self.pipeline.expire()
+
+        if self.pool is not None:
+            return self.step_pool()
+
+        batch = self.pipeline.next_batch(1)
+        if batch is None:
+            return False
+        camera_ids, frames, timestamps, rois = batch
+
+        start_time = time.time()
+        try:
+            results = self.detector.detect_batch(frames, rois)
+        except Exception as e:
+            self.pipeline.release(camera_ids)
+            self.log.log("detection_error", cameras=[i + 1 for i in camera_ids], error=str(e))
+            return True
+        record_batch(registry, camera_ids, [result.speed for result in results], time.time() - start_time)
+        self.handle_results(camera_ids, frames, timestamps,
+                            [self.detector.to_detections(result) for result in results])
+        return True
+
+    def step_pool(self):
+        """
+        把流水线选出的批次提交给空闲的检测进程，再处理已返回的结果
+
+        返回:
+            本次提交了批次或处理了结果时返回True
+        """
+        active = False
+        while True:
+            batch = self.pipeline.next_batch(self.pool.capacity)
+            if batch is None:
+                break
+            camera_ids, frames, timestamps, rois = batch
+            try:
+                job_id = self.pool.submit(frames, rois)
+            except Exception as e:
+                self.pipeline.release(camera_ids)
+                self.log.log("detection_error", cameras=[i + 1 for i in camera_ids], error=str(e))
+                break
+            self.jobs[job_id] = (camera_ids, frames, timestamps)
+            active = True
+
+        # 所有检测进程都在推理时短暂等待结果，代替run()中的轮询等待
+        timeout = self.POLL_INTERVAL if len(self.jobs) >= self.pool.capacity else 0
+        while self.jobs:
+            message = self.pool.get_result(timeout=timeout)
+            if message is None:
+                break
+            timeout = 0
+            active = True
+            camera_ids, frames, timestamps = self.jobs.pop(message[1])
+            if message[0] == "error":
+                self.pipeline.release(camera_ids)
+                self.log.log("detection_error", cameras=[i + 1 for i in camera_ids], error=message[2])
+                continue
+            _, _, detections, speeds, elapsed = message
+            record_batch(registry, camera_ids, speeds, elapsed)
+            self.handle_results(camera_ids, frames, timestamps, detections)
+        return active
+
+    def handle_results(self, camera_ids, frames, timestamps, detections):
+        """
+        把一批检测结果交给流水线，处理新确认的缺陷
+
+        参数:
+            camera_ids: 摄像头ID列表
+            frames: 与camera_ids对应的图像列表
+            timestamps: 与camera_ids对应的采集时间戳列表
+            detections: 与camera_ids对应的检测数组列表
+        """
+        finished_time = time.time()
+        confirmed_detections = self.pipeline.finish_batch(camera_ids, frames, timestamps, detections)
+        for i, timestamp, confirmed in zip(camera_ids, timestamps, confirmed_detections):
+            if len(confirmed) > 0:
+                self.on_defect(i, timestamp, finished_time, confirmed)
+
+    def on_latency_change(self, change):
+        """
+        流水线按延迟目标调整了输入尺寸或批次大小时写入日志
+
+        参数:
+            change: LatencyController.observe()返回的调整内容
+        """
+        self.log.log("latency_adjust", target_ms=self.config["latency_target_ms"], p95_ms=change["p95_ms"],
+                     imgsz=list(change["imgsz"]), batch=list(change["batch"]))
+
+    def on_defect(self, camera_id, timestamp, finished_time, detections):
+        """
+        处理确认的缺陷：发送信号、后台保存片段、写入日志
+
+        参数:
+            camera_id: 摄像头ID
+            timestamp: 触发帧的采集时间戳
+            finished_time: 检测完成的时间戳
+            detections: 新确认的检测数组
+        """
+        self.defect_count += 1
+        self.io_controller.trigger(camera_id + 1)
+        if self.clip_enabled:
+            self.clip_recorder.record(camera_id, self.frame_buffers[camera_id], timestamp, detections,
+                                      self.detector.names)
+        self.log.log("defect", camera=camera_id + 1,
+                     capture_time=datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                     latency_ms=round((finished_time - timestamp) * 1000, 1),
+                     detections=describe_detections(detections, self.detector.names))
+
+    def log_stats(self):
+        """写入统计周期内各摄像头的采集帧率、检测帧率、丢弃和跳过的画面数"""
+        now = time.time()
+        elapsed = max(now - self.stats_time, 1e-6)
+        pipeline = self.pipeline
+        cameras = []
+        for i in range(self.camera_count):
+            end_to_end = registry.summary(camera=i + 1).get(("end_to_end", str(i + 1)))
+            cameras.append({
+                "camera": i + 1,
+                "fps": round(self.frame_counts[i] / elapsed, 2),
+                "detect_fps": round(pipeline.detect_counts[i] / elapsed, 2),
+                "dropped": pipeline.scheduler.dropped(i),
+                "skipped": pipeline.change_gates[i].skipped,
+                "tracked": pipeline.trackers[i].tracked,
+                "end_to_end_p95_ms": round(end_to_end["p95"] * 1000, 1) if end_to_end else None,
+            })
+        io_stats = self.io_controller.latency_stats() if self.io_controller is not None else None
+        self.log.log("stats", cameras=cameras, defects=self.defect_count, imgsz=pipeline.imgsz,
+                     batch=pipeline.scheduler.max_batch,
+                     io_p95_ms=round(io_stats["p95"], 2) if io_stats and io_stats["count"] else None,
+                     io_lost=io_stats["lost"] if io_stats else 0)
+
+        self.frame_counts = [0] * self.camera_count
+        pipeline.reset_counts()
+        self.stats_time = now
+
+    def stop(self):
+        """请求停止检测循环，可以在信号处理函数或其他线程中调用"""
+        self.stop_event.set()
+
+    def close(self):
+        """停止采集线程并释放摄像头，恢复IO电平，等待已提交的缺陷片段写完"""
+        for i, thread in enumerate(self.capture_threads):
+            if thread is not None:
+                thread.stop()
+                self.capture_threads[i] = None
+        for i, capture in enumerate(self.captures):
+            if capture is not None:
+                capture.release()
+                self.captures[i] = None
+        if self.io_controller is not None:
+            self.io_controller.stop()
+            self.io_controller = None
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop()
+            self.clip_recorder = None
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self.log.log("stopped", defects=self.defect_count)
@@ -6,24 +6,105 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, QTimer, pyqtSlot
 from PyQt5.QtGui import QPixmap, QImage, QFont
 from .components.CameraWidget import CameraWidget
-from .detector.YoloDetector import YoloDetector
-from .utils.io_control import send_low_signal
+from .detector.DetectionWorker import DetectionWorker
+from .detector.ProcessDetectionWorker import ProcessDetectionWorker
+from .detector.ModelLoader import ModelLoader
+from .detector.DetectionPipeline import DetectionPipeline
+from .utils.roi import ROI_CONFIG_FILE, load_roi_config
+from .utils.io_control import SERIAL_PORT, IOController, create_device
+from .utils.clip_recorder import DEFECTS_DIR, ClipRecorder
+from .utils.metrics import MetricsServer, registry
+from .utils.camera_config import CAMERA_CONFIG_FILE, load_camera_config
 import cv2
+import math
 import os
 import datetime
+import time
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    RENDER_INTERVAL_MS = 30  # 画面刷新间隔，约33FPS
+    DETECT_INTERVAL_MS = 30  # 提交检测的间隔，检测线程忙时跳过
+    STATUS_INTERVAL_MS = 1000  # 状态栏统计信息的刷新间隔
+    CLIP_BUFFER_SLACK = 5.0  # 环形缓冲区比缺陷片段多保留的时长（秒）
+    
+    def __init__(self, backend="torch", change_threshold=2.0, roi_config=ROI_CONFIG_FILE,
+                 tile_size=None, tile_overlap=0.2, tile_iou=0.5, sources=None, realtime=True, loop=True,
+                 io_device="auto", serial_port=SERIAL_PORT, clip_pre=3.0, clip_post=2.0,
+                 metrics_overlay=False, metrics_port=None, detect_interval=1, confirm_frames=1,
+                 camera_config=CAMERA_CONFIG_FILE, start_time=None, processes=0, threads=None,
+                 imgsz=640, latency_target=None, min_imgsz=320, max_imgsz=1280, min_batch=None):
+        """
+        初始化主窗口
+        
+        参数:
+            backend: 检测器推理后端，torch、onnxruntime、openvino或openvino-int8
+            change_threshold: 画面变化门控的平均灰度差阈值，画面变化低于该值时复用上一次检测结果，
+                              小于等于0时每帧都推理
+            roi_config: 各摄像头检测区域(ROI)配置文件，只在ROI内推理，不存在时检测整幅画面
+            tile_size: 切片推理的切片边长（像素），为None时整幅画面推理一次
+            tile_overlap: 相邻切片的重叠比例
+            tile_iou: 合并各切片检测框时NMS的IoU阈值
+            sources: 各摄像头的回放源列表（视频文件或图片目录），覆盖摄像头配置文件中的来源，某项为None时不覆盖
+            realtime: 回放源是否按帧率实时播放，False时尽可能快地读取，用于测试整条流水线的最大帧率
+            loop: 回放源播放到结尾后是否循环
+            io_device: 缺陷信号输出设备，auto、gpio、serial或loopback（不连接硬件，用于测试）
+            serial_port: 串口输出时使用的串口
+            clip_pre: 缺陷片段包含的触发前时长（秒）
+            clip_post: 缺陷片段包含的触发后时长（秒），两者都为0时不保存片段
+            metrics_overlay: 是否在每路画面上叠加显示各阶段的延迟统计
+            metrics_port: 本机Prometheus指标端点的端口，为None时不启动
+            detect_interval: 每路摄像头每隔多少帧运行一次完整模型，中间的帧用光流跟踪上一次的检测框
+            confirm_frames: 缺陷被连续检出多少次后才确认并暂停，1表示检出即确认
+            camera_config: 摄像头配置文件，指定摄像头数量、图像来源、推理调度策略、优先级和截止时间，
+                           不存在时使用4路摄像头
+            start_time: 进程启动时的time.perf_counter()，用于统计启动耗时，为None时从创建窗口开始计时
+            processes: 检测进程数，大于0时由多个检测进程同时推理不同的批次，图像经共享内存传递；
+                       0时在本进程的检测线程中推理
+            threads: 每个检测进程的推理线程数，为None时按CPU核数平均分配
+            imgsz: 推理输入尺寸，启用延迟目标时为初始尺寸
+            latency_target: 端到端延迟目标（秒），设置后按实测延迟在min_imgsz和max_imgsz之间自动调整输入尺寸，
+                            为None时输入尺寸固定
+            min_imgsz: 自动调整时的输入尺寸下限
+            max_imgsz: 自动调整时的输入尺寸上限
+            min_batch: 自动调整时的批次大小下限，输入尺寸已到下限仍超过目标时减小批次，为None时不调整批次大小
+        """
         super().__init__()
         self.setWindowTitle("铁链缺陷检测系统")
         self.setMinimumSize(1200, 800)
           # 初始化组件
         self.cameras = []
-        self.detector = YoloDetector(model_path="best.pt")
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.detector = None  # 模型在后台加载和预热，完成后才能开始检测
+        self.detection_worker = None
+        self.processes = processes
         self.running = False
         self.defect_detected = False
         self.defect_camera_id = -1  # 记录检测到缺陷的摄像头ID
-        self.current_frames = [None, None, None, None]
+        self.camera_config = load_camera_config(camera_config, sources)
+        self.camera_count = len(self.camera_config["cameras"])
+        self.current_frames = [None] * self.camera_count
+        self.current_detections = [None] * self.camera_count  # 每个摄像头最近一次的检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]
+        self.current_timestamps = [None] * self.camera_count  # 每个摄像头当前帧的采集时间戳
+        # 每个摄像头的检测区域，None表示整幅画面；摄像头配置中的roi优先于ROI配置文件
+        self.rois = [camera["roi"] or roi for camera, roi in
+                     zip(self.camera_config["cameras"], load_roi_config(roi_config, self.camera_count))]
+        # 变化门控、隔帧跟踪、推理调度和延迟控制都在与界面无关的流水线中，本窗口只负责显示和操作员交互
+        self.pipeline = DetectionPipeline(
+            self.camera_config, self.rois, change_threshold, detect_interval, confirm_frames, processes,
+            imgsz, latency_target, min_imgsz, max_imgsz, min_batch, on_latency_change=self.on_latency_change)
+        self.render_offset = 0  # 每次刷新画面时轮换起始摄像头，各路的显示延迟相同
+        self.realtime = realtime
+        self.loop = loop
+        self.clip_recorder = None
+        self.metrics_overlay = metrics_overlay
+        self.metrics_server = None
+        self.clip_enabled = clip_pre + clip_post > 0
+        # 缓冲区比片段多保留CLIP_BUFFER_SLACK秒，检测结果延迟到达或写入线程排队时触发前的图像不会被覆盖
+        self.buffer_seconds = clip_pre + clip_post + self.CLIP_BUFFER_SLACK if self.clip_enabled else 0
+        
+        # 帧率统计：每个状态刷新周期内显示的新帧数，完成检测的帧数由流水线统计
+        self.display_counts = [0] * self.camera_count
+        self.stats_time = time.time()
         
         # 设置中心部件
         self.central_widget = QWidget()
@@ -66,9 +147,43 @@ class MainWindow(QMainWindow):
         # 创建布局
         self.setup_ui()
         
-        # 初始化定时器
+        # 初始化缺陷记录写入线程，缺陷片段和标注图像都在后台写盘
+        self.clip_recorder = ClipRecorder(DEFECTS_DIR, clip_pre, clip_post)
+        self.clip_recorder.start()
+        
+        # 启动本机指标端点
+        if metrics_port is not None:
+            try:
+                self.metrics_server = MetricsServer(registry, metrics_port)
+                self.metrics_server.start()
+                print(f"延迟指标端点: {self.metrics_server.address}")
+            except OSError as e:
+                print(f"无法启动指标端点: {e}")
+                self.metrics_server = None
+        
+        # 初始化IO控制线程，GPIO或串口连接一直保持打开
+        self.io_controller = IOController(create_device(io_device, serial_port))
+        self.io_controller.start()
+        
+        # 在后台加载并预热模型，窗口先显示，加载完成前"开始检测"按钮不可用
+        # 预热使用单张和满批次的1280x720图像，覆盖实际检测时的输入形状
+        self.model_loader = ModelLoader(
+            {"model_path": "best.pt", "backend": backend, "imgsz": self.pipeline.imgsz, "tile_size": tile_size,
+             "tile_overlap": tile_overlap, "tile_iou": tile_iou},
+            warmup_batches=sorted({1, self.pipeline.max_batch}), rois=self.rois,
+            processes=processes, threads=threads, max_batch=self.pipeline.max_batch)
+        self.model_loader.model_loaded.connect(self.on_model_loaded)
+        self.model_loader.model_failed.connect(self.on_model_failed)
+        self.model_loader.start()
+        
+        # 初始化定时器 - 画面刷新和提交检测分别计时
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frames)
+        self.detect_timer = QTimer()
+        self.detect_timer.timeout.connect(self.submit_detection)
+        self.status_timer = QTimer()
+        self.status_timer.timeout.connect(self.update_status)
+        self.status_timer.start(self.STATUS_INTERVAL_MS)
         
     def setup_ui(self):
         # 主布局
@@ -76,15 +191,18 @@ class MainWindow(QMainWindow):
         main_layout.setContentsMargins(16, 16, 16, 16)
         main_layout.setSpacing(12)
         
-        # 摄像头网格布局 - 使用2x2网格
+        # 摄像头网格布局 - 按摄像头数量使用接近正方形的网格（4路为2x2，8路为3x3）
         camera_grid = QGridLayout()
         camera_grid.setSpacing(10)  # 设置摄像头之间的间距
+        columns = math.ceil(math.sqrt(self.camera_count))
         
-        # 创建四个摄像头窗口
-        for i in range(4):
-            camera_widget = CameraWidget(camera_id=i)
+        # 创建摄像头窗口
+        for i, camera in enumerate(self.camera_config["cameras"]):
+            camera_widget = CameraWidget(camera_id=i, source=camera["source"], realtime=self.realtime, loop=self.loop,
+                                         buffer_seconds=self.buffer_seconds, device=camera["device"],
+                                         name=camera["name"])
             self.cameras.append(camera_widget)
-            row, col = i // 2, i % 2
+            row, col = i // columns, i % columns
             camera_grid.addWidget(camera_widget, row, col)
         
         # 控制按钮布局
@@ -98,7 +216,9 @@ class MainWindow(QMainWindow):
         self.save_btn = QPushButton("保存图像")
         self.continue_btn = QPushButton("继续检测")  # 新增继续检测按钮
         
-        # 设置按钮状态
+        # 设置按钮状态，模型加载完成后才能开始检测
+        self.start_btn.setText("加载模型...")
+        self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.mark_btn.setEnabled(False)
         self.save_btn.setEnabled(False)
@@ -135,6 +255,31 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(camera_grid, 5)  # 视频流占据5/6的空间
         main_layout.addLayout(control_layout, 1)  # 控制按钮占据1/6的空间
     
+    @pyqtSlot(object, object)
+    def on_model_loaded(self, detector, timings):
+        """模型加载和预热完成后启动检测线程并允许开始检测（在GUI线程中执行）"""
+        self.detector = detector
+        self.pipeline.detector = detector
+        if self.processes > 0:
+            self.detection_worker = ProcessDetectionWorker(detector)
+        else:
+            self.detection_worker = DetectionWorker(detector)
+        self.detection_worker.detection_finished.connect(self.on_detection_finished)
+        self.detection_worker.detection_failed.connect(self.on_detection_failed)
+        self.detection_worker.start()
+        
+        self.start_btn.setText("开始检测")
+        self.start_btn.setEnabled(True)
+        ready_time = time.perf_counter() - self.start_time
+        print(f"模型就绪: 加载 {timings['load']:.2f} s，预热 {timings['warmup']:.2f} s，"
+              f"启动到可开始检测共 {ready_time:.2f} s")
+    
+    @pyqtSlot(str)
+    def on_model_failed(self, message):
+        """模型加载失败时提示，保持"开始检测"不可用"""
+        self.start_btn.setText("模型加载失败")
+        QMessageBox.critical(self, "错误", f"无法加载检测模型: {message}")
+    
     def start_detection(self):
         # 启动所有摄像头
         for i, camera in enumerate(self.cameras):
@@ -152,12 +297,18 @@ class MainWindow(QMainWindow):
         self.running = True
         self.defect_detected = False
         self.defect_camera_id = -1  # 重置检测到缺陷的摄像头ID
-        self.timer.start(30)  # 约33FPS
+        self.current_frames = [None] * len(self.cameras)
+        self.current_detections = [None] * len(self.cameras)
+        self.current_timestamps = [None] * len(self.cameras)
+        self.pipeline.reset()
+        self.timer.start(self.RENDER_INTERVAL_MS)
+        self.detect_timer.start(self.DETECT_INTERVAL_MS)
     
     def stop_detection(self):
         # 停止检测
         self.running = False
         self.timer.stop()
+        self.detect_timer.stop()
         
         # 停止所有摄像头
         for camera in self.cameras:
@@ -171,65 +322,192 @@ class MainWindow(QMainWindow):
         self.continue_btn.setEnabled(False)  # 禁用继续检测按钮
     
     def update_frames(self):
+        """刷新画面，只负责取帧和显示，检测在检测线程中进行"""
         if not self.running:
             return
         
-        # 获取每个摄像头的当前帧
-        for i, camera in enumerate(self.cameras):
-            frame = camera.get_frame()
+        # 获取每个摄像头的当前帧并显示，起始摄像头每次轮换，不让排在后面的摄像头总是最晚刷新
+        count = len(self.cameras)
+        self.render_offset = (self.render_offset + 1) % count
+        for i in [(self.render_offset + k) % count for k in range(count)]:
+            camera = self.cameras[i]
+            frame, timestamp = camera.get_frame()
             if frame is not None:
-                self.current_frames[i] = frame.copy()
-                  # 进行检测
-                if not self.defect_detected:
-                    results = self.detector.detect(frame)
-                    if len(results.boxes) > 0:  # 检测到缺陷
-                        self.defect_detected = True
-                        self.defect_camera_id = i  # 记录检测到缺陷的摄像头ID
-                        for j in range(4):
-                            self.cameras[j].pause()  # 暂停所有摄像头
-                        
-                        # 发送低电平信号
-                        send_low_signal()
-                        
-                        # 改变按钮状态
-                        self.mark_btn.setEnabled(True)
-                        self.save_btn.setEnabled(True)
-                        self.continue_btn.setEnabled(True)  # 启用继续检测按钮
-                        
-                        QMessageBox.information(self, "检测结果", f"摄像头 {i+1} 检测到缺陷!")
+                new_frame = timestamp != self.current_timestamps[i]
+                self.current_frames[i] = frame
+                self.current_timestamps[i] = timestamp
+                # 旧帧只在检测框、统计文字或显示尺寸变化时重新渲染
+                if new_frame or camera.needs_render(frame):
+                    if new_frame:
+                        self.display_counts[i] += 1
+                    with registry.timer("render", i + 1):
+                        camera.update_image(frame)
+    
+    def submit_detection(self):
+        """
+        把各摄像头需要推理的新帧交给调度器，检测线程空闲时提交调度器选出的下一批
+        
+        没有新帧或画面变化门控判断ROI内画面未变化的摄像头不参与推理，沿用上一次的检测结果；
+        未到检测间隔的摄像头不参与推理，由跟踪器把上一次的检测框移动到新帧上
+        """
+        if not self.running or self.defect_detected:
+            return
+        
+        for i, frame in enumerate(self.current_frames):
+            if self.pipeline.offer(i, frame, self.current_timestamps[i]):
+                # 跟踪的帧上检测框已移动到新位置
+                self.current_detections[i] = self.pipeline.trackers[i].detections()
+        self.pipeline.expire()
+        
+        # 多进程推理时每个空闲的检测进程各取一批，同一路摄像头同时只有一个批次在推理
+        while True:
+            batch = self.pipeline.next_batch(self.detection_worker.capacity)
+            if batch is None:
+                return
+            self.detection_worker.submit(*batch)
+    
+    def update_status(self):
+        """在状态栏显示各摄像头的显示帧率、检测帧率、端到端延迟、因画面未变化而跳过的推理次数和调度丢弃的画面数"""
+        now = time.time()
+        elapsed = max(now - self.stats_time, 1e-6)
+        pipeline = self.pipeline
+        detected = sum(pipeline.detect_counts)
+        parts = [
+            f"摄像头{i+1} 显示{self.display_counts[i] / elapsed:.1f}/检测{pipeline.detect_counts[i] / elapsed:.1f} FPS "
+            f"跳过 {gate.skipped}/{gate.checked} ({gate.skip_ratio():.0%}) 跟踪 {tracker.tracked} "
+            f"丢弃 {pipeline.scheduler.dropped(i)}"
+            for i, (gate, tracker) in enumerate(zip(pipeline.change_gates, pipeline.trackers))
+        ]
+        if detected:
+            parts.append(f"延迟 {pipeline.latency_total / detected * 1000:.0f} ms")
+        if pipeline.latency_controller is not None:
+            parts.append(f"输入 {pipeline.imgsz} 批次 {pipeline.scheduler.max_batch}")
+        io_stats = self.io_controller.latency_stats()
+        if io_stats and io_stats["count"]:
+            parts.append(f"IO触发延迟 p95 {io_stats['p95']:.1f} ms")
+        if io_stats and io_stats["lost"]:
+            parts.append(f"IO触发丢失 {io_stats['lost']}")
+        self.statusBar().showMessage("  |  ".join(parts))
+        
+        self.display_counts = [0] * len(self.display_counts)
+        pipeline.reset_counts()
+        self.stats_time = now
+        
+        if self.metrics_overlay:
+            self.update_metrics_overlay()
+    
+    def update_metrics_overlay(self):
+        """把每个摄像头各阶段最近一分钟的延迟分位数叠加显示在画面上"""
+        for i, camera in enumerate(self.cameras):
+            lines = [
+                f"{stage:<12} p50 {stats['p50'] * 1000:7.1f}  p95 {stats['p95'] * 1000:7.1f} ms"
+                for (stage, _), stats in registry.summary(camera=i + 1).items()
+            ]
+            camera.set_metrics_text(lines)
+    
+    @pyqtSlot(object)
+    def on_detection_finished(self, job):
+        """处理检测线程返回的结果（在GUI线程中执行）"""
+        camera_ids = job["camera_ids"]
+        if not self.running or self.defect_detected:
+            self.pipeline.release(camera_ids)
+            return
+        
+        # 检测结果交给跟踪器匹配，只有连续检出confirm_frames次的缺陷才被确认
+        confirmed_detections = self.pipeline.finish_batch(camera_ids, job["frames"], job["timestamps"],
+                                                          job["detections"])
+        for i in camera_ids:
+            self.current_detections[i] = self.pipeline.trackers[i].detections()
+        
+        for i, confirmed in zip(camera_ids, confirmed_detections):
+            if len(confirmed) > 0:  # 确认检测到缺陷
+                self.defect_detected = True
+                self.defect_camera_id = i  # 记录检测到缺陷的摄像头ID
+                
+                # 暂停所有摄像头，画面停留在参与检测的那一帧上
+                for camera in self.cameras:
+                    camera.pause()
+                for j, frame, timestamp in zip(camera_ids, job["frames"], job["timestamps"]):
+                    self.current_frames[j] = frame
+                    self.current_timestamps[j] = timestamp
+                    self.cameras[j].pause(frame, timestamp)
                 
-                # 用检测结果更新摄像头视图
-                camera.update_image(frame)
+                # 发送低电平信号，由IO控制线程异步完成，不阻塞界面
+                self.io_controller.trigger(i + 1)
+                
+                # 后台保存检测到缺陷的摄像头触发前后的片段
+                if self.clip_enabled:
+                    for j, confirmed, timestamp in zip(camera_ids, confirmed_detections, job["timestamps"]):
+                        if len(confirmed) > 0:
+                            self.clip_recorder.record(j, self.cameras[j].frame_buffer, timestamp,
+                                                      self.current_detections[j], self.detector.names)
+                
+                # 改变按钮状态
+                self.mark_btn.setEnabled(True)
+                self.save_btn.setEnabled(True)
+                self.continue_btn.setEnabled(True)  # 启用继续检测按钮
+                
+                QMessageBox.information(self, "检测结果", f"摄像头 {i+1} 检测到缺陷!")
+                break
+    
+    def on_latency_change(self, change):
+        """
+        流水线按延迟目标调整了输入尺寸或批次大小时输出到控制台
+        
+        参数:
+            change: LatencyController.observe()返回的调整内容
+        """
+        print(f"{datetime.datetime.now():%H:%M:%S} 延迟p95 {change['p95_ms']:.0f} ms，"
+              f"目标 {self.pipeline.latency_controller.target * 1000:.0f} ms: "
+              f"输入尺寸 {change['imgsz'][0]} -> {change['imgsz'][1]}，批次 {change['batch'][0]} -> {change['batch'][1]}")
+    
+    @pyqtSlot(object, str)
+    def on_detection_failed(self, job, message):
+        """检测线程出错时允许这批摄像头提交下一批图像"""
+        self.pipeline.release(job["camera_ids"])
     
     def mark_defect(self):
         # 标记当前帧上的缺陷
         if self.defect_detected:
             for i, frame in enumerate(self.current_frames):
-                if frame is not None:                    # 获取标记后的帧
-                    marked_frame = self.detector.draw_detections(frame)
-                    self.cameras[i].update_image(marked_frame)
+                if frame is not None:
+                    # 检测框作为叠加层按显示尺寸绘制，不复制全分辨率图像
+                    self.cameras[i].set_detections(self.current_detections[i], self.detector.names)
+                    self.cameras[i].update_image(frame)
     
     def save_image(self):
         # 保存当前帧
         if self.defect_detected and self.defect_camera_id >= 0:
             # 创建保存目录 - 只使用年月日
             today = datetime.datetime.now().strftime("%Y%m%d")
-            save_dir = os.path.join("defects", today)
-            os.makedirs(save_dir, exist_ok=True)
+            save_dir = os.path.join(DEFECTS_DIR, today)
             
             # 只保存检测到缺陷的摄像头图像
             frame = self.current_frames[self.defect_camera_id]
             if frame is not None:
-                # 获取标记后的帧
-                marked_frame = self.detector.draw_detections(frame)
-                
                 # 使用时间作为文件名，避免覆盖
                 time_str = datetime.datetime.now().strftime("%H%M%S")
                 save_path = os.path.join(save_dir, f"camera_{self.defect_camera_id+1}_{time_str}.jpg")
                 
-                cv2.imwrite(save_path, marked_frame)
+                # 绘制全分辨率标记图像和写盘都在后台写入线程中进行
+                self.clip_recorder.submit(self.write_marked_image, save_path, frame,
+                                          self.current_detections[self.defect_camera_id], self.defect_camera_id)
                 QMessageBox.information(self, "保存成功", f"已保存摄像头 {self.defect_camera_id+1} 的缺陷图像到 {save_dir}")
     
+    def write_marked_image(self, save_path, frame, detections, camera_id):
+        """
+        绘制并保存标记了检测结果的全分辨率图像（在写入线程中执行）
+        
+        参数:
+            save_path: 保存路径
+            frame: 原始图像
+            detections: 检测数组
+            camera_id: 摄像头ID
+        """
+        with registry.timer("save", camera_id + 1):
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            cv2.imwrite(save_path, self.detector.draw_detections(frame, detections))
+    
     def continue_detection(self):
         """继续检测，清除当前检测结果并重新开始检测"""
         print("继续检测按钮被点击")
@@ -238,8 +516,9 @@ class MainWindow(QMainWindow):
             print("检测未在运行状态，无法继续")
             return
             
-        # 重置检测状态
+        # 重置检测状态，清除门控参考帧和跟踪轨迹，使恢复后的第一帧重新推理
         self.defect_detected = False
+        self.pipeline.reset()
         
         # 恢复所有摄像头
         for camera in self.cameras:
@@ -251,9 +530,19 @@ class MainWindow(QMainWindow):
         self.continue_btn.setEnabled(False)
         
         # 重新开始检测
-        self.timer.start(30)
+        self.timer.start(self.RENDER_INTERVAL_MS)
+        self.detect_timer.start(self.DETECT_INTERVAL_MS)
     
     def closeEvent(self, event):
-        # 程序关闭时停止所有摄像头
+        # 程序关闭时停止所有摄像头和检测线程
         self.stop_detection()
+        # 模型仍在加载时等待加载线程结束
+        self.model_loader.wait()
+        if self.detection_worker is not None:
+            self.detection_worker.stop()
+        self.io_controller.stop()
+        # 等待已提交的缺陷片段写完
+        self.clip_recorder.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
         event.accept()
\ No newline at end of file
@@ -1,20 +1,65 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
-from PyQt5.QtCore import Qt, QMutex
-from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor, QFont
+from PyQt5.QtCore import Qt, QMutex, QRectF
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor, QFont, QPen
+import os
 import cv2
 import numpy as np
+from ..utils.capture_thread import CaptureThread
+from ..utils.frame_source import open_capture
+from ..utils.clip_recorder import FrameRingBuffer
+
+# Qt 5.14起支持直接显示BGR图像，无需先转换为RGB
+HAS_BGR888 = hasattr(QImage, "Format_BGR888")
 
 class CameraWidget(QWidget):
-    def __init__(self, camera_id=0, parent=None):
+    # 缩放到显示尺寸时使用的插值方式，双线性插值比Qt的SmoothTransformation快得多
+    DISPLAY_INTERPOLATION = cv2.INTER_LINEAR
+    TITLE_HEIGHT = 30  # 标题栏高度
+    
+    def __init__(self, camera_id=0, source=None, realtime=True, loop=True, buffer_seconds=0, device=None, name=None,
+                 parent=None):
+        """
+        初始化摄像头显示组件
+        
+        参数:
+            camera_id: 摄像头编号
+            source: 回放源（视频文件或图片目录），为None时打开摄像头设备
+            realtime: 回放源是否按帧率实时播放，False时尽可能快地读取
+            loop: 回放源播放到结尾后是否循环
+            buffer_seconds: 环形缓冲区保留的时长（秒），用于保存缺陷前后的片段，为0时不缓冲
+            device: 摄像头设备编号，为None时与camera_id相同
+            name: 标题栏显示的摄像头名称，为None时为"Camera 序号"
+            parent: 父组件
+        """
         super().__init__(parent)
         self.camera_id = camera_id
+        self.source = source
+        self.device = camera_id if device is None else device
+        self.realtime = realtime
+        self.loop = loop
         self.capture = None
+        self.capture_thread = None  # 后台采集线程
+        self.frame_buffer = FrameRingBuffer(buffer_seconds) if buffer_seconds > 0 else None  # 最近若干秒的JPEG图像
         self.frame = None
+        self.frame_timestamp = None  # 当前帧的采集时间戳
         self.mutex = QMutex()
         self.paused = False
-        self.title = f"Camera {camera_id + 1}"
+        self.title = name or f"Camera {camera_id + 1}"
+        if source is not None:
+            self.title += f" ({os.path.basename(os.path.normpath(source))})"
         self.show_title = False  # 添加标志控制是否显示标题
         
+        # 显示缓存：最近一次渲染的图像和参数相同时跳过渲染
+        self.rendered_frame = None
+        self.rendered_key = None
+        self.title_overlay = None  # 缓存的标题栏图层，宽度变化时重建
+        
+        # 检测框叠加层：原图坐标的检测数组，显示时按缩放比例绘制
+        self.detections = None
+        self.class_names = {}
+        self.overlay_version = 0  # 检测数组或统计文字更新时递增，使缓存的渲染失效
+        self.metrics_lines = []  # 叠加显示在画面左下角的延迟统计文字
+        
         # 设置标签用于显示视频
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(4, 4, 4, 4)  # 减少边距
@@ -60,35 +105,14 @@ class CameraWidget(QWidget):
         """启动摄像头"""
         try:
             # 如果已经有打开的摄像头，先关闭
-            if self.capture is not None:
-                self.capture.release()
-                self.capture = None
+            self.release_capture()
             
             # 启动摄像头后显示标题
             self.show_title = True
             
-            # 方法1: 直接使用索引打开
-            self.capture = cv2.VideoCapture(self.camera_id)
-            
-            if not self.capture.isOpened():
-                print(f"方法1失败: 无法打开摄像头 {self.camera_id}")
-                
-                # 方法2: 使用DirectShow尝试打开
-                self.capture = cv2.VideoCapture(self.camera_id, cv2.CAP_DSHOW)
-                
-                if not self.capture.isOpened():
-                    print(f"方法2失败: 无法使用DirectShow打开摄像头 {self.camera_id}")
-                    
-                    # 方法3: 使用默认的摄像头
-                    self.capture = cv2.VideoCapture(0)
-                    
-                    if not self.capture.isOpened():
-                        print("方法3失败: 无法打开默认摄像头")
-                        return False
-            
-            # 设置摄像头参数 (可选)
-            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+            self.capture = self.open_capture()
+            if self.capture is None:
+                return False
             
             # 读取一帧测试是否正常
             ret, frame = self.capture.read()
@@ -98,103 +122,253 @@ class CameraWidget(QWidget):
                 self.capture = None
                 return False
             
-            print(f"成功打开摄像头 ID: {self.camera_id}")
+            if self.source is None:
+                print(f"成功打开摄像头 ID: {self.device}")
+            else:
+                print(f"成功打开回放源: {self.source}")
             print(f"摄像头信息:")
             print(f"- 宽度: {int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))}")
             print(f"- 高度: {int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
             print(f"- FPS: {self.capture.get(cv2.CAP_PROP_FPS)}")
             
+            # 启动后台采集线程，测试帧作为第一帧放入槽位
+            # 环形缓冲区在采集线程中编码写入
+            on_frame = None
+            if self.frame_buffer is not None:
+                self.frame_buffer.clear()
+                on_frame = self.frame_buffer.push
+            self.capture_thread = CaptureThread(self.capture, name=f"capture-{self.camera_id}", on_frame=on_frame,
+                                                camera=self.camera_id + 1)
+            self.capture_thread.put(frame)
+            self.capture_thread.start()
+            
             self.paused = False
             return True
         except Exception as e:
             print(f"启动摄像头时出错: {e}")
-            if self.capture is not None:
-                self.capture.release()
-                self.capture = None
+            self.release_capture()
             return False
     
-    def stop(self):
-        """停止摄像头"""
+    def open_capture(self):
+        """
+        打开图像来源：回放源或摄像头
+        
+        返回:
+            已打开的capture对象，失败时返回None
+        """
+        return open_capture(self.source, self.device, self.realtime, self.loop)
+    
+    def release_capture(self):
+        """停止采集线程并释放摄像头"""
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+            self.capture_thread = None
         if self.capture is not None:
             self.capture.release()
             self.capture = None
-        # 停止显示标题
+    
+    def stop(self):
+        """停止摄像头"""
+        self.release_capture()
+        # 停止显示标题和检测框
         self.show_title = False
+        self.set_detections(None)
         # 恢复到占位图
         self.show_placeholder()
     
-    def pause(self):
-        """暂停摄像头"""
+    def pause(self, frame=None, timestamp=None):
+        """
+        暂停摄像头
+        
+        参数:
+            frame: 暂停时保持显示的图像，为None时保持当前帧
+            timestamp: frame的采集时间戳
+        """
+        if frame is not None:
+            self.mutex.lock()
+            self.frame = frame
+            self.frame_timestamp = timestamp
+            self.mutex.unlock()
         self.paused = True
     
     def resume(self):
-        """恢复摄像头"""
+        """恢复摄像头，清除检测框叠加层"""
         self.paused = False
+        self.set_detections(None)
+    
+    def set_detections(self, detections, class_names=None):
+        """
+        设置在画面上叠加显示的检测框
+        
+        参数:
+            detections: 原图坐标的检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]，为None时不显示
+            class_names: 类别ID到名称的映射
+        """
+        self.detections = detections
+        if class_names is not None:
+            self.class_names = class_names
+        self.overlay_version += 1
+    
+    def set_metrics_text(self, lines):
+        """
+        设置叠加显示在画面左下角的延迟统计文字
+        
+        参数:
+            lines: 文字行列表，为空时不显示
+        """
+        if lines != self.metrics_lines:
+            self.metrics_lines = list(lines)
+            self.overlay_version += 1
     
     def get_frame(self):
-        """获取当前帧"""
-        if self.capture is None:
-            return None
+        """
+        获取当前帧，直接返回采集线程中的最新帧，不阻塞
+        
+        返回:
+            (帧, 采集时间戳)，无可用图像时为(None, None)
+        """
+        if self.capture_thread is None:
+            return None, None
             
         if self.paused and self.frame is not None:
-            return self.frame
+            return self.frame, self.frame_timestamp
         
-        try:
-            ret, frame = self.capture.read()
-            if ret:
-                self.mutex.lock()
-                self.frame = frame
-                self.mutex.unlock()
-                return frame
-        except Exception as e:
-            print(f"获取摄像头帧时出错: {e}")
-            
-        return None
+        frame, timestamp = self.capture_thread.latest()
+        if frame is not None:
+            self.mutex.lock()
+            self.frame = frame
+            self.frame_timestamp = timestamp
+            self.mutex.unlock()
+        return frame, timestamp
+    
+    def needs_render(self, frame):
+        """
+        返回:
+            frame与上一次渲染的画面不同，或检测框、统计文字、标题、显示尺寸变化后需要重新渲染时为True
+        """
+        return frame is not self.rendered_frame or self.render_key() != self.rendered_key
+    
+    def render_key(self):
+        """返回决定渲染结果的显示状态：显示尺寸、标题和叠加内容版本"""
+        return (self.camera_label.width(), self.camera_label.height(), self.show_title, self.title,
+                self.overlay_version)
     
     def update_image(self, frame):
-        """更新显示的图像"""
+        """
+        更新显示的图像
+        
+        先用OpenCV缩放到显示尺寸，再以BGR格式直接构造QImage，避免全分辨率的颜色转换和Qt平滑缩放；
+        与上一次渲染的是同一帧且显示尺寸和标题状态未变时直接返回
+        """
         if frame is None:
             return
         
+        width, height = self.camera_label.width(), self.camera_label.height()
+        if width <= 0 or height <= 0:
+            return
+        key = self.render_key()
+        if frame is self.rendered_frame and key == self.rendered_key:
+            return
+        
         try:
-            # 将OpenCV的BGR图像转换为RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # 先缩放到显示尺寸，后续处理的像素量只与窗口大小有关
+            display = cv2.resize(frame, (width, height), interpolation=self.DISPLAY_INTERPOLATION)
             
-            # 获取图像尺寸
-            height, width, channels = rgb_frame.shape
+            if HAS_BGR888:
+                image = QImage(display.data, width, height, display.strides[0], QImage.Format_BGR888)
+            else:
+                # Qt 5.14以前没有BGR888格式，只在缩放后的小图上转换颜色
+                display = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
+                image = QImage(display.data, width, height, display.strides[0], QImage.Format_RGB888)
+            pixmap = QPixmap.fromImage(image)
             
-            # 创建QImage
-            bytesPerLine = channels * width
-            image = QImage(rgb_frame.data, width, height, bytesPerLine, QImage.Format_RGB888)
+            # 只在需要显示标题或检测框时打开QPainter
+            has_detections = self.detections is not None and len(self.detections) > 0
+            if self.show_title or has_detections or self.metrics_lines:
+                painter = QPainter(pixmap)
+                if has_detections:
+                    self.draw_detection_overlay(painter, width / frame.shape[1], height / frame.shape[0])
+                if self.metrics_lines:
+                    self.draw_metrics_overlay(painter, height)
+                if self.show_title:
+                    painter.drawPixmap(0, 0, self.get_title_overlay(width))
+                painter.end()
             
-            # 根据窗口大小缩放图像
-            pixmap = QPixmap.fromImage(image)
-            pixmap = pixmap.scaled(self.camera_label.width(), self.camera_label.height(),
-                                  Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            # 设置图像
+            self.camera_label.setPixmap(pixmap)
+            self.rendered_frame = frame
+            self.rendered_key = key
+        except Exception as e:
+            print(f"更新图像时出错: {e}")
+    
+    def draw_detection_overlay(self, painter, scale_x, scale_y):
+        """
+        按显示尺寸绘制检测框和标签
+        
+        参数:
+            painter: 显示图像上的QPainter
+            scale_x: 原图到显示图像的水平缩放比例
+            scale_y: 原图到显示图像的垂直缩放比例
+        """
+        boxes = self.detections[:, :4] * (scale_x, scale_y, scale_x, scale_y)
+        
+        painter.setPen(QPen(QColor(0, 255, 0), 2))  # 绿色边框
+        painter.setFont(QFont("Arial", 9, QFont.Bold))
+        painter.drawRects([QRectF(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes.tolist()])
+        
+        # 绘制类别和置信度
+        for (x1, y1, _, _), conf, cls_id in zip(boxes.tolist(), self.detections[:, 4].tolist(),
+                                                self.detections[:, 5].tolist()):
+            label = f"{self.class_names.get(int(cls_id), int(cls_id))}: {conf:.2f}"
+            painter.drawText(int(x1), max(int(y1) - 4, 12), label)
+    
+    def draw_metrics_overlay(self, painter, height):
+        """
+        在画面左下角绘制延迟统计文字
+        
+        参数:
+            painter: 显示图像上的QPainter
+            height: 显示高度
+        """
+        line_height = 14
+        box_height = line_height * len(self.metrics_lines) + 6
+        painter.fillRect(0, height - box_height, 260, box_height, QColor(0, 0, 0, 150))
+        painter.setPen(Qt.white)
+        painter.setFont(QFont("Consolas", 8))
+        for i, line in enumerate(self.metrics_lines):
+            painter.drawText(6, height - box_height + line_height * (i + 1), line)
+    
+    def get_title_overlay(self, width):
+        """
+        获取标题栏图层，同一宽度和标题只绘制一次
+        
+        参数:
+            width: 显示宽度
+            
+        返回:
+            带透明通道的标题栏QPixmap
+        """
+        if (self.title_overlay is None or self.title_overlay[0] != width
+                or self.title_overlay[1] != self.title):
+            overlay = QPixmap(width, self.TITLE_HEIGHT)
+            overlay.fill(Qt.transparent)
             
-            # 在图像上添加标题
-            painter = QPainter(pixmap)
+            painter = QPainter(overlay)
             painter.setRenderHint(QPainter.Antialiasing)
+            # 绘制半透明背景
+            painter.fillRect(0, 0, width, self.TITLE_HEIGHT, QColor(0, 0, 0, 150))
             
-            # 只在需要显示标题时绘制
-            if self.show_title:
-                # 绘制半透明背景
-                painter.fillRect(0, 0, pixmap.width(), 30, QColor(0, 0, 0, 150))
-                
-                # 设置字体
-                font = QFont("Arial", 10, QFont.Bold)
-                painter.setFont(font)
-                
-                # 绘制文本
-                painter.setPen(Qt.white)
-                painter.drawText(10, 20, self.title)
+            # 设置字体
+            font = QFont("Arial", 10, QFont.Bold)
+            painter.setFont(font)
             
+            # 绘制文本
+            painter.setPen(Qt.white)
+            painter.drawText(10, 20, self.title)
             painter.end()
             
-            # 设置图像
-            self.camera_label.setPixmap(pixmap)
-        except Exception as e:
-            print(f"更新图像时出错: {e}")
+            self.title_overlay = (width, self.title, overlay)
+        return self.title_overlay[2]
     
     def resizeEvent(self, event):
         """窗口大小改变时重新缩放图像"""
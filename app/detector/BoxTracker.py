@@ -0,0 +1,208 @@
+import cv2
+import numpy as np
+from ..utils.geometry import box_iou
+
+
+class Track:
+    """单个被跟踪的缺陷"""
+
+    def __init__(self, track_id, detection):
+        self.track_id = track_id
+        self.box = np.asarray(detection[:4], dtype=np.float32)
+        self.conf = float(detection[4])
+        self.cls_id = int(detection[5])
+        self.hits = 1  # 被检测器连续检出的次数，未确认的轨迹漏检一次后从0重新计数
+        self.missed = 0  # 连续未被检测器检出的次数
+        self.confirmed = False
+
+    def to_row(self):
+        return [*self.box.tolist(), self.conf, self.cls_id]
+
+
+class BoxTracker:
+    """
+    单个摄像头的隔帧检测与检测框跟踪
+
+    每detect_interval帧运行一次完整模型，中间的帧用金字塔光流估计每个检测框的平移，
+    把上一次的检测框带到当前帧上；检测结果按IoU与已有轨迹匹配。
+    同一缺陷被检测器连续检出confirm_frames次后才确认，过滤单帧误检。
+    存在尚未确认的候选缺陷时每帧都运行模型，尽快完成确认或排除
+    """
+
+    def __init__(self, detect_interval=1, confirm_frames=1, iou_threshold=0.3, max_missed=1, flow_width=480):
+        """
+        初始化跟踪器
+
+        参数:
+            detect_interval: 每隔多少帧运行一次完整模型，1表示每帧都检测
+            confirm_frames: 缺陷被检出多少次后确认，1表示检出即确认
+            iou_threshold: 检测框与轨迹匹配的最小IoU
+            max_missed: 轨迹允许连续未被检出的检测次数，超过后删除
+            flow_width: 计算光流所用灰度图的最大宽度（像素）
+        """
+        self.detect_interval = max(1, int(detect_interval))
+        self.confirm_frames = max(1, int(confirm_frames))
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.flow_width = flow_width
+        self.tracks = []
+        self.next_id = 0
+        self.reference = None  # 上一帧的缩小灰度图，用于计算光流
+        self.scale = 1.0  # 缩小灰度图相对原图的比例
+        self.frames_since_detection = 0
+
+        # 统计计数
+        self.detected = 0
+        self.tracked = 0
+
+    def should_detect(self):
+        """
+        返回:
+            当前帧需要运行完整模型时返回True，否则应调用track()沿用跟踪结果
+        """
+        if self.reference is None or self.has_candidates():
+            return True
+        return self.frames_since_detection + 1 >= self.detect_interval
+
+    def has_candidates(self):
+        """
+        返回:
+            是否存在尚未确认的候选缺陷
+        """
+        return any(not track.confirmed for track in self.tracks)
+
+    def update(self, frame, detections):
+        """
+        用检测器在frame上的结果更新轨迹
+
+        参数:
+            frame: 运行检测的BGR图像
+            detections: 检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]
+
+        返回:
+            本次新确认的缺陷数组，格式与detections相同
+        """
+        self.detected += 1
+        self.frames_since_detection = 0
+        self.reference = self._prepare(frame)
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+
+        # 按IoU从大到小贪心匹配同类别的检测框和轨迹
+        matched_tracks = set()
+        matched_detections = set()
+        if self.tracks and len(detections):
+            iou = box_iou([track.box for track in self.tracks], detections[:, :4])
+            for t, d in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                if self.tracks[t].cls_id != int(detections[d, 5]):
+                    continue
+                matched_tracks.add(t)
+                matched_detections.add(d)
+                track = self.tracks[t]
+                track.box = detections[d, :4].copy()
+                track.conf = float(detections[d, 4])
+                track.hits += 1
+                track.missed = 0
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if not track.confirmed:
+                    # 确认要求连续检出，漏检后重新计数
+                    track.hits = 0
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        for d, detection in enumerate(detections):
+            if d not in matched_detections:
+                survivors.append(Track(self.next_id, detection))
+                self.next_id += 1
+        self.tracks = survivors
+
+        confirmed = []
+        for track in self.tracks:
+            if not track.confirmed and track.hits >= self.confirm_frames:
+                track.confirmed = True
+                confirmed.append(track.to_row())
+        return np.asarray(confirmed, dtype=np.float32).reshape(-1, 6)
+
+    def track(self, frame):
+        """
+        不运行模型，用光流把已有检测框移动到frame上
+
+        参数:
+            frame: BGR图像
+
+        返回:
+            当前帧上的检测数组
+        """
+        self.tracked += 1
+        self.frames_since_detection += 1
+        current = self._prepare(frame)
+        if self.tracks and self.reference is not None and self.reference.shape == current.shape:
+            height, width = current.shape
+            for track in self.tracks:
+                shift = self._box_shift(self.reference, current, track.box * self.scale)
+                if shift is None:
+                    continue
+                dx, dy = shift / self.scale
+                track.box += (dx, dy, dx, dy)
+                track.box[[0, 2]] = np.clip(track.box[[0, 2]], 0, width / self.scale)
+                track.box[[1, 3]] = np.clip(track.box[[1, 3]], 0, height / self.scale)
+        self.reference = current
+        return self.detections()
+
+    def detections(self):
+        """
+        返回:
+            所有轨迹（包括未确认的候选缺陷）当前位置的检测数组
+        """
+        return np.asarray([track.to_row() for track in self.tracks], dtype=np.float32).reshape(-1, 6)
+
+    def reset(self):
+        """清除所有轨迹和参考帧，下一帧一定会运行模型"""
+        self.tracks = []
+        self.reference = None
+        self.frames_since_detection = 0
+
+    def _prepare(self, frame):
+        """把图像缩小为计算光流用的灰度图，按整数步长隔点取样，比插值缩放快得多"""
+        step = max(1, int(np.ceil(frame.shape[1] / self.flow_width)))
+        self.scale = 1.0 / step
+        small = np.ascontiguousarray(frame[::step, ::step])
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    @staticmethod
+    def _box_shift(previous, current, box, max_corners=20):
+        """
+        估计检测框内图像的平移
+
+        参数:
+            previous: 上一帧灰度图
+            current: 当前帧灰度图
+            box: 缩小灰度图上的检测框[x1, y1, x2, y2]
+            max_corners: 框内最多跟踪的角点数
+
+        返回:
+            平移量(dx, dy)的中位数，可跟踪的点太少时返回None
+        """
+        height, width = previous.shape
+        x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+        x2, y2 = min(width, int(np.ceil(box[2]))), min(height, int(np.ceil(box[3])))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        # 只在框内的小图上找角点，再换算回整幅灰度图的坐标
+        points = cv2.goodFeaturesToTrack(np.ascontiguousarray(previous[y1:y2, x1:x2]), max_corners, 0.01, 3)
+        if points is None or len(points) < 3:
+            return None
+        points = points + np.float32([x1, y1])
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, points, None,
+                                                    winSize=(15, 15), maxLevel=2)
+        good = status.reshape(-1) == 1
+        if good.sum() < 3:
+            return None
+        return np.median((moved - points).reshape(-1, 2)[good], axis=0)
@@ -0,0 +1,65 @@
+import cv2
+
+class ChangeGate:
+    """
+    画面变化门控
+
+    把图像缩小为灰度小图后与上一次推理所用的图像做差分，
+    平均差值低于阈值时认为画面没有变化，可以直接复用上一次的检测结果
+    """
+    
+    def __init__(self, threshold=2.0, size=(64, 36), max_skip=100):
+        """
+        初始化门控
+        
+        参数:
+            threshold: 平均灰度差阈值(0~255)，小于等于0时不做门控
+            size: 差分使用的缩略图尺寸(宽, 高)
+            max_skip: 连续跳过的最大次数，达到后强制推理一次
+        """
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.reference = None  # 上一次推理所用图像的缩略图
+        self.consecutive_skips = 0
+        
+        # 统计计数
+        self.checked = 0
+        self.skipped = 0
+    
+    def changed(self, frame):
+        """
+        判断画面相对上一次推理是否有变化，有变化时把该帧记为新的参考帧
+        
+        参数:
+            frame: BGR图像
+            
+        返回:
+            需要推理时返回True，可复用上一次结果时返回False
+        """
+        self.checked += 1
+        if self.threshold <= 0:
+            return True
+        
+        small = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if (self.reference is None or self.consecutive_skips >= self.max_skip
+                or cv2.absdiff(small, self.reference).mean() >= self.threshold):
+            self.reference = small
+            self.consecutive_skips = 0
+            return True
+        
+        self.consecutive_skips += 1
+        self.skipped += 1
+        return False
+    
+    def reset(self):
+        """清除参考帧，下一帧一定会推理"""
+        self.reference = None
+        self.consecutive_skips = 0
+    
+    def skip_ratio(self):
+        """
+        返回:
+            被跳过的推理占比
+        """
+        return self.skipped / self.checked if self.checked else 0.0
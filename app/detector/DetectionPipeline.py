@@ -0,0 +1,188 @@
+import math
+import time
+from .ChangeGate import ChangeGate
+from .BoxTracker import BoxTracker
+from .InferenceScheduler import InferenceScheduler
+from .LatencyController import LatencyController
+from ..utils.roi import crop_roi
+from ..utils.metrics import registry
+
+class DetectionPipeline:
+    """
+    与界面无关的检测流水线
+
+    负责每路摄像头的 新帧 -> 画面变化门控/隔帧跟踪 -> 推理调度，以及检测结果的后处理
+    （跟踪器确认缺陷、端到端延迟统计、按延迟目标调整输入尺寸和批次大小）。
+    MainWindow和DetectionService都通过它驱动检测，推理由调用方执行（检测线程、多进程推理池或同步调用）：
+    调用方把next_batch()选出的批次推理后交给finish_batch()，推理失败时交给release()
+    """
+
+    def __init__(self, camera_config, rois, change_threshold=2.0, detect_interval=1, confirm_frames=1,
+                 processes=0, imgsz=640, latency_target=None, min_imgsz=320, max_imgsz=1280, min_batch=None,
+                 on_latency_change=None):
+        """
+        初始化流水线
+
+        参数:
+            camera_config: load_camera_config()返回的摄像头配置
+            rois: 每路摄像头的归一化检测区域，None表示整幅画面
+            change_threshold: 画面变化门控的平均灰度差阈值，小于等于0时每帧都推理
+            detect_interval: 每路摄像头每隔多少帧运行一次完整模型，中间的帧用光流跟踪上一次的检测框
+            confirm_frames: 缺陷被连续检出多少次后才确认
+            processes: 检测进程数，大于0时每批最多ceil(摄像头数/进程数)路，摄像头分散到各个检测进程
+            imgsz: 推理输入尺寸，启用延迟目标时为初始尺寸
+            latency_target: 端到端延迟目标（秒），为None时输入尺寸固定
+            min_imgsz: 自动调整时的输入尺寸下限
+            max_imgsz: 自动调整时的输入尺寸上限
+            min_batch: 自动调整时的批次大小下限，为None时不调整批次大小
+            on_latency_change: 延迟控制器调整输入尺寸或批次大小时的回调，参数为LatencyController.observe()返回的字典
+        """
+        cameras = camera_config["cameras"]
+        self.camera_count = len(cameras)
+        self.rois = list(rois)
+        self.change_gates = [ChangeGate(change_threshold) for _ in range(self.camera_count)]  # 每个摄像头的画面变化门控
+        self.trackers = [BoxTracker(detect_interval, confirm_frames) for _ in range(self.camera_count)]  # 每个摄像头的隔帧检测和跟踪
+
+        # 推理调度：检测空闲时按策略选出下一批摄像头，未推理就被新画面替换或超过截止时间的画面被丢弃
+        self.max_batch = camera_config["max_batch"]
+        if processes > 0:
+            self.max_batch = min(self.max_batch, math.ceil(self.camera_count / processes))
+        self.scheduler = InferenceScheduler(
+            self.camera_count, camera_config["policy"],
+            [camera["priority"] for camera in cameras],
+            [camera["deadline"] for camera in cameras],
+            self.max_batch)
+
+        # 延迟控制：按检测完成画面的端到端延迟自动调整输入尺寸和批次大小
+        self.imgsz = imgsz
+        self.latency_controller = None
+        if latency_target:
+            self.latency_controller = LatencyController(latency_target, imgsz, min_imgsz, max_imgsz,
+                                                        self.max_batch, min_batch)
+            self.imgsz = self.latency_controller.imgsz
+        self.on_latency_change = on_latency_change
+        self.detector = None  # 调整输入尺寸的对象（YoloDetector或InferenceProcessPool），模型加载后由调用方设置
+
+        self.last_timestamps = [None] * self.camera_count  # 每个摄像头最近一次取到的帧时间戳
+        self.in_flight = 0  # 已提交但未返回结果的批次数
+        self.busy_cameras = set()  # 所在批次仍在推理中的摄像头，不会被再次提交
+
+        # 统计计数：每个统计周期内完成检测的帧数和这些帧从采集到出结果的总延迟
+        self.detect_counts = [0] * self.camera_count
+        self.latency_total = 0.0
+
+    def reset(self):
+        """清除门控参考帧、跟踪轨迹和待推理的画面，之后的第一帧重新推理"""
+        for gate in self.change_gates:
+            gate.reset()
+        for tracker in self.trackers:
+            tracker.reset()
+        self.scheduler.clear()
+        self.last_timestamps = [None] * self.camera_count
+
+    def offer(self, camera_id, frame, timestamp):
+        """
+        处理一路摄像头取到的帧
+
+        未到检测间隔的帧由跟踪器把上一次的检测框移动到新帧上；画面变化门控判断ROI内画面未变化时沿用上一次的检测结果；
+        其余的帧交给调度器等待推理
+
+        参数:
+            camera_id: 摄像头ID
+            frame: 图像
+            timestamp: 采集时间戳
+
+        返回:
+            是新帧时返回True，与上一次相同的帧返回False
+        """
+        if frame is None or timestamp == self.last_timestamps[camera_id]:
+            return False
+        self.last_timestamps[camera_id] = timestamp
+
+        tracker = self.trackers[camera_id]
+        if not tracker.should_detect():
+            with registry.timer("track", camera_id + 1):
+                tracker.track(frame)
+            return True
+        # 候选缺陷等待确认时即使画面未变化也要推理
+        if self.change_gates[camera_id].changed(crop_roi(frame, self.rois[camera_id])[0]) or tracker.has_candidates():
+            self.scheduler.offer(camera_id, frame, timestamp)
+        return True
+
+    def expire(self, now=None):
+        """丢弃超过截止时间的待推理画面"""
+        for i in self.scheduler.expire(time.time() if now is None else now):
+            # 过期的画面没有推理过，不能作为门控的参考帧
+            self.change_gates[i].reset()
+
+    def next_batch(self, capacity):
+        """
+        推理空闲时取出调度器选出的下一批画面，同一路摄像头同时只有一个批次在推理
+
+        参数:
+            capacity: 推理可以同时处理的批次数
+
+        返回:
+            (摄像头ID列表, 图像列表, 采集时间戳列表, ROI列表)，推理已满或没有待推理的画面时返回None
+        """
+        if self.in_flight >= capacity:
+            return None
+        camera_ids, frames, timestamps = self.scheduler.next_batch(exclude=self.busy_cameras)
+        if not camera_ids:
+            return None
+        self.in_flight += 1
+        self.busy_cameras.update(camera_ids)
+        return camera_ids, frames, timestamps, [self.rois[i] for i in camera_ids]
+
+    def release(self, camera_ids):
+        """已返回或出错的批次不再占用推理容量，其中的摄像头可以再次提交"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self.busy_cameras.difference_update(camera_ids)
+
+    def finish_batch(self, camera_ids, frames, timestamps, detections):
+        """
+        处理一个批次的检测结果：交给跟踪器确认，记录端到端延迟，按延迟目标调整输入尺寸
+
+        参数:
+            camera_ids: 摄像头ID列表
+            frames: 与camera_ids对应的图像列表
+            timestamps: 与camera_ids对应的采集时间戳列表
+            detections: 与camera_ids对应的检测数组列表
+
+        返回:
+            与camera_ids对应的新确认检测数组列表，只有连续检出confirm_frames次的缺陷才被确认
+        """
+        self.release(camera_ids)
+        finished_time = time.time()
+        confirmed = []
+        for i, frame, frame_detections, timestamp in zip(camera_ids, frames, detections, timestamps):
+            confirmed.append(self.trackers[i].update(frame, frame_detections))
+            self.detect_counts[i] += 1
+            self.latency_total += finished_time - timestamp
+            registry.observe("end_to_end", i + 1, finished_time - timestamp)
+            if self.latency_controller is not None:
+                self.adjust_latency(finished_time - timestamp, timestamp)
+        return confirmed
+
+    def adjust_latency(self, latency, timestamp):
+        """
+        把一个画面的端到端延迟交给延迟控制器，需要调整时修改输入尺寸和批次大小并通知调用方
+
+        参数:
+            latency: 从采集到出检测结果的延迟（秒）
+            timestamp: 该画面的采集时间戳
+        """
+        change = self.latency_controller.observe(latency, timestamp)
+        if change is None:
+            return
+        self.imgsz = self.latency_controller.imgsz
+        if self.detector is not None:
+            self.detector.imgsz = self.imgsz
+        self.scheduler.max_batch = self.latency_controller.batch
+        if self.on_latency_change is not None:
+            self.on_latency_change(change)
+
+    def reset_counts(self):
+        """开始新的统计周期"""
+        self.detect_counts = [0] * self.camera_count
+        self.latency_total = 0.0
@@ -0,0 +1,90 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import queue
+import time
+from ..utils.metrics import record_batch, registry
+
+class DetectionWorker(QThread):
+    """
+    后台检测线程
+
+    从任务队列中取出多路摄像头的图像，调用YoloDetector批量推理，
+    通过Qt信号把结果发回GUI线程，使推理不再阻塞界面刷新
+    """
+    # 检测完成信号，参数为包含camera_ids/frames/timestamps/rois/results/detections/elapsed的字典
+    detection_finished = pyqtSignal(object)
+    # 检测出错信号，参数为出错的任务字典和错误信息
+    detection_failed = pyqtSignal(object, str)
+    
+    capacity = 1  # 可以同时处理的批次数
+    
+    def __init__(self, detector, parent=None):
+        """
+        初始化检测线程
+        
+        参数:
+            detector: YoloDetector实例
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.detector = detector
+        # 队列只保留一个待处理任务，新任务到来时丢弃旧任务
+        self.queue = queue.Queue(maxsize=1)
+    
+    def submit(self, camera_ids, frames, timestamps, rois=None):
+        """
+        提交一批待检测图像，不阻塞
+        
+        参数:
+            camera_ids: 摄像头ID列表
+            frames: 与camera_ids对应的图像列表
+            timestamps: 与camera_ids对应的采集时间戳列表
+            rois: 与camera_ids对应的归一化检测区域列表，为None时检测整幅图像
+        """
+        job = {
+            "camera_ids": list(camera_ids),
+            "frames": list(frames),
+            "timestamps": list(timestamps),
+            "rois": None if rois is None else list(rois),
+        }
+        self._put_latest(job)
+    
+    def _put_latest(self, job):
+        """放入任务，队列已满时丢弃最旧的任务"""
+        while True:
+            try:
+                self.queue.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            
+            try:
+                start_time = time.time()
+                job["results"] = self.detector.detect_batch(job["frames"], job["rois"])
+                # 在检测线程中转换为紧凑数组，GUI线程只处理NumPy数组
+                job["detections"] = [self.detector.to_detections(results) for results in job["results"]]
+                job["elapsed"] = time.time() - start_time
+            except Exception as e:
+                print(f"检测线程推理时出错: {e}")
+                self.detection_failed.emit(job, str(e))
+                continue
+            
+            self.record_metrics(job)
+            self.detection_finished.emit(job)
+    
+    def record_metrics(self, job):
+        """记录本批次各阶段的延迟"""
+        record_batch(registry, job["camera_ids"], [results.speed for results in job["results"]], job["elapsed"])
+    
+    def stop(self):
+        """停止检测线程并等待其退出"""
+        self._put_latest(None)
+        self.wait()
@@ -0,0 +1,120 @@
+class InferenceScheduler:
+    """
+    多路摄像头的推理调度器
+
+    每路摄像头只有一个待推理槽位，新画面到来时直接替换尚未推理的旧画面（丢弃最旧），
+    等待超过该路截止时间的画面也会被丢弃，不再推理过时的画面。
+    检测线程空闲时按加权虚拟时间选出下一批摄像头：每路被推理一次，虚拟时间增加1/权重，
+    虚拟时间最小的摄像头优先，相同时截止时间早的优先。fair策略下各路权重相同，
+    priority策略下按priority分配推理次数，画面的先后顺序不再决定哪一路等待最久
+    """
+
+    def __init__(self, camera_count, policy="fair", priorities=None, deadlines=None, max_batch=4):
+        """
+        初始化调度器
+
+        参数:
+            camera_count: 摄像头数量
+            policy: fair（各路平分推理次数）或priority（按priorities加权分配）
+            priorities: 各路摄像头的权重，只在policy为priority时生效
+            deadlines: 各路画面等待推理的最长时间（秒），为None时不丢弃过时画面
+            max_batch: 每批最多推理的摄像头数
+        """
+        self.camera_count = camera_count
+        self.policy = policy
+        if policy == "priority" and priorities is not None:
+            self.weights = [float(p) for p in priorities]
+        else:
+            self.weights = [1.0] * camera_count
+        self.deadlines = list(deadlines) if deadlines is not None else [None] * camera_count
+        self.max_batch = max(1, max_batch)
+
+        self.slots = [None] * camera_count  # 每路待推理的(图像, 采集时间戳)
+        self.virtual_times = [0.0] * camera_count
+        self.clock = 0.0  # 最近一批中最小的虚拟时间，空闲后重新参与调度的摄像头从这里开始
+
+        # 统计计数
+        self.offered = [0] * camera_count
+        self.scheduled = [0] * camera_count
+        self.replaced = [0] * camera_count  # 未推理就被新画面替换的次数
+        self.expired = [0] * camera_count  # 等待超过截止时间被丢弃的次数
+
+    def offer(self, camera_id, frame, timestamp):
+        """
+        放入一路摄像头待推理的画面，该路已有未推理的画面时丢弃旧画面
+
+        参数:
+            camera_id: 摄像头ID
+            frame: 图像
+            timestamp: 采集时间戳(time.time())
+        """
+        self.offered[camera_id] += 1
+        if self.slots[camera_id] is not None:
+            self.replaced[camera_id] += 1
+        else:
+            # 空闲过的摄像头从当前虚拟时间开始，不能靠空闲期间积累的差值连续占用推理
+            self.virtual_times[camera_id] = max(self.virtual_times[camera_id], self.clock)
+        self.slots[camera_id] = (frame, timestamp)
+
+    def expire(self, now):
+        """
+        丢弃等待超过截止时间的画面
+
+        参数:
+            now: 当前时间(time.time())
+
+        返回:
+            被丢弃画面的摄像头ID列表
+        """
+        expired = []
+        for i, slot in enumerate(self.slots):
+            if slot is not None and self.deadlines[i] is not None and now - slot[1] > self.deadlines[i]:
+                self.slots[i] = None
+                self.expired[i] += 1
+                expired.append(i)
+        return expired
+
+    def next_batch(self, exclude=()):
+        """
+        取出下一批待推理的画面
+
+        参数:
+            exclude: 不参与本批次的摄像头ID，例如上一批仍在推理中的摄像头
+
+        返回:
+            (摄像头ID列表, 图像列表, 采集时间戳列表)，没有待推理的画面时为空列表
+        """
+        pending = [i for i, slot in enumerate(self.slots) if slot is not None and i not in exclude]
+        pending.sort(key=lambda i: (self.virtual_times[i], self._due(i)))
+
+        camera_ids, frames, timestamps = [], [], []
+        if pending:
+            self.clock = max(self.clock, self.virtual_times[pending[0]])
+        for i in pending[:self.max_batch]:
+            frame, timestamp = self.slots[i]
+            self.slots[i] = None
+            self.virtual_times[i] += 1.0 / self.weights[i]
+            self.scheduled[i] += 1
+            camera_ids.append(i)
+            frames.append(frame)
+            timestamps.append(timestamp)
+        return camera_ids, frames, timestamps
+
+    def dropped(self, camera_id):
+        """
+        返回:
+            该路摄像头被替换和过期丢弃的画面总数
+        """
+        return self.replaced[camera_id] + self.expired[camera_id]
+
+    def clear(self):
+        """清空待推理的画面（不计入丢弃），虚拟时间归零"""
+        self.slots = [None] * self.camera_count
+        self.virtual_times = [0.0] * self.camera_count
+        self.clock = 0.0
+
+    def _due(self, camera_id):
+        """待推理画面的截止时间，没有截止时间时排在最后"""
+        deadline = self.deadlines[camera_id]
+        timestamp = self.slots[camera_id][1]
+        return timestamp + deadline if deadline is not None else float("inf")
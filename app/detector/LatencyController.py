@@ -0,0 +1,89 @@
+import math
+import time
+
+class LatencyController:
+    """
+    按延迟预算自动调整推理输入尺寸和批次大小
+
+    每收集window个检测完成的画面就计算一次端到端延迟的p95：超过目标时先按比例降低输入尺寸，
+    已到最小尺寸时再减小批次；低于目标的headroom倍时按相反的顺序先恢复批次、再提高输入尺寸。
+    同一套程序在性能不同的工控机上都能自动收敛到满足延迟目标的最大输入尺寸，不需要手工调参
+    """
+    IMGSZ_STRIDE = 32  # YOLO输入尺寸必须是32的倍数
+    MAX_STEP = 1.25  # 每次调整输入尺寸的最大比例
+
+    def __init__(self, target, imgsz, min_imgsz=320, max_imgsz=1280, batch=1, min_batch=None, window=30,
+                 headroom=0.7):
+        """
+        初始化控制器
+
+        参数:
+            target: 端到端延迟目标（秒）
+            imgsz: 初始输入尺寸
+            min_imgsz: 输入尺寸下限
+            max_imgsz: 输入尺寸上限
+            batch: 初始（也是最大的）批次大小
+            min_batch: 批次大小下限，为None时不调整批次大小
+            window: 每次判断使用的画面数
+            headroom: p95低于目标的该比例时才提高输入尺寸，避免在目标附近来回调整
+        """
+        self.target = target
+        self.min_imgsz = self._round(min_imgsz)
+        self.max_imgsz = max(self.min_imgsz, self._round(max_imgsz))
+        self.imgsz = min(max(self._round(imgsz), self.min_imgsz), self.max_imgsz)
+        self.max_batch = batch
+        self.min_batch = batch if min_batch is None else max(1, min(min_batch, batch))
+        self.batch = batch
+        self.window = window
+        self.headroom = headroom
+        self.samples = []
+        self.changed_time = 0.0  # 最近一次调整的时间，之前采集的画面不计入统计
+        self.changes = 0
+
+    @classmethod
+    def _round(cls, imgsz):
+        """把输入尺寸取整为32的倍数"""
+        return max(cls.IMGSZ_STRIDE, int(round(imgsz / cls.IMGSZ_STRIDE)) * cls.IMGSZ_STRIDE)
+
+    def observe(self, latency, timestamp):
+        """
+        记录一个画面的端到端延迟，满一个统计窗口时判断是否需要调整
+
+        参数:
+            latency: 从采集到出检测结果的延迟（秒）
+            timestamp: 该画面的采集时间戳，早于上一次调整的画面是按旧设置推理的，不计入统计
+
+        返回:
+            需要调整时返回{"imgsz": (旧, 新), "batch": (旧, 新), "p95_ms": p95延迟}，否则返回None
+        """
+        if timestamp < self.changed_time:
+            return None
+        self.samples.append(latency)
+        if len(self.samples) < self.window:
+            return None
+
+        samples = sorted(self.samples)
+        self.samples = []
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        imgsz, batch = self.imgsz, self.batch
+        # 推理耗时约与输入像素数成正比，按延迟比例的平方根缩放边长
+        scale = math.sqrt(self.target / max(p95, 1e-6))
+
+        if p95 > self.target:
+            if self.imgsz > self.min_imgsz:
+                scaled = self._round(self.imgsz * max(scale, 1 / self.MAX_STEP))
+                self.imgsz = max(self.min_imgsz, min(scaled, self.imgsz - self.IMGSZ_STRIDE))
+            elif self.batch > self.min_batch:
+                self.batch -= 1
+        elif p95 < self.target * self.headroom:
+            if self.batch < self.max_batch:
+                self.batch += 1
+            elif self.imgsz < self.max_imgsz:
+                scaled = self._round(self.imgsz * min(scale, self.MAX_STEP))
+                self.imgsz = min(self.max_imgsz, max(scaled, self.imgsz + self.IMGSZ_STRIDE))
+
+        if (imgsz, batch) == (self.imgsz, self.batch):
+            return None
+        self.changed_time = time.time()
+        self.changes += 1
+        return {"imgsz": (imgsz, self.imgsz), "batch": (batch, self.batch), "p95_ms": round(p95 * 1000, 1)}
@@ -0,0 +1,78 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import time
+
+class ModelLoader(QThread):
+    """
+    后台模型加载线程
+
+    在后台导入ultralytics/torch、加载模型并用空白图像预热，
+    窗口不必等待模型加载就能显示，第一次实际检测也不再承担延迟初始化的开销
+    """
+    # 加载完成信号，参数为YoloDetector实例（多进程推理时为InferenceProcessPool）和包含load/warmup耗时（秒）的字典
+    model_loaded = pyqtSignal(object, object)
+    # 加载失败信号，参数为错误信息
+    model_failed = pyqtSignal(str)
+
+    def __init__(self, detector_args, warmup_batches=(1,), warmup_shape=(720, 1280, 3), rois=None,
+                 processes=0, threads=None, max_batch=4, parent=None):
+        """
+        初始化加载线程
+
+        参数:
+            detector_args: 传给YoloDetector的关键字参数
+            warmup_batches: 预热的批次大小
+            warmup_shape: 预热图像的形状(高, 宽, 通道)
+            rois: 实际使用的检测区域列表
+            processes: 检测进程数，大于0时启动多进程推理池，每个进程加载一个模型副本
+            threads: 每个检测进程的推理线程数，为None时按CPU核数平均分配
+            max_batch: 每个批次最多包含的图像数，决定推理池共享内存的槽位数
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.detector_args = detector_args
+        self.warmup_batches = warmup_batches
+        self.warmup_shape = warmup_shape
+        self.rois = rois
+        self.processes = processes
+        self.threads = threads
+        self.max_batch = max_batch
+
+    def run(self):
+        try:
+            if self.processes > 0:
+                detector, timings = self._start_pool()
+            else:
+                detector, timings = self._load_detector()
+        except Exception as e:
+            print(f"加载模型时出错: {e}")
+            self.model_failed.emit(str(e))
+            return
+        self.model_loaded.emit(detector, timings)
+
+    def _load_detector(self):
+        """
+        在本进程中加载并预热模型
+
+        返回:
+            (YoloDetector实例, 包含load/warmup耗时的字典)
+        """
+        start_time = time.perf_counter()
+        # 在加载线程中导入，主窗口的导入不再包含torch和ultralytics
+        from .YoloDetector import YoloDetector
+        detector = YoloDetector(**self.detector_args)
+        load_time = time.perf_counter() - start_time
+        warmup_time = detector.warmup(self.warmup_batches, self.warmup_shape, self.rois)
+        return detector, {"load": load_time, "warmup": warmup_time}
+
+    def _start_pool(self):
+        """
+        启动多进程推理池，检测进程各自加载和预热模型
+
+        返回:
+            (InferenceProcessPool实例, 包含load/warmup耗时的字典)
+        """
+        from ..utils.shm_inference import InferenceProcessPool
+        pool = InferenceProcessPool(self.detector_args, self.processes, self.threads, self.max_batch,
+                                    warmup_batches=self.warmup_batches, warmup_shape=self.warmup_shape,
+                                    rois=self.rois)
+        return pool, pool.start()
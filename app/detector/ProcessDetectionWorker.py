@@ -0,0 +1,81 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import threading
+from ..utils.metrics import record_batch, registry
+
+class ProcessDetectionWorker(QThread):
+    """
+    多进程推理池的结果接收线程
+
+    submit()在GUI线程中把图像写入共享内存并提交给推理池，本线程接收检测进程返回的结果，
+    以与DetectionWorker相同的信号发回GUI线程。推理池有几个进程就可以同时处理几个批次
+    """
+    # 检测完成信号，参数为包含camera_ids/frames/timestamps/rois/detections/speeds/elapsed的字典
+    detection_finished = pyqtSignal(object)
+    # 检测出错信号，参数为出错的任务字典和错误信息
+    detection_failed = pyqtSignal(object, str)
+
+    def __init__(self, pool, parent=None):
+        """
+        初始化接收线程
+
+        参数:
+            pool: 已启动的InferenceProcessPool
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.jobs = {}  # {任务ID: 任务字典}
+        self.stopping = False
+
+    @property
+    def capacity(self):
+        """可以同时处理的批次数"""
+        return self.pool.capacity
+
+    def submit(self, camera_ids, frames, timestamps, rois=None):
+        """
+        提交一批待检测图像，不阻塞
+
+        参数:
+            camera_ids: 摄像头ID列表
+            frames: 与camera_ids对应的图像列表
+            timestamps: 与camera_ids对应的采集时间戳列表
+            rois: 与camera_ids对应的归一化检测区域列表，为None时检测整幅图像
+        """
+        job = {
+            "camera_ids": list(camera_ids),
+            "frames": list(frames),
+            "timestamps": list(timestamps),
+            "rois": None if rois is None else list(rois),
+        }
+        try:
+            with self.lock:
+                self.jobs[self.pool.submit(job["frames"], job["rois"])] = job
+        except Exception as e:
+            print(f"提交检测任务时出错: {e}")
+            self.detection_failed.emit(job, str(e))
+
+    def run(self):
+        while not self.stopping:
+            message = self.pool.get_result(timeout=0.2)
+            if message is None:
+                continue
+            with self.lock:
+                job = self.jobs.pop(message[1], None)
+            if job is None:
+                continue
+
+            if message[0] == "error":
+                print(f"检测进程推理时出错: {message[2]}")
+                self.detection_failed.emit(job, message[2])
+                continue
+            _, _, job["detections"], job["speeds"], job["elapsed"] = message
+            record_batch(registry, job["camera_ids"], job["speeds"], job["elapsed"])
+            self.detection_finished.emit(job)
+
+    def stop(self):
+        """停止接收线程并关闭推理池"""
+        self.stopping = True
+        self.wait()
+        self.pool.close()
@@ -1,88 +1,172 @@
-import cv2
+import time
 import numpy as np
-from ultralytics import YOLO
 import torch
+from ultralytics.engine.results import Results
+from ..utils.model_export import load_model
+from ..utils.roi import crop_roi
+from ..utils.tiling import predict_tiled
+from ..utils.drawing import draw_detections
 
 class YoloDetector:
-    def __init__(self, model_path=None, conf_threshold=0.25):
+    def __init__(self, model_path=None, conf_threshold=0.25, backend="torch", imgsz=640,
+                 tile_size=None, tile_overlap=0.2, tile_iou=0.5):
         """
         初始化YOLOv8检测器
         
         参数:
             model_path: YOLO模型路径，如果为None则加载预训练模型
             conf_threshold: 置信度阈值
+            backend: 推理后端，torch、onnxruntime、openvino或openvino-int8；
+                     torch以外的后端在首次使用时导出模型并按模型哈希缓存，
+                     openvino-int8使用Chains/images校准量化
+            imgsz: 推理输入尺寸
+            tile_size: 切片推理的切片边长（像素），为None时整幅图像缩放后推理一次；
+                       切片推理保留小目标的分辨率，但推理量随切片数增加
+            tile_overlap: 相邻切片的重叠比例
+            tile_iou: 合并各切片检测框时NMS的IoU阈值
         """
         self.conf_threshold = conf_threshold
+        self.imgsz = imgsz
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_iou = tile_iou
         
-        # 加载模型
-        if model_path:
-            self.model = YOLO(model_path)
-        else:
-            # 使用预训练模型yolov8n.pt
-            self.model = YOLO("yolov8n.pt")
+        # 加载模型，未指定时使用预训练模型yolov8n.pt
+        self.model, self.backend = load_model(model_path or "yolov8n.pt", backend, imgsz)
+        self.names = self.model.names  # 类别ID到名称的映射
             
         # 存储最近的检测结果
         self.last_results = None
         
-        # 确保使用GPU
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-        print(f"Using device: {self.device}")
+        # torch后端优先使用GPU，导出的后端在CPU上运行
+        if self.backend == "torch" and torch.cuda.is_available():
+            self.device = torch.device('cuda:0')
+        else:
+            self.device = torch.device('cpu')
+        print(f"Using backend: {self.backend}, device: {self.device}")
+    
+    def warmup(self, batch_sizes=(1,), shape=(720, 1280, 3), rois=None, runs=2):
+        """
+        用空白图像预先推理几次，完成模型的延迟初始化，使第一次实际检测不再额外耗时
+        
+        参数:
+            batch_sizes: 需要预热的批次大小，每种批次的输入形状都会被推理到
+            shape: 空白图像的形状(高, 宽, 通道)，应与摄像头分辨率一致
+            rois: 实际使用的检测区域列表，裁剪后的输入尺寸与实际检测一致
+            runs: 每种批次大小推理的次数
+        
+        返回:
+            预热耗时（秒）
+        """
+        start_time = time.perf_counter()
+        frame = np.zeros(shape, dtype=np.uint8)
+        rois = list(rois or [None])
+        for batch_size in batch_sizes:
+            for _ in range(runs):
+                self.detect_batch([frame] * batch_size, [rois[i % len(rois)] for i in range(batch_size)])
+        self.last_results = None
+        return time.perf_counter() - start_time
     
-    def detect(self, frame):
+    def detect(self, frame, roi=None):
         """
         在图像上进行目标检测
         
         参数:
             frame: 输入图像
+            roi: 检测区域的归一化坐标(x1, y1, x2, y2)，为None时检测整幅图像
             
         返回:
-            检测结果
+            检测结果，检测框为整幅图像中的坐标
         """
-        # 使用YOLO进行检测
-        results = self.model(frame, conf=self.conf_threshold, device=self.device)
-        self.last_results = results[0]  # 获取第一个结果
-        return self.last_results
+        return self.detect_batch([frame], [roi])[0]
     
-    def draw_detections(self, frame):
+    def detect_batch(self, frames, rois=None):
         """
-        在图像上绘制检测结果
+        将多路摄像头的图像合并为一个批次，进行一次前向推理
+        
+        指定ROI时只把裁剪后的区域送入模型，检测框再映射回整幅图像的坐标；
+        启用切片推理时所有图像的全部切片合并为一个批次推理
         
         参数:
-            frame: 输入图像
+            frames: 输入图像列表
+            rois: 与frames一一对应的归一化ROI列表，为None或某项为None时检测整幅图像
             
         返回:
-            标记了检测结果的图像
+            与输入顺序一一对应的检测结果列表
         """
-        if self.last_results is None:
-            return frame
+        frames = list(frames)
+        if not frames:
+            return []
+        if rois is None:
+            rois = [None] * len(frames)
         
-        # 创建图像副本
-        annotated_frame = frame.copy()
+        crops, offsets = zip(*(crop_roi(frame, roi) for frame, roi in zip(frames, rois)))
         
-        # 获取检测框、类别和置信度
-        boxes = self.last_results.boxes.xyxy.cpu().numpy()
-        classes = self.last_results.boxes.cls.cpu().numpy()
-        confidences = self.last_results.boxes.conf.cpu().numpy()
+        if self.tile_size:
+            results = predict_tiled(self.model, crops, self.tile_size, self.tile_overlap, self.tile_iou,
+                                    conf=self.conf_threshold, imgsz=self.imgsz, device=self.device, verbose=False)
+        else:
+            # 传入图像列表时YOLO会将其作为一个批次推理
+            results = self.model(list(crops), conf=self.conf_threshold, imgsz=self.imgsz, device=self.device,
+                                 verbose=False)
+        results = [self._to_full_frame(result, frame, offset)
+                   for result, frame, offset in zip(results, frames, offsets)]
+        self.last_results = results[-1]
+        return results
+    
+    @staticmethod
+    def _to_full_frame(result, frame, offset):
+        """
+        把ROI上的检测结果平移回整幅图像的坐标
         
-        # 绘制每个检测框
-        for i, box in enumerate(boxes):
-            x1, y1, x2, y2 = map(int, box)
-            cls_id = int(classes[i])
-            conf = confidences[i]
-            
-            # 获取类别名称
-            class_name = self.last_results.names[cls_id]
+        参数:
+            result: ROI图像的检测结果
+            frame: 整幅图像
+            offset: ROI左上角在整幅图像中的坐标(x, y)
             
-            # 绘制边界框
-            color = (0, 255, 0)  # 绿色边框
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+        返回:
+            以整幅图像为原图的检测结果
+        """
+        if offset == (0, 0):
+            return result
+        data = result.boxes.data.clone()
+        data[:, [0, 2]] += offset[0]
+        data[:, [1, 3]] += offset[1]
+        return Results(frame, path=result.path, names=result.names, boxes=data, speed=result.speed)
+    
+    @staticmethod
+    def to_detections(results):
+        """
+        把检测结果转换为紧凑的NumPy数组，便于在线程间传递和在显示层绘制
+        
+        参数:
+            results: 单张图像的检测结果
             
-            # 绘制类别和置信度
-            label = f"{class_name}: {conf:.2f}"
-            cv2.putText(annotated_frame, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        返回:
+            float32数组，形状为(N, 6)，每行为[x1, y1, x2, y2, 置信度, 类别ID]
+        """
+        if results is None or len(results.boxes) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+        return results.boxes.data[:, :6].cpu().numpy().astype(np.float32, copy=False)
+    
+    def draw_detections(self, frame, detections=None):
+        """
+        在全分辨率图像的副本上绘制检测结果，只在保存图像时使用，界面显示由CameraWidget绘制叠加层
         
-        return annotated_frame
+        参数:
+            frame: 输入图像
+            detections: 该图像对应的检测数组或检测结果，为None时使用最近一次的检测结果
+            
+        返回:
+            标记了检测结果的图像
+        """
+        if detections is None:
+            detections = self.last_results
+        if detections is None:
+            return frame
+        if not isinstance(detections, np.ndarray):
+            detections = self.to_detections(detections)
+        return draw_detections(frame, detections, self.names)
     
     def get_last_results(self):
         """
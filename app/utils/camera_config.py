@@ -0,0 +1,85 @@
+import json
+import os
+from .roi import parse_roi
+
+# 摄像头配置文件，不存在时使用4路摄像头
+CAMERA_CONFIG_FILE = "cameras.json"
+DEFAULT_CAMERA_COUNT = 4
+
+SCHEDULER_POLICIES = ("fair", "priority")
+DEFAULT_DEADLINE_MS = 1000  # 画面等待推理的最长时间，超过后丢弃
+
+
+def load_camera_config(path=CAMERA_CONFIG_FILE, sources=None):
+    """
+    读取摄像头数量、图像来源和推理调度配置
+
+    配置文件为JSON，cameras中每项对应一路摄像头，例如：
+        {
+            "policy": "priority",
+            "max_batch": 4,
+            "cameras": [
+                {"name": "Line 1", "source": 0, "priority": 2, "deadline_ms": 300, "roi": [0.0, 0.35, 1.0, 0.65]},
+                {"source": "line2.mp4"},
+                {"source": "camera"}
+            ]
+        }
+    source为整数时是摄像头设备编号，为"camera"或省略时使用与该路序号相同的设备编号，
+    其他字符串为回放源（视频文件或图片目录）；priority只在policy为priority时生效；
+    name为界面上显示的摄像头名称，省略时为"Camera 序号"
+
+    参数:
+        path: 配置文件路径，不存在时使用4路摄像头
+        sources: 按顺序覆盖各路图像来源的回放源列表，某项为None时不覆盖；
+            多于配置的摄像头数时增加摄像头，增加的摄像头使用默认配置
+
+    返回:
+        {"policy": 调度策略, "max_batch": 每批最多推理的摄像头数,
+         "cameras": [{"name", "source", "device", "priority", "deadline", "roi"}, ...]}，
+        deadline单位为秒，roi为None时使用ROI配置文件
+    """
+    config = {}
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    entries = list(config.get("cameras") or [{} for _ in range(DEFAULT_CAMERA_COUNT)])
+    if sources is not None and len(sources) > len(entries):
+        print(f"回放源有{len(sources)}个，多于配置的{len(entries)}路摄像头，"
+              f"增加{len(sources) - len(entries)}路使用默认配置的摄像头")
+        entries.extend({} for _ in range(len(sources) - len(entries)))
+    policy = config.get("policy", "fair")
+    if policy not in SCHEDULER_POLICIES:
+        raise ValueError(f"不支持的调度策略: {policy}，可选: {', '.join(SCHEDULER_POLICIES)}")
+
+    cameras = []
+    for i, entry in enumerate(entries):
+        source = entry.get("source", "camera")
+        if sources is not None and i < len(sources) and sources[i] is not None:
+            source = sources[i]
+        device = i
+        if isinstance(source, int):
+            device, source = source, None
+        elif source == "camera":
+            source = None
+
+        priority = float(entry.get("priority", 1.0))
+        if priority <= 0:
+            raise ValueError(f"摄像头{i+1}的priority必须大于0: {priority}")
+        roi = entry.get("roi")
+        if roi is not None:
+            roi = parse_roi(roi, i)
+
+        cameras.append({
+            "name": entry.get("name", f"Camera {i + 1}"),
+            "source": source,
+            "device": device,
+            "priority": priority,
+            "deadline": float(entry.get("deadline_ms", config.get("deadline_ms", DEFAULT_DEADLINE_MS))) / 1000,
+            "roi": roi,
+        })
+
+    max_batch = int(config.get("max_batch", min(len(cameras), DEFAULT_CAMERA_COUNT)))
+    if path and os.path.exists(path):
+        print(f"摄像头配置: {len(cameras)}路，调度策略{policy}，每批最多{max_batch}路")
+    return {"policy": policy, "max_batch": max(1, max_batch), "cameras": cameras}
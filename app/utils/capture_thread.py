@@ -0,0 +1,101 @@
+import threading
+import time
+from .metrics import registry
+
+
+class CaptureThread(threading.Thread):
+    """
+    摄像头后台采集线程
+
+    持续从cv2.VideoCapture读取图像，只保留最新的一帧（旧帧直接丢弃），
+    使调用方无需在GUI线程中阻塞等待摄像头，同时避免驱动缓冲区积压造成延迟
+    """
+
+    def __init__(self, capture, name=None, on_frame=None, camera=None):
+        """
+        初始化采集线程
+
+        参数:
+            capture: 已打开的cv2.VideoCapture对象
+            name: 线程名称
+            on_frame: 每采集到一帧时在采集线程中调用的函数，参数为(帧, 采集时间戳)
+            camera: 延迟统计中的摄像头编号，为None时不记录采集等待时间
+        """
+        super().__init__(name=name, daemon=True)
+        self.capture = capture
+        self.on_frame = on_frame
+        self.camera = camera
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+
+        # 最新帧槽位
+        self.frame = None
+        self.timestamp = None
+        self.frame_count = 0
+
+    def start(self):
+        self.running.set()
+        super().start()
+
+    def run(self):
+        while self.running.is_set():
+            read_start = time.perf_counter()
+            try:
+                ret, frame = self.capture.read()
+            except Exception as e:
+                print(f"采集线程读取图像时出错: {e}")
+                ret, frame = False, None
+            timestamp = time.time()
+            if ret and self.camera is not None:
+                # 等待摄像头返回下一帧的时间
+                registry.observe("capture", self.camera, time.perf_counter() - read_start)
+
+            if not ret:
+                # 读取失败时稍作等待，避免空转占满CPU
+                time.sleep(0.01)
+                continue
+
+            with self.lock:
+                self.frame = frame
+                self.timestamp = timestamp
+                self.frame_count += 1
+
+            if self.on_frame is not None:
+                try:
+                    self.on_frame(frame, timestamp)
+                except Exception as e:
+                    print(f"采集线程处理图像时出错: {e}")
+
+    def put(self, frame, timestamp=None):
+        """
+        直接写入最新帧槽位（用于启动时的测试帧）
+
+        参数:
+            frame: 图像
+            timestamp: 采集时间戳，为None时使用当前时间
+        """
+        with self.lock:
+            self.frame = frame
+            self.timestamp = time.time() if timestamp is None else timestamp
+            self.frame_count += 1
+
+    def latest(self):
+        """
+        获取最新帧，不阻塞
+
+        返回:
+            (帧, 采集时间戳)，尚无图像时为(None, None)
+        """
+        with self.lock:
+            return self.frame, self.timestamp
+
+    def stop(self, timeout=1.0):
+        """
+        停止采集线程
+
+        参数:
+            timeout: 等待线程退出的最长时间（秒）
+        """
+        self.running.clear()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,242 @@
+import collections
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from .metrics import registry
+
+DEFECTS_DIR = "defects"
+
+
+def describe_detections(detections, class_names=None):
+    """
+    把检测数组转换为可写入JSON的列表
+
+    参数:
+        detections: 检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]，可以为None
+        class_names: 类别ID到名称的映射
+
+    返回:
+        [{"class": 类别名称, "confidence": 置信度, "box": [x1, y1, x2, y2]}, ...]
+    """
+    if detections is None:
+        return []
+    return [{
+        "class": (class_names or {}).get(int(cls_id), str(int(cls_id))),
+        "confidence": round(conf, 4),
+        "box": [round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1)],
+    } for x1, y1, x2, y2, conf, cls_id in np.asarray(detections).tolist()]
+
+
+class FrameRingBuffer:
+    """
+    单个摄像头最近若干秒图像的环形缓冲区
+
+    图像以JPEG编码后保存，内存占用由时长、帧率和总字节数三者共同限制。
+    push()在采集线程中调用，编码不占用GUI线程和检测线程
+    """
+
+    def __init__(self, seconds=5.0, fps=10.0, quality=80, max_bytes=64 * 1024 * 1024):
+        """
+        初始化缓冲区
+
+        参数:
+            seconds: 保留的时长（秒）
+            fps: 写入缓冲区的最大帧率，高于该帧率的图像直接丢弃
+            quality: JPEG质量(0~100)
+            max_bytes: 缓冲区总字节数上限
+        """
+        self.seconds = seconds
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.frames = collections.deque()  # [(采集时间戳, JPEG字节), ...]
+        self.total_bytes = 0
+        self.last_timestamp = None
+
+    def push(self, frame, timestamp):
+        """
+        写入一帧
+
+        参数:
+            frame: BGR图像
+            timestamp: 采集时间戳(time.time())
+        """
+        if self.last_timestamp is not None and timestamp - self.last_timestamp < self.interval:
+            return
+        ok, encoded = cv2.imencode(".jpg", frame, self.encode_params)
+        if not ok:
+            return
+        data = encoded.tobytes()
+
+        with self.lock:
+            self.last_timestamp = timestamp
+            self.frames.append((timestamp, data))
+            self.total_bytes += len(data)
+            # 丢弃超出时长或字节数上限的旧帧
+            while self.frames and (timestamp - self.frames[0][0] > self.seconds
+                                   or self.total_bytes > self.max_bytes):
+                self.total_bytes -= len(self.frames.popleft()[1])
+
+    def snapshot(self, start, end):
+        """
+        取出时间范围内的图像
+
+        参数:
+            start: 起始时间戳
+            end: 结束时间戳
+
+        返回:
+            [(采集时间戳, JPEG字节), ...]
+        """
+        with self.lock:
+            return [(timestamp, data) for timestamp, data in self.frames if start <= timestamp <= end]
+
+    def clear(self):
+        """清空缓冲区"""
+        with self.lock:
+            self.frames.clear()
+            self.total_bytes = 0
+            self.last_timestamp = None
+
+
+class ClipRecorder(threading.Thread):
+    """
+    后台缺陷片段写入线程
+
+    检测到缺陷时提交任务，线程等到触发后的post_seconds过去，
+    再从环形缓冲区取出触发前后的图像写成视频，并写入检测信息JSON。
+    保存标注图像等其他写盘任务也在该线程中执行，采集和检测不会因写盘而停顿
+    """
+
+    def __init__(self, output_dir=DEFECTS_DIR, pre_seconds=3.0, post_seconds=2.0, fourcc="mp4v", extension=".mp4"):
+        """
+        初始化写入线程
+
+        参数:
+            output_dir: 输出根目录，片段按日期保存在其下的YYYYMMDD目录中
+            pre_seconds: 触发前保留的时长（秒）
+            post_seconds: 触发后继续录制的时长（秒）
+            fourcc: 视频编码
+            extension: 视频文件扩展名
+        """
+        super().__init__(name="clip-recorder", daemon=True)
+        self.output_dir = output_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fourcc = fourcc
+        self.extension = extension
+        self.queue = queue.Queue()
+
+    def record(self, camera_id, buffer, trigger_time, detections=None, class_names=None, extra=None):
+        """
+        提交一个缺陷片段，不阻塞
+
+        参数:
+            camera_id: 摄像头ID
+            buffer: 该摄像头的FrameRingBuffer
+            trigger_time: 触发帧的采集时间戳
+            detections: 触发帧的检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]
+            class_names: 类别ID到名称的映射
+            extra: 写入JSON的其他信息
+        """
+        self.queue.put(("clip", (camera_id, buffer, trigger_time, detections, class_names, extra)))
+
+    def submit(self, func, *args):
+        """
+        提交其他写盘任务，不阻塞
+
+        参数:
+            func: 在写入线程中执行的函数
+            args: 函数参数
+        """
+        self.queue.put(("task", (func, args)))
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            kind, args = job
+            try:
+                if kind == "clip":
+                    self._write_clip(*args)
+                else:
+                    func, func_args = args
+                    func(*func_args)
+            except Exception as e:
+                print(f"写入缺陷记录时出错: {e}")
+
+    def _write_clip(self, camera_id, buffer, trigger_time, detections, class_names, extra):
+        # 等待触发后的图像进入缓冲区
+        wait = trigger_time + self.post_seconds - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+        with registry.timer("save", camera_id + 1):
+            self._save_frames(camera_id, buffer, trigger_time, detections, class_names, extra)
+    
+    def _save_frames(self, camera_id, buffer, trigger_time, detections, class_names, extra):
+        frames = buffer.snapshot(trigger_time - self.pre_seconds, trigger_time + self.post_seconds)
+        if not frames:
+            print(f"摄像头{camera_id+1}的缓冲区中没有图像，跳过片段保存")
+            return
+
+        trigger = datetime.datetime.fromtimestamp(trigger_time)
+        save_dir = os.path.join(self.output_dir, trigger.strftime("%Y%m%d"))
+        os.makedirs(save_dir, exist_ok=True)
+        base_path = os.path.join(save_dir, f"camera_{camera_id+1}_{trigger.strftime('%H%M%S_%f')[:-3]}")
+
+        # 按缓冲区中的实际时间间隔估算帧率
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if len(frames) > 1 and duration > 0 else 1.0
+
+        writer = None
+        try:
+            for _, data in frames:
+                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(base_path + self.extension, cv2.VideoWriter_fourcc(*self.fourcc),
+                                             fps, (width, height))
+                elif frame.shape[:2] != (height, width):
+                    # 视频中所有帧尺寸必须一致（图片目录回放时可能不同）
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+
+        metadata = {
+            "camera": camera_id + 1,
+            "trigger_time": trigger.isoformat(timespec="milliseconds"),
+            "clip": os.path.basename(base_path + self.extension),
+            "fps": round(fps, 2),
+            "pre_seconds": self.pre_seconds,
+            "post_seconds": self.post_seconds,
+            "frame_offsets": [round(timestamp - trigger_time, 3) for timestamp, _ in frames],
+            "detections": describe_detections(detections, class_names),
+        }
+        if extra:
+            metadata.update(extra)
+        with open(base_path + ".json", 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        print(f"已保存摄像头{camera_id+1}的缺陷片段: {base_path + self.extension}（{len(frames)}帧）")
+
+    def stop(self, timeout=None):
+        """
+        写完已提交的任务后停止线程
+
+        参数:
+            timeout: 等待线程退出的最长时间（秒），为None时一直等待
+        """
+        self.queue.put(None)
+        if self.is_alive():
+            self.join(timeout)
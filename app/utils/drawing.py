@@ -0,0 +1,25 @@
+import cv2
+
+
+def draw_detections(frame, detections, class_names):
+    """
+    在全分辨率图像的副本上绘制检测框和标签，用于保存标注图像
+
+    参数:
+        frame: BGR图像
+        detections: 检测数组，每行为[x1, y1, x2, y2, 置信度, 类别ID]
+        class_names: 类别ID到名称的映射
+
+    返回:
+        标记了检测结果的图像
+    """
+    annotated_frame = frame.copy()
+    color = (0, 255, 0)  # 绿色边框
+    for x1, y1, x2, y2, conf, cls_id in detections:
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        # 绘制边界框
+        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+        # 绘制类别和置信度
+        label = f"{class_names[int(cls_id)]}: {conf:.2f}"
+        cv2.putText(annotated_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return annotated_frame
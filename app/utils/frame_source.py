@@ -0,0 +1,232 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+import cv2
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.m4v']
+
+DEFAULT_FPS = 25.0  # 无法获取帧率时（如图片目录）使用的回放帧率
+
+
+class FrameSource(ABC):
+    """
+    回放帧源基类
+
+    提供与cv2.VideoCapture相同的read/isOpened/get/set/release接口，
+    可以直接交给CaptureThread和CameraWidget使用，用录像或图片代替摄像头；
+    子类实现_read_next()和_rewind()
+    """
+
+    def __init__(self, fps=DEFAULT_FPS, realtime=True, loop=True):
+        """
+        参数:
+            fps: 回放帧率
+            realtime: True时按fps实时回放，False时尽可能快地读取
+            loop: 播放到结尾后是否从头循环
+        """
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        self.realtime = realtime
+        self.loop = loop
+        self.frame_index = 0  # 已读取的帧数，用于计算实时回放的节拍
+        self.start_time = None
+
+    def read(self):
+        """
+        读取下一帧，实时回放时等待到该帧应出现的时间
+
+        返回:
+            (是否成功, 图像)
+        """
+        ret, frame = self._read_next()
+        if not ret and self.loop and self.frame_index > 0:
+            self._rewind()
+            ret, frame = self._read_next()
+        if not ret:
+            return False, None
+
+        if self.realtime:
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = now
+            due = self.start_time + self.frame_index / self.fps
+            if due > now:
+                time.sleep(due - now)
+            elif now - due > 1.0:
+                # 落后超过1秒（如调试暂停）时重新对齐节拍，不再追赶
+                self.start_time = now - self.frame_index / self.fps
+        self.frame_index += 1
+        return True, frame
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def set(self, prop_id, value):
+        # 回放帧源的分辨率由文件决定，忽略设置
+        return False
+
+    def release(self):
+        pass
+
+    @abstractmethod
+    def _read_next(self):
+        """
+        读取下一帧，不处理循环和节拍
+
+        返回:
+            (是否成功, 图像)
+        """
+
+    @abstractmethod
+    def _rewind(self):
+        """回到第一帧"""
+
+
+class VideoFileSource(FrameSource):
+    """视频文件帧源，按文件自身的帧率回放"""
+
+    def __init__(self, path, realtime=True, loop=True, fps=None):
+        """
+        参数:
+            path: 视频文件路径
+            realtime: True时按帧率实时回放，False时尽可能快地读取
+            loop: 播放到结尾后是否从头循环
+            fps: 回放帧率，为None时使用视频文件的帧率
+        """
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS), realtime, loop)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def get(self, prop_id):
+        if prop_id in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FRAME_COUNT):
+            return self.capture.get(prop_id)
+        return super().get(prop_id)
+
+    def release(self):
+        self.capture.release()
+
+    def _read_next(self):
+        return self.capture.read()
+
+    def _rewind(self):
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+
+class ImageSequenceSource(FrameSource):
+    """图片目录帧源，按文件名顺序逐张回放"""
+
+    def __init__(self, directory, realtime=True, loop=True, fps=DEFAULT_FPS):
+        """
+        参数:
+            directory: 图片目录
+            realtime: True时按fps实时回放，False时尽可能快地读取
+            loop: 播放到结尾后是否从头循环
+            fps: 回放帧率
+        """
+        super().__init__(fps, realtime, loop)
+        self.directory = directory
+        self.files = sorted(str(path) for path in Path(directory).iterdir()
+                            if path.suffix.lower() in IMAGE_EXTENSIONS)
+        self.position = 0
+        self.shape = None
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.files))
+        if prop_id in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self.shape is not None:
+            return float(self.shape[1] if prop_id == cv2.CAP_PROP_FRAME_WIDTH else self.shape[0])
+        return super().get(prop_id)
+
+    def _read_next(self):
+        # 跳过无法解码的文件
+        while self.position < len(self.files):
+            frame = cv2.imread(self.files[self.position])
+            self.position += 1
+            if frame is not None:
+                self.shape = frame.shape
+                return True, frame
+            print(f"无法读取图片: {self.files[self.position - 1]}")
+        return False, None
+
+    def _rewind(self):
+        self.position = 0
+
+
+def open_capture(source=None, device=0, realtime=True, loop=True, width=1280, height=720):
+    """
+    打开图像来源：回放源或摄像头
+
+    参数:
+        source: 回放源（视频文件或图片目录），为None时打开摄像头
+        device: 摄像头设备编号
+        realtime: 回放源是否按帧率实时播放
+        loop: 回放源播放到结尾后是否循环
+        width: 摄像头采集宽度
+        height: 摄像头采集高度
+
+    返回:
+        已打开的capture对象，失败时返回None
+    """
+    if source is not None:
+        capture = open_frame_source(source, realtime, loop)
+        if capture is None or not capture.isOpened():
+            print(f"无法打开回放源: {source}")
+            return None
+        return capture
+
+    # 方法1: 直接使用索引打开
+    capture = cv2.VideoCapture(device)
+
+    if not capture.isOpened():
+        print(f"方法1失败: 无法打开摄像头 {device}")
+
+        # 方法2: 使用DirectShow尝试打开
+        capture = cv2.VideoCapture(device, cv2.CAP_DSHOW)
+
+        if not capture.isOpened():
+            print(f"方法2失败: 无法使用DirectShow打开摄像头 {device}")
+
+            # 方法3: 使用默认的摄像头
+            capture = cv2.VideoCapture(0)
+
+            if not capture.isOpened():
+                print("方法3失败: 无法打开默认摄像头")
+                return None
+
+    # 设置摄像头参数 (可选)
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return capture
+
+
+def open_frame_source(source, realtime=True, loop=True, fps=None):
+    """
+    根据路径创建回放帧源
+
+    参数:
+        source: 视频文件路径或图片目录
+        realtime: True时按帧率实时回放，False时尽可能快地读取
+        loop: 播放到结尾后是否从头循环
+        fps: 回放帧率，为None时视频使用文件帧率、图片目录使用DEFAULT_FPS
+
+    返回:
+        帧源对象，路径不存在或格式不支持时返回None
+    """
+    if os.path.isdir(source):
+        return ImageSequenceSource(source, realtime, loop, fps or DEFAULT_FPS)
+    if os.path.isfile(source) and os.path.splitext(source)[1].lower() in VIDEO_EXTENSIONS:
+        return VideoFileSource(source, realtime, loop, fps)
+    print(f"不支持的回放源: {source}，应为视频文件或图片目录")
+    return None
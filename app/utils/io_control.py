@@ -1,4 +1,8 @@
+import collections
+import queue
+import threading
 import time
+from .metrics import registry
 
 # 注：这是一个模拟实现，实际应用中需要根据硬件情况进行调整
 # 在Windows系统上可以使用pyserial库控制串口
@@ -15,56 +19,360 @@ try:
     # 尝试导入RPi.GPIO库(树莓派)
     import RPi.GPIO as GPIO
     HAS_GPIO = True
-    # 设置GPIO引脚
-    GPIO_PIN = 17  # 使用GPIO17引脚输出信号
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(GPIO_PIN, GPIO.OUT)
-    GPIO.output(GPIO_PIN, GPIO.HIGH)  # 默认高电平
 except ImportError:
     HAS_GPIO = False
 
+# GPIO配置
+GPIO_PIN = 17  # 使用GPIO17引脚输出信号
+
 # 串口配置
 SERIAL_PORT = 'COM3'  # Windows系统通常为COMx，Linux系统通常为/dev/ttyUSBx
 SERIAL_BAUDRATE = 9600
 
-def send_low_signal():
+PULSE_DURATION = 0.5  # 低电平保持时间（秒）
+OPEN_RETRY_INTERVAL = 5.0  # 打开设备失败后重试的间隔（秒）
+WRITE_RETRY_INTERVAL = 0.1  # 输出失败后重新打开设备并重试的间隔（秒）
+PENDING_TIMEOUT = 10.0  # 设备不可用时触发信号最多暂存的时间（秒），超时记为丢失
+DEVICE_TYPES = ("auto", "gpio", "serial", "loopback")
+
+
+class GpioDevice:
+    """树莓派GPIO输出，默认高电平，缺陷时拉低"""
+
+    def __init__(self, pin=GPIO_PIN):
+        self.pin = pin
+        self.name = f"GPIO{pin}"
+        self.opened = False
+
+    def open(self):
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.pin, GPIO.OUT)
+        GPIO.output(self.pin, GPIO.HIGH)  # 默认高电平
+        self.opened = True
+
+    def set_low(self):
+        GPIO.output(self.pin, GPIO.LOW)
+
+    def set_high(self):
+        GPIO.output(self.pin, GPIO.HIGH)
+
+    def close(self):
+        if self.opened:
+            GPIO.cleanup(self.pin)
+            self.opened = False
+
+
+class SerialDevice:
     """
-    发送低电平信号
-    根据可用的硬件接口选择实现方式
+    串口输出，端口保持打开，缺陷时发送low_command
+
+    参数high_command为恢复时发送的命令，为None时恢复阶段不发送任何数据（与原有协议一致）
     """
-    if HAS_GPIO:
-        # 使用GPIO发送低电平
-        GPIO.output(GPIO_PIN, GPIO.LOW)
-        print("发送低电平信号(GPIO)")
-        time.sleep(0.5)  # 保持低电平0.5秒
-        GPIO.output(GPIO_PIN, GPIO.HIGH)  # 恢复高电平
-        return True
-    
-    elif HAS_SERIAL:
-        # 使用串口发送信号
+
+    def __init__(self, port=SERIAL_PORT, baudrate=SERIAL_BAUDRATE, low_command=b'L', high_command=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.low_command = low_command
+        self.high_command = high_command
+        self.name = f"串口{port}"
+        self.serial = None
+
+    @property
+    def opened(self):
+        return self.serial is not None
+
+    def open(self):
+        # write_timeout避免设备异常时写入无限阻塞
+        self.serial = serial.Serial(self.port, self.baudrate, timeout=1, write_timeout=1)
+
+    def set_low(self):
+        self.serial.write(self.low_command)
+        self.serial.flush()
+
+    def set_high(self):
+        if self.high_command:
+            self.serial.write(self.high_command)
+            self.serial.flush()
+
+    def close(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            finally:
+                self.serial = None
+
+
+class LoopbackDevice:
+    """
+    本地回环设备，不连接硬件，只记录引脚电平变化，用于测试和没有PLC的开发环境
+
+    参数delay为模拟的写入耗时（秒）
+    """
+
+    def __init__(self, delay=0.0, history=1000):
+        self.delay = delay
+        self.name = "回环设备"
+        self.opened = False
+        self.level = 1
+        self.events = collections.deque(maxlen=history)  # [(时间戳, 电平), ...]
+
+    def open(self):
+        self.opened = True
+        self.level = 1
+
+    def _write(self, level):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        self.level = level
+        self.events.append((time.perf_counter(), level))
+
+    def set_low(self):
+        self._write(0)
+
+    def set_high(self):
+        self._write(1)
+
+    def close(self):
+        self.opened = False
+
+
+def create_device(device_type="auto", serial_port=SERIAL_PORT, baudrate=SERIAL_BAUDRATE):
+    """
+    创建输出设备
+
+    参数:
+        device_type: auto（按GPIO、串口、回环的顺序选择可用的接口）、gpio、serial或loopback
+        serial_port: 串口名称
+        baudrate: 串口波特率
+
+    返回:
+        设备对象
+    """
+    if device_type not in DEVICE_TYPES:
+        raise ValueError(f"不支持的IO设备: {device_type}，可选: {', '.join(DEVICE_TYPES)}")
+    if device_type == "gpio" or (device_type == "auto" and HAS_GPIO):
+        if not HAS_GPIO:
+            raise ImportError("未安装RPi.GPIO，无法使用GPIO输出")
+        return GpioDevice()
+    if device_type == "serial" or (device_type == "auto" and HAS_SERIAL):
+        if not HAS_SERIAL:
+            raise ImportError("未安装pyserial，无法使用串口输出")
+        return SerialDevice(serial_port, baudrate)
+    # 如果没有可用硬件接口，则使用回环设备模拟发送
+    return LoopbackDevice()
+
+
+class IOController(threading.Thread):
+    """
+    非阻塞的PLC信号输出
+
+    后台线程启动时打开GPIO或串口连接并一直持有，打开失败时每隔OPEN_RETRY_INTERVAL秒重试，
+    第一次缺陷触发不用承担打开设备的耗时，设备问题也在启动时就能在日志中看到。
+    trigger()只把触发请求放入队列后立即返回；线程拉低电平，到时后再恢复高电平。
+    脉冲期间再次触发时延长低电平时间。每次触发记录从调用trigger()到引脚被拉低的延迟
+
+    设备不可用时触发信号暂存，设备重新打开后立即发出，超过PENDING_TIMEOUT秒仍未发出的记为丢失；
+    恢复高电平失败时保持低电平状态并继续重试，避免PLC信号线一直被拉低
+    """
+
+    def __init__(self, device=None, pulse_duration=PULSE_DURATION, history=1000):
+        """
+        初始化IO控制线程
+
+        参数:
+            device: 输出设备，为None时自动选择
+            pulse_duration: 低电平保持时间（秒）
+            history: 保留的延迟记录条数
+        """
+        super().__init__(name="io-control", daemon=True)
+        self.device = device if device is not None else create_device()
+        self.pulse_duration = pulse_duration
+        self.queue = queue.Queue()
+        self.latencies = collections.deque(maxlen=history)  # 触发到引脚拉低的延迟（秒）
+        self.trigger_count = 0
+        self.error_count = 0
+        self.lost_count = 0  # 因设备不可用未能发出的触发信号
+        self.retry_at = 0.0  # 设备未打开时下一次重试打开的时间
+
+    def trigger(self, camera=None):
+        """
+        发送一个低电平脉冲，不阻塞调用方
+        
+        参数:
+            camera: 触发的摄像头编号，用于延迟统计
+        """
+        self.queue.put((time.perf_counter(), camera))
+
+    def run(self):
+        self._open()
+        low = False
+        restore_at = 0.0
+        pending = None  # 设备不可用时暂存的触发(时间, 摄像头)，设备恢复后发出
+        while True:
+            if low:
+                timeout = max(0.0, restore_at - time.perf_counter())
+            elif pending is not None or not self.device.opened:
+                timeout = max(0.0, self.retry_at - time.perf_counter())
+            else:
+                timeout = None
+            try:
+                job = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                if low:
+                    # 脉冲时间到，恢复高电平；失败时保持低电平状态，等设备恢复后重试
+                    if self._write(self.device.set_high):
+                        low = False
+                    else:
+                        restore_at = self.retry_at
+                        continue
+                elif pending is None:
+                    self._open()
+                if pending is None:
+                    continue
+            else:
+                if job is None:
+                    break
+                self.trigger_count += 1
+                if pending is not None:
+                    # 设备仍不可用，与暂存的触发合并为同一个脉冲
+                    continue
+                pending = job
+
+            trigger_time, camera = pending
+            if not low:
+                if not self._write(self.device.set_low):
+                    if time.perf_counter() - trigger_time > PENDING_TIMEOUT:
+                        pending = None
+                        self.lost_count += 1
+                        print(f"{self.device.name}超过{PENDING_TIMEOUT:g}秒不可用，触发信号丢失")
+                    continue
+                low = True
+                print(f"发送低电平信号({self.device.name})")
+            pending = None
+            latency = time.perf_counter() - trigger_time
+            self.latencies.append(latency)
+            registry.observe("signal", camera if camera is not None else "all", latency)
+            restore_at = time.perf_counter() + self.pulse_duration
+
+        if pending is not None:
+            self.lost_count += 1
+            print(f"IO控制线程停止时{self.device.name}仍不可用，触发信号丢失")
+        if low:
+            self._write(self.device.set_high)
+        self.device.close()
+
+    def _open(self):
+        """
+        打开设备，失败时记录错误，OPEN_RETRY_INTERVAL秒后由线程重试
+
+        返回:
+            成功时返回True
+        """
+        try:
+            self.device.open()
+            print(f"已打开IO设备: {self.device.name}")
+            return True
+        except Exception as e:
+            self.error_count += 1
+            self.retry_at = time.perf_counter() + OPEN_RETRY_INTERVAL
+            print(f"打开{self.device.name}失败: {e}，{OPEN_RETRY_INTERVAL:g}秒后重试")
+            return False
+
+    def _write(self, action):
+        """
+        执行一次输出，连接未打开或已断开时立即重新打开
+
+        返回:
+            成功时返回True
+        """
+        if not self.device.opened and not self._open():
+            return False
         try:
-            ser = serial.Serial(SERIAL_PORT, SERIAL_BAUDRATE, timeout=1)
-            ser.write(b'L')  # 发送'L'表示低电平
-            print(f"通过串口{SERIAL_PORT}发送低电平信号")
-            time.sleep(0.5)
-            ser.close()
+            action()
             return True
         except Exception as e:
-            print(f"串口通信错误: {e}")
+            self.error_count += 1
+            print(f"{self.device.name}输出错误: {e}")
+            # 关闭连接，WRITE_RETRY_INTERVAL秒后由线程重新打开并重试
+            try:
+                self.device.close()
+            except Exception:
+                pass
+            self.retry_at = time.perf_counter() + WRITE_RETRY_INTERVAL
             return False
-    
-    else:
-        # 如果没有可用硬件接口，则模拟发送
-        print("模拟发送低电平信号(无硬件接口)")
-        time.sleep(0.5)
-        return True
+
+    def latency_stats(self):
+        """
+        返回:
+            触发到引脚拉低的延迟统计(ms)，包含count/mean/p50/p95/max和丢失的触发数lost，
+            无记录时为None；只有丢失记录时count为0，延迟各项为None
+        """
+        if not self.latencies:
+            if not self.lost_count:
+                return None
+            return {"count": 0, "lost": self.lost_count, "mean": None, "p50": None, "p95": None, "max": None}
+        values = sorted(self.latencies)
+        return {
+            "count": len(values),
+            "lost": self.lost_count,
+            "mean": sum(values) / len(values) * 1000,
+            "p50": values[len(values) // 2] * 1000,
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            "max": values[-1] * 1000,
+        }
+
+    def stop(self, timeout=2.0):
+        """
+        停止线程，恢复高电平并关闭设备
+
+        参数:
+            timeout: 等待线程退出的最长时间（秒）
+        """
+        self.queue.put(None)
+        if self.is_alive():
+            self.join(timeout)
+
+
+_default_controller = None
+_default_lock = threading.Lock()
+
+
+def get_controller():
+    """
+    获取模块级的默认IO控制线程，首次调用时创建并启动
+
+    返回:
+        IOController实例
+    """
+    global _default_controller
+    with _default_lock:
+        if _default_controller is None:
+            _default_controller = IOController()
+            _default_controller.start()
+        return _default_controller
+
+
+def send_low_signal():
+    """
+    发送低电平信号，不阻塞
+    根据可用的硬件接口选择实现方式
+    """
+    get_controller().trigger()
+    return True
+
 
 def cleanup():
     """
     清理硬件资源
     """
+    global _default_controller
+    with _default_lock:
+        if _default_controller is not None:
+            _default_controller.stop()
+            _default_controller = None
+
     if HAS_GPIO:
         GPIO.cleanup()
         print("GPIO资源已清理")
-    
-    print("IO控制清理完成") 
\ No newline at end of file
+
+    print("IO控制清理完成")
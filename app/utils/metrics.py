@@ -0,0 +1,268 @@
+import collections
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 各阶段延迟直方图的桶上限（秒），与Prometheus直方图的le标签对应
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 按流水线顺序排列的阶段名称
+STAGES = ("capture", "preprocess", "inference", "postprocess", "track", "render", "end_to_end", "signal", "save")
+
+METRIC_NAME = "chain_stage_latency_seconds"
+WINDOW_METRIC_NAME = "chain_stage_latency_window_seconds"
+
+
+class LatencyHistogram:
+    """
+    单个阶段的延迟统计
+
+    同时维护两种数据：累计的分桶计数（供Prometheus计算速率和分位数），
+    以及最近window秒的原始样本（供界面显示滚动分位数）
+    """
+
+    def __init__(self, window=60.0, max_samples=10000):
+        """
+        参数:
+            window: 滚动统计的时间窗口（秒）
+            max_samples: 窗口内最多保留的样本数
+        """
+        self.window = window
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = collections.deque(maxlen=max_samples)  # [(记录时间, 延迟), ...]
+
+    def observe(self, value, now):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.samples.append((now, value))
+
+    def window_values(self, now):
+        """
+        返回:
+            时间窗口内按大小排序的样本
+        """
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        return sorted(value for _, value in self.samples)
+
+
+def quantile(sorted_values, q):
+    """
+    计算已排序样本的分位数（最近秩）
+
+    参数:
+        sorted_values: 升序排列的样本
+        q: 分位数，0~1
+
+    返回:
+        分位数值，无样本时为None
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def escape_label(value):
+    """
+    按Prometheus文本格式转义标签值中的反斜杠、双引号和换行
+
+    参数:
+        value: 标签值
+
+    返回:
+        转义后的字符串
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    线程安全的分阶段、分摄像头延迟统计
+
+    各线程调用observe()或timer()记录延迟，界面叠加层读取summary()，
+    本地HTTP端点输出render_prometheus()的文本
+    """
+
+    def __init__(self, window=60.0):
+        """
+        参数:
+            window: 滚动统计的时间窗口（秒）
+        """
+        self.window = window
+        self.lock = threading.Lock()
+        self.histograms = {}  # {(阶段, 摄像头): LatencyHistogram}
+
+    def observe(self, stage, camera, seconds):
+        """
+        记录一次延迟
+
+        参数:
+            stage: 阶段名称
+            camera: 摄像头编号（从1开始），与摄像头无关时为"all"
+            seconds: 延迟（秒）
+        """
+        key = (stage, str(camera))
+        now = time.monotonic()
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram(self.window)
+            histogram.observe(seconds, now)
+
+    @contextlib.contextmanager
+    def timer(self, stage, camera):
+        """
+        记录with语句块耗时的上下文管理器
+
+        参数:
+            stage: 阶段名称
+            camera: 摄像头编号
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, camera, time.perf_counter() - start_time)
+
+    def summary(self, camera=None):
+        """
+        滚动窗口内各阶段的延迟分位数
+
+        参数:
+            camera: 只返回该摄像头的统计，为None时返回全部
+
+        返回:
+            {(阶段, 摄像头): {"count": 样本数, "p50": 秒, "p95": 秒, "max": 秒}}，按阶段顺序排列
+        """
+        now = time.monotonic()
+        result = {}
+        with self.lock:
+            for (stage, cam), histogram in self.histograms.items():
+                if camera is not None and cam != str(camera):
+                    continue
+                values = histogram.window_values(now)
+                if values:
+                    result[(stage, cam)] = {
+                        "count": len(values),
+                        "p50": quantile(values, 0.5),
+                        "p95": quantile(values, 0.95),
+                        "max": values[-1],
+                    }
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return dict(sorted(result.items(), key=lambda item: (order.get(item[0][0], len(order)), item[0])))
+
+    def render_prometheus(self):
+        """
+        生成Prometheus文本格式的指标
+
+        返回:
+            指标文本
+        """
+        now = time.monotonic()
+        histogram_lines = [
+            f"# HELP {METRIC_NAME} Per-stage pipeline latency.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        window_lines = [
+            f"# HELP {WINDOW_METRIC_NAME} Per-stage latency quantiles over the last {self.window:g} seconds.",
+            f"# TYPE {WINDOW_METRIC_NAME} gauge",
+        ]
+        with self.lock:
+            for (stage, camera), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{escape_label(stage)}",camera="{escape_label(camera)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.bucket_counts):
+                    cumulative += count
+                    histogram_lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                histogram_lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                histogram_lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram.sum:.6f}")
+                histogram_lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram.count}")
+
+                values = histogram.window_values(now)
+                for q in (0.5, 0.95, 0.99):
+                    value = quantile(values, q)
+                    if value is not None:
+                        window_lines.append(f'{WINDOW_METRIC_NAME}{{{labels},quantile="{q:g}"}} {value:.6f}')
+        return "\n".join(histogram_lines + window_lines) + "\n"
+
+
+def record_batch(registry, camera_ids, speeds, elapsed):
+    """
+    记录一次批量推理各阶段的延迟，批次中每个摄像头的图像都经历了整个批次的延迟
+
+    ultralytics给出的是每张图的平均预处理、推理、后处理耗时(ms)，
+    乘以批次大小得到批次耗时；ROI裁剪、坐标映射、切片合并等额外开销计入后处理
+
+    参数:
+        registry: MetricsRegistry实例
+        camera_ids: 批次中的摄像头ID列表（从0开始）
+        speeds: 与camera_ids对应的检测结果的speed字典列表
+        elapsed: 整个批次的耗时（秒）
+    """
+    stage_totals = {"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0}
+    for speed in speeds:
+        for stage, value in (speed or {}).items():
+            if value is not None and stage in stage_totals:
+                stage_totals[stage] += value / 1000
+    overhead = elapsed - sum(stage_totals.values())
+    stage_totals["postprocess"] += max(0.0, overhead)
+
+    for camera_id in camera_ids:
+        for stage, seconds in stage_totals.items():
+            registry.observe(stage, camera_id + 1, seconds)
+
+
+class MetricsServer(threading.Thread):
+    """只监听本机地址的Prometheus指标HTTP端点，GET /metrics返回指标文本"""
+
+    def __init__(self, registry, port=9108, host="127.0.0.1"):
+        """
+        参数:
+            registry: MetricsRegistry实例
+            port: 监听端口
+            host: 监听地址，默认只允许本机访问
+        """
+        super().__init__(name="metrics-server", daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不在控制台打印每次抓取的访问日志
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        """停止HTTP服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# 进程内共享的默认统计实例
+registry = MetricsRegistry()
@@ -0,0 +1,309 @@
+import hashlib
+import importlib.util
+import os
+import shutil
+from .geometry import box_iou
+
+# 支持的推理后端，除torch外都需要先把.pt模型导出为对应格式
+# openvino-int8为使用NNCF训练后量化的INT8 OpenVINO模型
+BACKENDS = ("torch", "onnxruntime", "openvino", "openvino-int8")
+
+# 后端对应的ultralytics导出格式和所需的Python包
+EXPORT_FORMATS = {
+    "onnxruntime": ("onnx", ("onnxruntime",)),
+    "openvino": ("openvino", ("openvino",)),
+    "openvino-int8": ("openvino", ("openvino", "nncf")),
+}
+
+# 导出模型的缓存目录
+CACHE_DIR = "model_cache"
+
+# INT8量化的校准图片目录，对应的YOLO标注位于同级的labels目录
+CALIBRATION_DIR = os.path.join("Chains", "images")
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 计算文件哈希时每次读取的字节数
+
+
+def file_sha256(path):
+    """
+    计算文件内容的SHA-256哈希，用于模型缓存和批量检测的结果清单
+
+    参数:
+        path: 文件路径
+
+    返回:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def directory_sha256(path):
+    """
+    计算目录下所有文件（含相对路径）的SHA-256哈希，用于区分不同校准数据导出的INT8模型
+
+    参数:
+        path: 目录路径
+
+    返回:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).replace(os.sep, "/").encode("utf-8"))
+            digest.update(file_sha256(file_path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def backend_available(backend):
+    """
+    检查推理后端所需的Python包是否已安装
+
+    参数:
+        backend: 后端名称
+
+    返回:
+        可用时返回True
+    """
+    return not missing_packages(backend)
+
+
+def missing_packages(backend):
+    """
+    列出推理后端缺少的Python包
+
+    参数:
+        backend: 后端名称
+
+    返回:
+        缺少的包名列表
+    """
+    if backend == "torch":
+        return []
+    return [name for name in EXPORT_FORMATS[backend][1] if importlib.util.find_spec(name) is None]
+
+
+def prepare_calibration_data(image_dir, names, dataset_dir):
+    """
+    准备INT8量化用的校准数据集
+
+    ultralytics加载数据集时会就地修复损坏的JPEG文件，
+    因此把图片和标注复制到dataset_dir中使用，不改动原始数据
+
+    参数:
+        image_dir: 校准图片目录，标注位于同级的labels目录
+        names: 类别名称字典
+        dataset_dir: 临时数据集目录
+
+    返回:
+        数据集yaml文件路径
+    """
+    label_dir = os.path.join(os.path.dirname(os.path.abspath(image_dir)), "labels")
+    shutil.copytree(image_dir, os.path.join(dataset_dir, "images"))
+    if os.path.isdir(label_dir):
+        shutil.copytree(label_dir, os.path.join(dataset_dir, "labels"))
+
+    yaml_path = os.path.join(dataset_dir, "calibration.yaml")
+    with open(yaml_path, 'w', encoding='utf-8') as f:
+        f.write(f"path: {os.path.abspath(dataset_dir)}\n")
+        f.write("train: images\n")
+        f.write("val: images\n")
+        f.write("names:\n")
+        for cls_id, name in sorted(names.items()):
+            f.write(f"  {cls_id}: {name}\n")
+    return yaml_path
+
+
+def export_model(model_path, backend, imgsz=640, cache_dir=CACHE_DIR, calibration_dir=CALIBRATION_DIR):
+    """
+    把.pt模型导出为指定后端的格式，导出结果按模型文件哈希缓存，只导出一次
+
+    缓存路径为 cache_dir/<模型哈希前16位>/，模型文件改变后哈希不同会重新导出；
+    INT8模型的文件名中还包含校准图片目录的哈希，换用其他校准数据时也会重新导出
+
+    参数:
+        model_path: .pt模型路径
+        backend: 推理后端，onnxruntime、openvino或openvino-int8
+        imgsz: 导出时的输入尺寸
+        cache_dir: 缓存目录
+        calibration_dir: openvino-int8量化时使用的校准图片目录
+
+    返回:
+        导出模型的路径（onnx文件或openvino模型目录）
+    """
+    from ultralytics import YOLO
+
+    export_format = EXPORT_FORMATS[backend][0]
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    model_dir = os.path.join(cache_dir, file_sha256(model_path)[:16])
+    int8 = backend == "openvino-int8"
+    if export_format == "onnx":
+        suffix = ".onnx"
+    elif int8:
+        # 使用校准图片做训练后量化
+        if not os.path.isdir(calibration_dir):
+            raise FileNotFoundError(f"找不到INT8校准图片目录: {calibration_dir}")
+        suffix = f"_int8_{directory_sha256(calibration_dir)[:8]}_openvino_model"
+    else:
+        suffix = "_openvino_model"
+    cached_path = os.path.join(model_dir, f"{stem}_{imgsz}{suffix}")
+
+    if os.path.exists(cached_path):
+        return cached_path
+
+    # 在临时目录中导出，完成后再移动到缓存路径，避免中断时留下不完整的缓存
+    print(f"正在导出{backend}模型: {model_path} -> {cached_path}")
+    tmp_dir = os.path.join(model_dir, f"tmp_{os.getpid()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        tmp_model = os.path.join(tmp_dir, f"{stem}_{imgsz}.pt")
+        shutil.copyfile(model_path, tmp_model)
+        model = YOLO(tmp_model)
+        export_args = {}
+        if int8:
+            export_args = {
+                "int8": True,
+                "data": prepare_calibration_data(calibration_dir, model.names, os.path.join(tmp_dir, "calibration")),
+            }
+        # 动态输入尺寸以支持不同的批次大小
+        exported = model.export(format=export_format, imgsz=imgsz, dynamic=True, **export_args)
+        os.replace(str(exported).rstrip("/\\"), cached_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return cached_path
+
+
+def resolve_model(model_path, backend="torch", imgsz=640, cache_dir=CACHE_DIR, calibration_dir=CALIBRATION_DIR):
+    """
+    确定指定后端实际要加载的模型路径，需要时导出并缓存
+
+    所需的包未安装或导出失败时回退到torch后端
+
+    参数:
+        model_path: .pt模型路径
+        backend: 推理后端，torch、onnxruntime、openvino或openvino-int8
+        imgsz: 导出时的输入尺寸
+        cache_dir: 导出模型的缓存目录
+        calibration_dir: openvino-int8量化时使用的校准图片目录
+
+    返回:
+        (模型路径, 实际使用的后端)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}，可选: {', '.join(BACKENDS)}")
+
+    if backend != "torch":
+        if not backend_available(backend):
+            print(f"未安装{', '.join(missing_packages(backend))}，回退到torch后端")
+        elif not os.path.isfile(model_path):
+            print(f"找不到模型文件{model_path}，无法导出，回退到torch后端")
+        else:
+            try:
+                return export_model(model_path, backend, imgsz, cache_dir, calibration_dir), backend
+            except Exception as e:
+                print(f"导出{backend}模型时出错: {e}，回退到torch后端")
+
+    return model_path, "torch"
+
+
+def load_model(model_path, backend="torch", imgsz=640, cache_dir=CACHE_DIR, calibration_dir=CALIBRATION_DIR):
+    """
+    按指定后端加载YOLO模型
+
+    参数:
+        model_path: .pt模型路径
+        backend: 推理后端，torch、onnxruntime、openvino或openvino-int8
+        imgsz: 导出时的输入尺寸
+        cache_dir: 导出模型的缓存目录
+        calibration_dir: openvino-int8量化时使用的校准图片目录
+
+    返回:
+        (YOLO模型, 实际使用的后端)
+    """
+    from ultralytics import YOLO
+
+    path, backend = resolve_model(model_path, backend, imgsz, cache_dir, calibration_dir)
+    if backend == "torch":
+        return YOLO(path), backend
+    return YOLO(path, task="detect"), backend
+
+
+def compare_results(reference, candidate, iou_threshold=0.9, conf_tolerance=0.05):
+    """
+    比较两个后端在同一张图片上的检测结果
+
+    参考结果中的每个框都需要在候选结果中找到同类别、IoU不低于iou_threshold、
+    置信度相差不超过conf_tolerance的框，且两边框数相同，才认为一致
+
+    参数:
+        reference: 参考后端（torch）的检测结果
+        candidate: 待比较后端的检测结果
+        iou_threshold: IoU阈值
+        conf_tolerance: 置信度容差
+
+    返回:
+        一致时返回True
+    """
+    ref_boxes = reference.boxes.xyxy.cpu().numpy().tolist()
+    ref_cls = reference.boxes.cls.cpu().numpy().tolist()
+    ref_conf = reference.boxes.conf.cpu().numpy().tolist()
+    cand_boxes = candidate.boxes.xyxy.cpu().numpy().tolist()
+    cand_cls = candidate.boxes.cls.cpu().numpy().tolist()
+    cand_conf = candidate.boxes.conf.cpu().numpy().tolist()
+
+    if len(ref_boxes) != len(cand_boxes):
+        return False
+
+    iou = box_iou(ref_boxes, cand_boxes)
+    unmatched = set(range(len(cand_boxes)))
+    for i, (cls_id, conf) in enumerate(zip(ref_cls, ref_conf)):
+        match = next((j for j in unmatched
+                      if cand_cls[j] == cls_id
+                      and abs(cand_conf[j] - conf) <= conf_tolerance
+                      and iou[i, j] >= iou_threshold), None)
+        if match is None:
+            return False
+        unmatched.discard(match)
+    return True
+
+
+def verify_backend(model_path, backend, images, conf_threshold=0.25, imgsz=640,
+                   iou_threshold=0.9, conf_tolerance=0.05, cache_dir=CACHE_DIR):
+    """
+    用一组图片检查导出后端与torch后端的检测框是否在容差范围内一致
+
+    参数:
+        model_path: .pt模型路径
+        backend: 待检查的后端
+        images: 图像列表
+        conf_threshold: 置信度阈值
+        imgsz: 输入尺寸
+        iou_threshold: IoU阈值
+        conf_tolerance: 置信度容差
+        cache_dir: 导出模型的缓存目录
+
+    返回:
+        (一致的图片数, 图片总数)
+    """
+    from ultralytics import YOLO
+
+    reference_model = YOLO(model_path)
+    candidate_model, used_backend = load_model(model_path, backend, imgsz, cache_dir)
+    if used_backend != backend:
+        print(f"{backend}后端不可用，跳过一致性检查")
+        return 0, 0
+
+    matched = 0
+    for img in images:
+        reference = reference_model(img, conf=conf_threshold, imgsz=imgsz, verbose=False)[0]
+        candidate = candidate_model(img, conf=conf_threshold, imgsz=imgsz, verbose=False)[0]
+        if compare_results(reference, candidate, iou_threshold, conf_tolerance):
+            matched += 1
+    return matched, len(images)
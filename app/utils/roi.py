@@ -0,0 +1,92 @@
+import json
+import os
+
+# 摄像头ROI配置文件，不存在时所有摄像头使用整幅画面
+ROI_CONFIG_FILE = "roi_config.json"
+
+
+def parse_roi(roi, camera_id):
+    """
+    检查并转换一个归一化ROI
+
+    参数:
+        roi: [x1, y1, x2, y2]，取值范围0~1
+        camera_id: 摄像头编号（从0开始），用于错误信息
+
+    返回:
+        (x1, y1, x2, y2)
+    """
+    x1, y1, x2, y2 = (float(v) for v in roi)
+    if not (0.0 <= x1 < x2 <= 1.0 and 0.0 <= y1 < y2 <= 1.0):
+        raise ValueError(f"摄像头{camera_id+1}的ROI无效: {roi}，应为0~1之间的[x1, y1, x2, y2]")
+    return x1, y1, x2, y2
+
+
+def load_roi_config(path=ROI_CONFIG_FILE, camera_count=4):
+    """
+    读取各摄像头的检测区域(ROI)配置
+
+    配置文件为JSON，键为摄像头编号（从0开始），值为归一化坐标[x1, y1, x2, y2]，例如：
+        {"0": [0.0, 0.35, 1.0, 0.65], "2": [0.1, 0.3, 0.9, 0.7]}
+    未配置的摄像头使用整幅画面
+
+    参数:
+        path: 配置文件路径
+        camera_count: 摄像头数量
+
+    返回:
+        长度为camera_count的列表，每项为(x1, y1, x2, y2)或None（整幅画面）
+    """
+    rois = [None] * camera_count
+    if not path or not os.path.exists(path):
+        return rois
+
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    for key, roi in config.items():
+        camera_id = int(key)
+        if not 0 <= camera_id < camera_count:
+            print(f"ROI配置中的摄像头编号{camera_id}超出范围，已忽略")
+            continue
+        rois[camera_id] = parse_roi(roi, camera_id)
+        print(f"摄像头{camera_id+1}检测区域: {rois[camera_id]}")
+    return rois
+
+
+def roi_to_pixels(roi, shape):
+    """
+    把归一化ROI转换为像素坐标
+
+    参数:
+        roi: 归一化坐标(x1, y1, x2, y2)，为None时表示整幅画面
+        shape: 图像形状(高, 宽, ...)
+
+    返回:
+        像素坐标(x1, y1, x2, y2)
+    """
+    height, width = shape[:2]
+    if roi is None:
+        return 0, 0, width, height
+    x1, y1, x2, y2 = roi
+    left, top = int(round(x1 * width)), int(round(y1 * height))
+    right, bottom = int(round(x2 * width)), int(round(y2 * height))
+    # 保证裁剪区域至少1个像素
+    return left, top, max(right, left + 1), max(bottom, top + 1)
+
+
+def crop_roi(frame, roi):
+    """
+    按ROI裁剪图像，返回的是原图的视图，不复制像素
+
+    参数:
+        frame: 输入图像
+        roi: 归一化坐标(x1, y1, x2, y2)，为None时返回原图
+
+    返回:
+        (裁剪后的图像, 裁剪区域左上角在原图中的坐标(x, y))
+    """
+    if roi is None:
+        return frame, (0, 0)
+    x1, y1, x2, y2 = roi_to_pixels(roi, frame.shape)
+    return frame[y1:y2, x1:x2], (x1, y1)
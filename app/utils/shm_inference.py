@@ -0,0 +1,433 @@
+import collections
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .drawing import draw_detections
+
+# 共享内存中每个槽位能容纳的最大图像，更大的图像（例如回放的大尺寸照片）复制前等比缩小
+MAX_FRAME_SHAPE = (1080, 1920, 3)
+
+# 检测进程中各计算库的线程数环境变量
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def fit_frame(frame, max_bytes):
+    """
+    把超过槽位大小的图像等比缩小到能放入槽位
+
+    参数:
+        frame: uint8图像
+        max_bytes: 槽位的字节数
+
+    返回:
+        (图像, 缩放比例)，不需要缩小时返回原图像和1.0
+    """
+    if frame.nbytes <= max_bytes:
+        return frame, 1.0
+    height, width = frame.shape[:2]
+    scale = (max_bytes / frame.nbytes) ** 0.5
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), size[0] / width
+
+
+class SharedFrameRing:
+    """
+    共享内存中的图像槽位环
+
+    主进程把待推理的图像复制到空闲槽位，检测进程按槽位编号和图像形状直接在共享内存上构造数组，
+    图像本身不经过pickle和管道传输
+    """
+
+    def __init__(self, slots, max_shape=MAX_FRAME_SHAPE, name=None):
+        """
+        参数:
+            slots: 槽位数
+            max_shape: 单个槽位能容纳的最大图像形状
+            name: 已有共享内存的名称，为None时创建新的共享内存（主进程），否则连接到已有的（检测进程）
+        """
+        self.slots = slots
+        self.slot_bytes = int(np.prod(max_shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+            self.owner = True
+        else:
+            # spawn启动的检测进程与主进程共用同一个resource_tracker，共享内存由主进程在close()时释放
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.lock = threading.Lock()
+        self.free = list(range(slots))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def view(self, slot, shape):
+        """
+        返回:
+            槽位上指定形状的uint8数组，与共享内存共用同一块内存
+        """
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def put(self, frame):
+        """
+        把图像复制到一个空闲槽位
+
+        参数:
+            frame: uint8图像
+
+        返回:
+            (槽位编号, 图像形状)，没有空闲槽位时返回None
+        """
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"图像尺寸{frame.shape}超过共享内存槽位的上限{self.slot_bytes}字节")
+        with self.lock:
+            if not self.free:
+                return None
+            slot = self.free.pop()
+        try:
+            np.copyto(self.view(slot, frame.shape), frame)
+        except Exception:
+            self.release(slot)
+            raise
+        return slot, frame.shape
+
+    def release(self, slot):
+        """归还槽位"""
+        with self.lock:
+            self.free.append(slot)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def available_cpus():
+    """
+    返回:
+        本进程允许使用的CPU编号列表，受cpuset/taskset限制时只包含允许的核
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _worker_main(index, shm_name, slots, max_shape, detector_args, threads, cpus, warmup_batches, warmup_shape,
+                 rois, tasks, results, current_jobs):
+    """
+    检测进程入口：固定线程数和CPU核，加载该进程自己的模型，循环处理任务
+
+    任务为(任务ID, [(槽位编号, 图像形状, 缩放比例), ...], ROI列表, 输入尺寸)，结果为("result", 任务ID, 检测数组列表, speed列表, 耗时)，
+    出错时为("error", 任务ID, 错误信息)。取到任务后先把任务ID写入共享数组current_jobs[index]，
+    进程意外退出时主进程据此找到丢失的任务。计算库的线程数环境变量由主进程在启动本进程时设置
+    """
+    try:
+        if cpus and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        import cv2
+        import torch
+        from ..detector.YoloDetector import YoloDetector
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(1)
+
+        ring = SharedFrameRing(slots, max_shape, shm_name)
+        start_time = time.perf_counter()
+        detector = YoloDetector(**detector_args)
+        load_time = time.perf_counter() - start_time
+        warmup_time = detector.warmup(warmup_batches, warmup_shape, rois)
+    except Exception as e:
+        results.put(("failed", index, str(e)))
+        return
+    results.put(("ready", index, {"load": load_time, "warmup": warmup_time, "names": detector.names,
+                                  "backend": detector.backend, "device": str(detector.device)}))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, frames, job_rois, imgsz = task
+        current_jobs[index] = job_id
+        try:
+            detector.imgsz = imgsz
+            start_time = time.perf_counter()
+            batch = detector.detect_batch([ring.view(slot, shape) for slot, shape, _ in frames], job_rois)
+            detections = [detector.to_detections(result) for result in batch]
+            # 提交时缩小过的图像，检测框映射回原图像的坐标
+            for frame_detections, (_, _, scale) in zip(detections, frames):
+                if scale != 1.0:
+                    frame_detections[:, :4] /= scale
+            speeds = [dict(result.speed or {}) for result in batch]
+            results.put(("result", job_id, detections, speeds, time.perf_counter() - start_time))
+        except Exception as e:
+            results.put(("error", job_id, str(e)))
+    ring.shm.close()
+
+
+class InferenceProcessPool:
+    """
+    多进程推理池
+
+    每个检测进程加载一个模型副本并固定推理线程数，绕开单个解释器的GIL，吞吐量随CPU核数增加。
+    图像经共享内存槽位传给检测进程，检测结果以紧凑的(N, 6)数组返回。
+    各进程从同一个任务队列取任务，空闲的进程先取到下一批。
+    运行中检测进程意外退出（内存不足、推理后端崩溃等）时，它正在处理的任务以错误结果返回并归还槽位，
+    再重启该进程；超过重启次数且没有可用的检测进程后提交任务会抛出RuntimeError
+    """
+
+    POLL_INTERVAL = 0.5  # 等待结果时检查检测进程是否意外退出的间隔（秒）
+    MAX_RESTARTS = 3  # 每个检测进程运行中意外退出后最多重启的次数
+
+    def __init__(self, detector_args, processes=2, threads=None, max_batch=4, max_shape=MAX_FRAME_SHAPE,
+                 warmup_batches=(1,), warmup_shape=(720, 1280, 3), rois=None, pin_cpus=True):
+        """
+        初始化推理池，start()后才会启动检测进程
+
+        参数:
+            detector_args: 传给YoloDetector的关键字参数
+            processes: 检测进程数
+            threads: 每个进程的推理线程数，为None时按本进程允许使用的CPU核数平均分配
+            max_batch: 每个任务最多包含的图像数
+            max_shape: 单张图像的最大形状
+            warmup_batches: 每个进程预热的批次大小
+            warmup_shape: 预热图像的形状
+            rois: 实际使用的检测区域列表，用于预热
+            pin_cpus: 是否把每个进程固定到允许使用的CPU核中不重叠的几个上（仅Linux）
+        """
+        self.processes = max(1, processes)
+        self.cpus = available_cpus()
+        self.threads = threads or max(1, len(self.cpus) // self.processes)
+        self.max_batch = max_batch
+        self.max_shape = max_shape
+        self.detector_args = detector_args
+        self.warmup_batches = warmup_batches
+        self.warmup_shape = warmup_shape
+        self.rois = rois
+        self.pin_cpus = pin_cpus and self.processes * self.threads <= len(self.cpus)
+
+        # 每个进程同时处理一个任务，每个任务最多max_batch张图
+        self.ring = SharedFrameRing(self.processes * max_batch, max_shape)
+        # 使用spawn启动，子进程不继承主进程中Qt和采集线程的状态
+        self.context = multiprocessing.get_context("spawn")
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.workers = []
+        self.jobs = {}  # {任务ID: 槽位列表}
+        self.next_job_id = 0
+        # 每个检测进程最近取到的任务ID，检测进程直接写入共享内存，退出前未来得及发出的消息不影响它
+        self.current_jobs = self.context.Array("q", [-1] * self.processes, lock=False)
+        self.restarts = [0] * self.processes
+        self.lost = collections.deque()  # 检测进程退出时丢失的任务，以错误结果的形式依次返回
+
+        self.names = {}
+        self.backend = detector_args.get("backend", "torch")
+        self.imgsz = detector_args.get("imgsz", 640)  # 推理输入尺寸，随任务发给检测进程，可以在运行中修改
+        self.device = "cpu"
+
+    @property
+    def capacity(self):
+        """可以同时处理的任务数"""
+        return self.processes
+
+    def start(self, timeout=600):
+        """
+        启动检测进程并等待所有进程完成模型加载和预热
+
+        参数:
+            timeout: 等待的最长时间（秒）
+
+        返回:
+            {"load": 最慢进程的加载耗时, "warmup": 最慢进程的预热耗时}
+
+        异常:
+            RuntimeError: 检测进程加载模型失败、意外退出或超时未就绪时关闭推理池并抛出
+        """
+        self.workers = [None] * self.processes
+        for index in range(self.processes):
+            self._start_worker(index)
+
+        timings = {"load": 0.0, "warmup": 0.0}
+        ready = set()
+        deadline = time.time() + timeout
+        while len(ready) < self.processes:
+            try:
+                message = self.results.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                # 进程在发出就绪或失败消息之前退出（例如被系统杀掉）时不再等到超时
+                exited = [(index, worker.exitcode) for index, worker in enumerate(self.workers)
+                          if index not in ready and not worker.is_alive()]
+                if exited:
+                    self.close()
+                    raise RuntimeError("检测进程意外退出: " + "，".join(
+                        f"进程{index}退出码{exitcode}" for index, exitcode in exited))
+                if time.time() > deadline:
+                    self.close()
+                    raise RuntimeError(f"等待检测进程加载模型超过{timeout}秒")
+                continue
+            if message[0] == "failed":
+                self.close()
+                raise RuntimeError(f"检测进程{message[1]}加载模型失败: {message[2]}")
+            ready.add(message[1])
+            info = message[2]
+            timings["load"] = max(timings["load"], info["load"])
+            timings["warmup"] = max(timings["warmup"], info["warmup"])
+            self.names, self.backend, self.device = info["names"], info["backend"], info["device"]
+        print(f"已启动 {self.processes} 个检测进程，每个进程 {self.threads} 个推理线程")
+        return timings
+
+    def _start_worker(self, index):
+        """
+        启动（或重启）一个检测进程
+
+        spawn启动的子进程会先重新导入主模块，numpy、cv2等在进入_worker_main之前就已加载，
+        因此计算库的线程数环境变量在主进程中设置，由子进程启动时继承，启动后恢复主进程原来的值
+        """
+        cpus = self.cpus[index * self.threads:(index + 1) * self.threads] if self.pin_cpus else None
+        worker = self.context.Process(
+            target=_worker_main, name=f"inference-{index}", daemon=True,
+            args=(index, self.ring.name, self.ring.slots, self.max_shape, self.detector_args, self.threads,
+                  cpus, self.warmup_batches, self.warmup_shape, self.rois, self.tasks, self.results,
+                  self.current_jobs))
+        saved = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+        os.environ.update({variable: str(self.threads) for variable in THREAD_VARIABLES})
+        try:
+            worker.start()
+        finally:
+            for variable, value in saved.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+        self.current_jobs[index] = -1
+        self.workers[index] = worker
+
+    def check_workers(self):
+        """
+        检查检测进程是否意外退出：退出进程正在处理的任务放入丢失列表并归还槽位，再重启该进程
+
+        返回:
+            发现丢失的任务时返回True
+        """
+        found = False
+        for index, worker in enumerate(self.workers):
+            if worker is None or worker.is_alive():
+                continue
+            job_id = self.current_jobs[index]
+            slots = self.jobs.pop(job_id, None)
+            message = f"检测进程{index}意外退出，退出码{worker.exitcode}"
+            if slots is not None:
+                for slot in slots:
+                    self.ring.release(slot)
+                self.lost.append(("error", job_id, message))
+                found = True
+            if self.restarts[index] < self.MAX_RESTARTS:
+                self.restarts[index] += 1
+                print(f"{message}，正在重启（第{self.restarts[index]}次）")
+                self._start_worker(index)
+            else:
+                print(f"{message}，已超过重启次数，不再重启")
+                self.workers[index] = None
+        return found
+
+    def submit(self, frames, rois=None):
+        """
+        把一批图像复制到共享内存并提交，不阻塞
+
+        超过槽位大小的图像先等比缩小，检测框由检测进程映射回原图像的坐标；
+        任何一张图像复制失败时，本批次已占用的槽位全部归还
+
+        参数:
+            frames: 图像列表，不超过max_batch张
+            rois: 与frames对应的归一化ROI列表
+
+        返回:
+            任务ID
+
+        异常:
+            RuntimeError: 所有检测进程都已退出且不再重启
+        """
+        if self.workers and not any(self.workers):
+            raise RuntimeError("所有检测进程都已意外退出，无法继续推理")
+        slots = []
+        try:
+            for frame in frames:
+                frame, scale = fit_frame(frame, self.ring.slot_bytes)
+                slot = self.ring.put(frame)
+                if slot is None:
+                    raise RuntimeError("共享内存槽位已用完，提交的任务超过了推理池的容量")
+                slots.append((slot[0], slot[1], scale))
+        except Exception:
+            for used, _, _ in slots:
+                self.ring.release(used)
+            raise
+
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        self.jobs[job_id] = [slot for slot, _, _ in slots]
+        self.tasks.put((job_id, slots, None if rois is None else list(rois), self.imgsz))
+        return job_id
+
+    def get_result(self, timeout=None):
+        """
+        取出一个完成的任务，并归还其共享内存槽位
+
+        等待期间每隔POLL_INTERVAL秒检查一次检测进程，退出进程正在处理的任务以错误结果返回
+
+        参数:
+            timeout: 等待的最长时间（秒），为None时一直等待
+
+        返回:
+            ("result", 任务ID, 检测数组列表, speed列表, 耗时)或("error", 任务ID, 错误信息)，超时返回None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if self.lost:
+                return self.lost.popleft()
+            remaining = self.POLL_INTERVAL if deadline is None else max(0.0, deadline - time.time())
+            try:
+                message = self.results.get(timeout=min(remaining, self.POLL_INTERVAL))
+            except queue.Empty:
+                if self.check_workers():
+                    continue
+                if deadline is not None and time.time() >= deadline:
+                    return None
+                continue
+            if message[0] == "ready":
+                print(f"检测进程{message[1]}已重启")
+                continue
+            if message[0] == "failed":
+                # 重启的进程加载模型失败后退出，下一次检查时按退出处理
+                print(f"检测进程{message[1]}重启后加载模型失败: {message[2]}")
+                continue
+            slots = self.jobs.pop(message[1], None)
+            if slots is None:
+                # 已按进程退出处理过的任务
+                continue
+            for slot in slots:
+                self.ring.release(slot)
+            return message
+
+    def draw_detections(self, frame, detections):
+        """在主进程中绘制检测结果，与YoloDetector.draw_detections相同"""
+        return draw_detections(frame, detections, self.names)
+
+    def close(self, timeout=5.0):
+        """
+        停止检测进程并释放共享内存
+
+        参数:
+            timeout: 等待每个进程退出的最长时间（秒）
+        """
+        workers = [worker for worker in self.workers if worker is not None]
+        for _ in workers:
+            self.tasks.put(None)
+        for worker in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+        self.ring.close()
@@ -0,0 +1,99 @@
+import torch
+import torchvision
+from ultralytics.engine.results import Results
+
+
+def tile_origins(length, tile_size, overlap):
+    """
+    计算一个方向上各切片的起点，最后一块切片与图像边缘对齐
+
+    参数:
+        length: 图像在该方向上的长度
+        tile_size: 切片边长
+        overlap: 相邻切片的重叠比例，0~1
+
+    返回:
+        起点列表
+    """
+    if length <= tile_size:
+        return [0]
+    stride = max(1, int(tile_size * (1 - overlap)))
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+
+def make_tiles(image, tile_size=640, overlap=0.2):
+    """
+    把图像切分为相互重叠的方形切片，切片是原图的视图，不复制像素
+
+    参数:
+        image: 输入图像
+        tile_size: 切片边长（像素）
+        overlap: 相邻切片的重叠比例，0~1
+
+    返回:
+        [(切片图像, 切片左上角在原图中的坐标(x, y)), ...]
+    """
+    height, width = image.shape[:2]
+    return [(image[y:y + tile_size, x:x + tile_size], (x, y))
+            for y in tile_origins(height, tile_size, overlap)
+            for x in tile_origins(width, tile_size, overlap)]
+
+
+def predict_tiled(model, images, tile_size=640, overlap=0.2, iou_threshold=0.5, **predict_args):
+    """
+    切片推理：所有图像的全部切片作为一个批次推理，
+    检测框平移回原图坐标后按类别做NMS，合并相邻切片重叠区域中的重复检测
+
+    参数:
+        model: YOLO模型
+        images: 图像列表
+        tile_size: 切片边长（像素）
+        overlap: 相邻切片的重叠比例，0~1
+        iou_threshold: 合并切片检测框时NMS的IoU阈值
+        predict_args: 传给模型的其余参数（conf、imgsz、device等）
+
+    返回:
+        与images一一对应的检测结果列表，检测框为原图坐标
+    """
+    tiles, offsets, owners = [], [], []
+    for index, image in enumerate(images):
+        for tile, offset in make_tiles(image, tile_size, overlap):
+            tiles.append(tile)
+            offsets.append(offset)
+            owners.append(index)
+    if not tiles:
+        return []
+
+    tile_results = model(tiles, **predict_args)
+
+    # 按原图收集各切片的检测框，平移到原图坐标
+    detections = [[] for _ in images]
+    names = tile_results[0].names
+    empty = tile_results[0].boxes.data.new_zeros((0, 6))
+    for result, (x, y), index in zip(tile_results, offsets, owners):
+        if len(result.boxes) == 0:
+            continue
+        data = result.boxes.data.clone()
+        data[:, [0, 2]] += x
+        data[:, [1, 3]] += y
+        detections[index].append(data)
+
+    # 每张图的耗时为其所有切片的耗时之和(ms)
+    speeds = [{"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0} for _ in images]
+    for result, index in zip(tile_results, owners):
+        for stage, value in (result.speed or {}).items():
+            if value is not None and stage in speeds[index]:
+                speeds[index][stage] += value
+
+    merged = []
+    for image, parts, speed in zip(images, detections, speeds):
+        if parts:
+            data = torch.cat(parts)
+            keep = torchvision.ops.batched_nms(data[:, :4], data[:, 4], data[:, 5], iou_threshold)
+            data = data[keep]
+        else:
+            data = empty
+        merged.append(Results(image, path="", names=names, boxes=data, speed=speed))
+    return merged
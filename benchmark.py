@@ -0,0 +1,286 @@
+import os
+import cv2
+import json
+import argparse
+import itertools
+import multiprocessing
+import platform
+import time
+from pathlib import Path
+import numpy as np
+from app.utils.model_export import BACKENDS
+from app.utils.tiling import make_tiles
+
+try:
+    # resource只在Linux/macOS上可用，用于读取进程峰值内存
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']
+
+def peak_rss_mb():
+    """
+    获取当前进程的峰值常驻内存
+
+    返回:
+        峰值内存(MB)，无法获取时返回None
+    """
+    if HAS_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS上单位为字节，Linux上为KB
+        return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+    if HAS_PSUTIL:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+    return None
+
+def load_workload(workload, image_dirs, synthetic_count, seed=0):
+    """
+    准备测试图像
+
+    参数:
+        workload: images（读取image_dirs中的图片）或synthetic（随机生成1280x720图像）
+        image_dirs: 图片目录列表
+        synthetic_count: 合成图像数量
+        seed: 合成图像的随机种子，保证多次运行可复现
+
+    返回:
+        图像列表
+    """
+    if workload == "synthetic":
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8) for _ in range(synthetic_count)]
+
+    frames = []
+    for image_dir in image_dirs:
+        for img_path in sorted(Path(image_dir).glob("*")):
+            if img_path.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            img = cv2.imread(str(img_path))
+            if img is not None:
+                frames.append(img)
+    return frames
+
+def percentile(sorted_values, q):
+    """
+    计算已排序数据的分位数（线性插值）
+
+    参数:
+        sorted_values: 升序排列的数据
+        q: 分位数，0~100
+
+    返回:
+        分位数值
+    """
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+def run_config(config, image_dirs, synthetic_count, iterations, warmup):
+    """
+    在独立子进程中测试一种配置，保证峰值内存和线程设置互不影响
+
+    参数:
+        config: 配置字典，包含model/backend/batch/imgsz/threads/workload/tile/tile_overlap
+        image_dirs: 图片目录列表
+        synthetic_count: 合成图像数量
+        iterations: 计时的批次数
+        warmup: 预热的批次数
+
+    返回:
+        测试结果字典
+    """
+    import torch
+    torch.set_num_threads(config["threads"])
+    cv2.setNumThreads(config["threads"])
+    from app.detector.YoloDetector import YoloDetector
+
+    frames = load_workload(config["workload"], image_dirs, synthetic_count)
+    if not frames:
+        return dict(config, error="没有可用的测试图像")
+
+    start_time = time.perf_counter()
+    detector = YoloDetector(config["model"], backend=config["backend"], imgsz=config["imgsz"],
+                            tile_size=config["tile"] or None, tile_overlap=config["tile_overlap"])
+    load_s = time.perf_counter() - start_time
+
+    # 循环取图组成批次
+    frame_cycle = itertools.cycle(frames)
+    batches = ([next(frame_cycle) for _ in range(config["batch"])] for _ in itertools.count())
+
+    start_time = time.perf_counter()
+    for _ in range(warmup):
+        detector.detect_batch(next(batches))
+    warmup_s = time.perf_counter() - start_time
+
+    latencies = []
+    run_start = time.perf_counter()
+    for _ in range(iterations):
+        batch = next(batches)
+        start_time = time.perf_counter()
+        detector.detect_batch(batch)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    total_s = time.perf_counter() - run_start
+
+    latencies.sort()
+    tiles = [len(make_tiles(frame, config["tile"], config["tile_overlap"])) if config["tile"] else 1
+             for frame in frames]
+    peak_mb = peak_rss_mb()
+    return dict(
+        config,
+        backend_used=detector.backend,
+        images=len(frames),
+        tiles_per_image=round(sum(tiles) / len(tiles), 2),
+        load_s=round(load_s, 3),
+        warmup_s=round(warmup_s, 3),
+        mean_ms=round(sum(latencies) / len(latencies), 2),
+        p50_ms=round(percentile(latencies, 50), 2),
+        p95_ms=round(percentile(latencies, 95), 2),
+        p99_ms=round(percentile(latencies, 99), 2),
+        images_per_s=round(iterations * config["batch"] / total_s, 2),
+        peak_rss_mb=None if peak_mb is None else round(peak_mb, 1),
+    )
+
+def machine_info():
+    """
+    收集运行环境信息，便于比较不同机器上的结果
+
+    返回:
+        环境信息字典
+    """
+    import torch
+    import ultralytics
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "ultralytics": ultralytics.__version__,
+        "opencv": cv2.__version__,
+        "cuda": torch.cuda.is_available(),
+    }
+    for package in ("onnxruntime", "openvino"):
+        try:
+            info[package] = __import__(package).__version__
+        except ImportError:
+            pass
+    return info
+
+def run_benchmark(model_path, backends, batch_sizes, imgsz_list, thread_counts, workloads,
+                  image_dirs, synthetic_count=16, iterations=20, warmup=3, tile_sizes=(0,), tile_overlap=0.2):
+    """
+    依次测试所有配置组合
+
+    参数:
+        model_path: 模型路径
+        backends: 推理后端列表
+        batch_sizes: 批次大小列表
+        imgsz_list: 推理输入尺寸列表
+        thread_counts: 推理线程数列表
+        workloads: 测试图像来源列表（images/synthetic）
+        image_dirs: 图片目录列表
+        synthetic_count: 合成图像数量
+        iterations: 每种配置计时的批次数
+        warmup: 每种配置预热的批次数
+        tile_sizes: 切片边长列表，0表示不切片、整幅图像推理一次
+        tile_overlap: 切片推理时相邻切片的重叠比例
+
+    返回:
+        测试结果列表
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for backend, batch, imgsz, threads, workload, tile in itertools.product(
+            backends, batch_sizes, imgsz_list, thread_counts, workloads, tile_sizes):
+        config = {
+            "model": model_path,
+            "backend": backend,
+            "batch": batch,
+            "imgsz": imgsz,
+            "threads": threads,
+            "workload": workload,
+            "tile": tile,
+            "tile_overlap": tile_overlap,
+        }
+        print(f"测试配置: {backend} batch={batch} imgsz={imgsz} threads={threads} workload={workload} tile={tile}")
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_config, (config, image_dirs, synthetic_count, iterations, warmup))
+        results.append(result)
+        print_result(result)
+    return results
+
+def print_result(result):
+    """
+    打印一种配置的测试结果
+
+    参数:
+        result: 测试结果字典
+    """
+    if "error" in result:
+        print(f"  出错: {result['error']}")
+        return
+    print(f"  每张图 {result['tiles_per_image']} 个切片，加载 {result['load_s']:.2f}s，预热 {result['warmup_s']:.2f}s，"
+          f"p50/p95/p99 {result['p50_ms']:.1f}/{result['p95_ms']:.1f}/{result['p99_ms']:.1f} ms，"
+          f"{result['images_per_s']:.2f} 张/秒，峰值内存 {result['peak_rss_mb']} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YoloDetector推理性能基准测试")
+    parser.add_argument("--model", "-m", type=str, default="best.pt", help="YOLOv8模型路径")
+    parser.add_argument("--images", nargs="+", default=[os.path.join("Chains", "images"), "pic"],
+                        help="images测试集使用的图片目录")
+    parser.add_argument("--synthetic", type=int, default=16, help="synthetic测试集的1280x720合成图像数量")
+    parser.add_argument("--workloads", nargs="+", default=["images", "synthetic"], choices=["images", "synthetic"],
+                        help="测试图像来源")
+    parser.add_argument("--backend", nargs="+", default=["torch"], choices=BACKENDS, help="推理后端列表")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 4], help="批次大小列表")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[640], help="推理输入尺寸列表")
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count() or 1],
+                        help="推理线程数列表（torch和OpenCV的线程数）")
+    parser.add_argument("--tile", nargs="+", type=int, default=[0],
+                        help="切片边长列表，0表示整幅图像推理一次（用于对比切片推理的开销）")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="切片推理时相邻切片的重叠比例")
+    parser.add_argument("--iterations", type=int, default=20, help="每种配置计时的批次数")
+    parser.add_argument("--warmup", type=int, default=3, help="每种配置预热的批次数")
+    parser.add_argument("--output", "-o", type=str, default=None,
+                        help="结果JSON文件路径（默认：benchmarks/benchmark_时间.json）")
+
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        model_path=args.model,
+        backends=args.backend,
+        batch_sizes=args.batch,
+        imgsz_list=args.imgsz,
+        thread_counts=args.threads,
+        workloads=args.workloads,
+        image_dirs=args.images,
+        synthetic_count=args.synthetic,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        tile_sizes=args.tile,
+        tile_overlap=args.tile_overlap
+    )
+
+    output_path = args.output or os.path.join("benchmarks", f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "machine": machine_info(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"测试结果已保存到: {output_path}")
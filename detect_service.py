@@ -0,0 +1,35 @@
+import time
+START_TIME = time.perf_counter()  # 启动耗时从进程开始导入模块时计算
+
+import argparse
+import signal
+import sys
+from app.DetectionService import DetectionService, EventLog, load_service_config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="铁链缺陷检测服务（无界面）")
+    parser.add_argument("--config", type=str, required=True,
+                        help="服务配置文件（JSON），包含模型、IO输出和摄像头配置")
+    parser.add_argument("--log-file", type=str, default=None,
+                        help="结构化日志文件（每行一个JSON事件），默认写到标准输出")
+    args = parser.parse_args()
+
+    event_log = EventLog(args.log_file)
+    service = DetectionService(load_service_config(args.config), event_log, START_TIME)
+
+    # 收到SIGTERM（systemd、docker stop）或Ctrl+C时结束检测循环，再释放摄像头和IO
+    def handle_signal(signum, frame):
+        event_log.log("signal", signal=signal.Signals(signum).name)
+        service.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    if not service.start():
+        event_log.close()
+        sys.exit(1)
+    try:
+        service.run()
+    finally:
+        service.close()
+        event_log.close()
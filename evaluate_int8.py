@@ -0,0 +1,257 @@
+import os
+import cv2
+import shutil
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from app.utils.geometry import box_iou
+from app.utils.model_export import BACKENDS, CALIBRATION_DIR, load_model
+
+def load_yolo_labels(label_path, width, height):
+    """
+    读取YOLO格式的标注文件，转换为像素坐标
+
+    参数:
+        label_path: 标注文件路径，每行为"类别 cx cy w h"（归一化坐标）
+        width: 图片宽度
+        height: 图片高度
+
+    返回:
+        [(类别ID, [x1, y1, x2, y2]), ...]
+    """
+    labels = []
+    if not os.path.exists(label_path):
+        return labels
+
+    with open(label_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls_id = int(parts[0])
+            cx, cy, w, h = (float(v) for v in parts[1:5])
+            labels.append((cls_id, [(cx - w / 2) * width, (cy - h / 2) * height,
+                                    (cx + w / 2) * width, (cy + h / 2) * height]))
+    return labels
+
+def label_dir_for(image_dir):
+    """返回图片目录同级的labels目录，与INT8校准数据的目录约定一致"""
+    return os.path.join(os.path.dirname(os.path.abspath(image_dir)), "labels")
+
+def load_samples(image_paths, label_dir):
+    """
+    读取图片和对应的YOLO标注
+
+    参数:
+        image_paths: 图片路径列表
+        label_dir: 标注目录，标注文件与图片同名
+
+    返回:
+        [(图像, 标注), ...]，无法读取的图片被跳过
+    """
+    samples = []
+    for img_path in image_paths:
+        img = cv2.imread(str(img_path))
+        if img is None:
+            continue
+        height, width = img.shape[:2]
+        label_path = os.path.join(label_dir, f"{Path(img_path).stem}.txt")
+        samples.append((img, load_yolo_labels(label_path, width, height)))
+    return samples
+
+def split_holdout(image_dir, every, split_dir):
+    """
+    从校准图片中每隔every张留出一张作为评估集，其余图片和标注复制到split_dir中作为校准数据
+
+    量化时见过的图片上精度损失偏小，在留出的图片上评估才能反映现场新画面的精度
+
+    参数:
+        image_dir: 原校准图片目录，标注位于同级的labels目录
+        every: 留出间隔
+        split_dir: 存放校准数据的临时目录
+
+    返回:
+        (校准图片目录, 评估图片路径列表)
+    """
+    image_paths = sorted(path for path in Path(image_dir).glob("*") if path.is_file())
+    eval_paths = image_paths[every - 1::every]
+    calibration_dir = os.path.join(split_dir, "images")
+    os.makedirs(calibration_dir)
+    os.makedirs(os.path.join(split_dir, "labels"))
+    label_dir = label_dir_for(image_dir)
+    held_out = set(eval_paths)
+    for path in image_paths:
+        if path in held_out:
+            continue
+        shutil.copy2(path, calibration_dir)
+        label_path = os.path.join(label_dir, f"{path.stem}.txt")
+        if os.path.exists(label_path):
+            shutil.copy2(label_path, os.path.join(split_dir, "labels"))
+    return calibration_dir, eval_paths
+
+def match_detections(detections, labels, iou_threshold=0.5):
+    """
+    按置信度从高到低把检测框与标注框一一匹配（同类别且IoU不低于阈值）
+
+    参数:
+        detections: [(类别ID, 置信度, [x1, y1, x2, y2]), ...]
+        labels: [(类别ID, [x1, y1, x2, y2]), ...]
+        iou_threshold: IoU阈值
+
+    返回:
+        (TP, FP, FN, 每个标注框是否被检出的列表)
+    """
+    matched = [False] * len(labels)
+    tp = 0
+    detections = sorted(detections, key=lambda d: -d[1])
+    iou = box_iou([box for _, _, box in detections], [box for _, box in labels])
+    for i, (cls_id, _, _) in enumerate(detections):
+        best_iou, best_j = 0.0, -1
+        for j, (label_cls, _) in enumerate(labels):
+            if matched[j] or label_cls != cls_id:
+                continue
+            if iou[i, j] > best_iou:
+                best_iou, best_j = iou[i, j], j
+        if best_j >= 0 and best_iou >= iou_threshold:
+            matched[best_j] = True
+            tp += 1
+    return tp, len(detections) - tp, len(labels) - tp, matched
+
+def evaluate(model_path, backend, samples, conf_threshold=0.25, iou_threshold=0.5, imgsz=640, warmup=3,
+             calibration_dir=CALIBRATION_DIR):
+    """
+    在带标注的图片上评估一个后端的速度和精度
+
+    参数:
+        model_path: .pt模型路径
+        backend: 推理后端
+        samples: [(图像, 标注), ...]
+        conf_threshold: 置信度阈值
+        iou_threshold: 匹配标注的IoU阈值
+        imgsz: 推理输入尺寸
+        warmup: 计时前的预热推理次数
+        calibration_dir: INT8量化的校准图片目录
+
+    返回:
+        评估结果字典，后端不可用时返回None
+    """
+    model, used_backend = load_model(model_path, backend, imgsz, calibration_dir=calibration_dir)
+    if used_backend != backend:
+        return None
+
+    # 预热，避免首次推理的初始化开销计入延迟
+    for img, _ in samples[:warmup]:
+        model(img, conf=conf_threshold, imgsz=imgsz, verbose=False)
+
+    latencies = []
+    tp = fp = fn = 0
+    class_total = {}
+    class_found = {}
+    for img, labels in samples:
+        start_time = time.perf_counter()
+        results = model(img, conf=conf_threshold, imgsz=imgsz, verbose=False)[0]
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+        detections = list(zip(results.boxes.cls.cpu().numpy().astype(int).tolist(),
+                              results.boxes.conf.cpu().numpy().tolist(),
+                              results.boxes.xyxy.cpu().numpy().tolist()))
+        img_tp, img_fp, img_fn, matched = match_detections(detections, labels, iou_threshold)
+        tp += img_tp
+        fp += img_fp
+        fn += img_fn
+        for (cls_id, _), found in zip(labels, matched):
+            class_total[cls_id] = class_total.get(cls_id, 0) + 1
+            class_found[cls_id] = class_found.get(cls_id, 0) + int(found)
+
+    latencies.sort()
+    mean_ms = sum(latencies) / len(latencies)
+    return {
+        "backend": backend,
+        "names": model.names,
+        "mean_ms": mean_ms,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "fps": 1000 / mean_ms if mean_ms > 0 else 0.0,
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "class_recall": {cls_id: class_found[cls_id] / total for cls_id, total in class_total.items()},
+    }
+
+def print_comparison(baseline, candidate):
+    """
+    打印两个后端的速度和精度对比
+
+    参数:
+        baseline: 基准后端的评估结果
+        candidate: 量化后端的评估结果
+    """
+    print(f"{'后端':<16}{'平均延迟(ms)':>14}{'P95(ms)':>10}{'FPS':>8}{'精确率':>10}{'召回率':>10}")
+    for result in (baseline, candidate):
+        print(f"{result['backend']:<16}{result['mean_ms']:>14.1f}{result['p95_ms']:>10.1f}{result['fps']:>8.1f}"
+              f"{result['precision']:>10.3f}{result['recall']:>10.3f}")
+
+    speedup = baseline["mean_ms"] / candidate["mean_ms"] if candidate["mean_ms"] > 0 else 0.0
+    print(f"\n加速比: {speedup:.2f}x")
+    print(f"召回率变化: {candidate['recall'] - baseline['recall']:+.3f}")
+    print(f"精确率变化: {candidate['precision'] - baseline['precision']:+.3f}")
+
+    print("\n各类别召回率:")
+    for cls_id in sorted(baseline["class_recall"]):
+        name = baseline["names"].get(cls_id, str(cls_id))
+        base_recall = baseline["class_recall"][cls_id]
+        cand_recall = candidate["class_recall"].get(cls_id, 0.0)
+        print(f"- {name}: {base_recall:.3f} -> {cand_recall:.3f} ({cand_recall - base_recall:+.3f})")
+
+def compare_backends(args, calibration_dir, samples):
+    """评估基准后端和量化后端并打印对比结果"""
+    if not samples:
+        print("没有可用于评估的图片")
+        return
+    print(f"校准图片目录: {calibration_dir}")
+    print(f"评估集共 {len(samples)} 张图片，{sum(len(labels) for _, labels in samples)} 个标注框")
+    baseline = evaluate(args.model, args.baseline, samples, args.conf, args.iou, args.imgsz,
+                        calibration_dir=calibration_dir)
+    candidate = evaluate(args.model, args.backend, samples, args.conf, args.iou, args.imgsz,
+                         calibration_dir=calibration_dir)
+    if baseline is None or candidate is None:
+        print("所选后端不可用，无法对比")
+    else:
+        print_comparison(baseline, candidate)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比INT8量化模型与原始模型在标注数据上的速度和精度")
+    parser.add_argument("--model", "-m", type=str, default="best.pt", help="YOLOv8模型路径")
+    parser.add_argument("--calibration-dir", type=str, default=CALIBRATION_DIR,
+                        help="INT8量化的校准图片目录，标注位于同级的labels目录")
+    parser.add_argument("--eval-dir", type=str, default=None,
+                        help="评估图片目录，必须与校准图片不同，标注位于同级的labels目录；"
+                             "不指定时从校准图片中按--holdout-every留出评估集")
+    parser.add_argument("--labels", type=str, default=None, help="评估图片的YOLO格式标注目录，默认为评估图片同级的labels目录")
+    parser.add_argument("--holdout-every", type=int, default=5, help="未指定--eval-dir时，每隔多少张校准图片留出一张用于评估")
+    parser.add_argument("--conf", "-c", type=float, default=0.25, help="置信度阈值")
+    parser.add_argument("--iou", type=float, default=0.5, help="检测框与标注框匹配的IoU阈值")
+    parser.add_argument("--imgsz", type=int, default=640, help="推理输入尺寸")
+    parser.add_argument("--baseline", type=str, default="torch", choices=BACKENDS, help="基准后端")
+    parser.add_argument("--backend", type=str, default="openvino-int8", choices=BACKENDS, help="待评估的量化后端")
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.calibration_dir):
+        print(f"找不到校准图片目录: {args.calibration_dir}")
+    elif args.eval_dir is not None:
+        if not os.path.isdir(args.eval_dir):
+            print(f"找不到评估图片目录: {args.eval_dir}")
+        elif os.path.samefile(args.eval_dir, args.calibration_dir):
+            print("评估图片目录不能与校准图片目录相同，否则评估的是量化时见过的图片")
+        else:
+            image_paths = sorted(path for path in Path(args.eval_dir).glob("*") if path.is_file())
+            samples = load_samples(image_paths, args.labels or label_dir_for(args.eval_dir))
+            compare_backends(args, args.calibration_dir, samples)
+    elif args.holdout_every < 2:
+        print("--holdout-every至少为2，否则没有剩余的校准图片")
+    else:
+        with tempfile.TemporaryDirectory() as split_dir:
+            calibration_dir, image_paths = split_holdout(args.calibration_dir, args.holdout_every, split_dir)
+            print(f"从校准图片中留出 {len(image_paths)} 张作为评估集")
+            samples = load_samples(image_paths, args.labels or label_dir_for(args.calibration_dir))
+            compare_backends(args, calibration_dir, samples)
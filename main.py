@@ -1,9 +1,73 @@
+import time
+START_TIME = time.perf_counter()  # 启动耗时从进程开始导入模块时计算
+
 import sys
+import argparse
 from PyQt5.QtWidgets import QApplication
 from app.MainWindow import MainWindow
+from app.utils.model_export import BACKENDS
+from app.utils.roi import ROI_CONFIG_FILE
+from app.utils.io_control import DEVICE_TYPES, SERIAL_PORT
+from app.utils.camera_config import CAMERA_CONFIG_FILE
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = MainWindow()
+    parser = argparse.ArgumentParser(description="铁链缺陷检测系统")
+    parser.add_argument("--backend", type=str, default="torch", choices=BACKENDS, help="推理后端")
+    parser.add_argument("--change-threshold", type=float, default=2.0,
+                        help="画面变化门控阈值（平均灰度差），画面变化低于该值时跳过推理，0表示每帧都推理")
+    parser.add_argument("--roi-config", type=str, default=ROI_CONFIG_FILE,
+                        help="各摄像头检测区域(ROI)配置文件，不存在时检测整幅画面")
+    parser.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                        help="切片推理：把画面切成SIZE像素的重叠方块一起推理，提高小缺陷的检出率")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="切片推理时相邻切片的重叠比例")
+    parser.add_argument("--tile-iou", type=float, default=0.5, help="切片推理时合并各切片检测框的NMS IoU阈值")
+    parser.add_argument("--camera-config", type=str, default=CAMERA_CONFIG_FILE,
+                        help="摄像头配置文件（摄像头数量、来源、调度策略、优先级和截止时间），不存在时使用4路摄像头")
+    parser.add_argument("--sources", nargs="+", default=None, metavar="SOURCE",
+                        help="按顺序代替各路摄像头的回放源（视频文件或图片目录），写camera表示该路不覆盖配置文件中的来源，"
+                             "多于配置的摄像头数时增加摄像头")
+    parser.add_argument("--fast", action="store_true", help="回放源尽可能快地读取，不按帧率实时播放")
+    parser.add_argument("--no-loop", action="store_false", dest="loop", help="回放源播放到结尾后停止，不循环")
+    parser.add_argument("--io-device", type=str, default="auto", choices=DEVICE_TYPES,
+                        help="缺陷信号输出设备，loopback不连接硬件，用于测试")
+    parser.add_argument("--serial-port", type=str, default=SERIAL_PORT, help="串口输出时使用的串口")
+    parser.add_argument("--clip-pre", type=float, default=3.0, help="缺陷片段包含的触发前时长（秒）")
+    parser.add_argument("--clip-post", type=float, default=2.0,
+                        help="缺陷片段包含的触发后时长（秒），与--clip-pre都为0时不保存片段")
+    parser.add_argument("--metrics-overlay", action="store_true", help="在每路画面上叠加显示各阶段的延迟统计")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在127.0.0.1的该端口上提供Prometheus格式的延迟指标(/metrics)")
+    parser.add_argument("--detect-every", type=int, default=1, metavar="K",
+                        help="每路摄像头每K帧运行一次完整模型，中间的帧用光流跟踪检测框")
+    parser.add_argument("--confirm-frames", type=int, default=1, metavar="N",
+                        help="同一缺陷被连续检出N次后才确认并暂停，过滤单帧误检")
+    parser.add_argument("--imgsz", type=int, default=640, help="推理输入尺寸，启用--latency-target时为初始尺寸")
+    parser.add_argument("--latency-target", type=float, default=None, metavar="MS",
+                        help="端到端延迟目标（毫秒），按实测延迟自动在--min-imgsz和--max-imgsz之间调整输入尺寸")
+    parser.add_argument("--min-imgsz", type=int, default=320, help="自动调整时的输入尺寸下限")
+    parser.add_argument("--max-imgsz", type=int, default=1280, help="自动调整时的输入尺寸上限")
+    parser.add_argument("--min-batch", type=int, default=None,
+                        help="自动调整时的批次大小下限，输入尺寸已到下限仍超过目标时减小批次，默认不调整批次")
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="启动N个检测进程同时推理不同的批次，图像经共享内存传递，0表示在检测线程中推理")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="每个检测进程的推理线程数，默认按CPU核数平均分配")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = MainWindow(backend=args.backend, change_threshold=args.change_threshold,
+                        roi_config=args.roi_config, tile_size=args.tile, tile_overlap=args.tile_overlap,
+                        tile_iou=args.tile_iou,
+                        sources=[None if source == "camera" else source for source in args.sources or []],
+                        realtime=not args.fast, loop=args.loop,
+                        io_device=args.io_device, serial_port=args.serial_port,
+                        clip_pre=args.clip_pre, clip_post=args.clip_post,
+                        metrics_overlay=args.metrics_overlay, metrics_port=args.metrics_port,
+                        detect_interval=args.detect_every, confirm_frames=args.confirm_frames,
+                        camera_config=args.camera_config, start_time=START_TIME,
+                        processes=args.processes, threads=args.threads, imgsz=args.imgsz,
+                        latency_target=args.latency_target / 1000 if args.latency_target else None,
+                        min_imgsz=args.min_imgsz, max_imgsz=args.max_imgsz, min_batch=args.min_batch)
     window.show()
-    sys.exit(app.exec_()) 
\ No newline at end of file
+    print(f"窗口已显示: 启动 {time.perf_counter() - START_TIME:.2f} s，模型在后台加载")
+    sys.exit(app.exec_())
@@ -6,8 +6,591 @@ from pathlib import Path
 from ultralytics import YOLO
 import numpy as np
 import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.util
+import torch
+from app.utils.model_export import BACKENDS, file_sha256, load_model, resolve_model, verify_backend
+from app.utils.tiling import predict_tiled
 
-def process_images(input_dir, output_dir, model_path="best.pt", conf_threshold=0.25, save_annotated=True, save_crops=False):
+CSV_BUFFER_SIZE = 1024 * 1024  # results.csv写入缓冲区大小
+
+def load_image(img_path):
+    """
+    读取单张图片并计算内容哈希（在线程池中执行，哈希和cv2解码时都会释放GIL）
+    
+    文件只读取一次，同一份字节既用于计算哈希也用于解码
+    
+    参数:
+        img_path: 图片路径
+        
+    返回:
+        (图片路径, 图像, 内容哈希)，读取失败时图像为None
+    """
+    try:
+        with open(img_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return img_path, None, None
+    
+    digest = hashlib.sha256(data).hexdigest()
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return img_path, img, digest
+
+def iter_image_batches(image_files, batch_size=8, workers=4):
+    """
+    使用线程池预读取图片，按原顺序分批产出
+    
+    解码任务最多提前提交batch_size*2个，在模型推理当前批次时
+    后续图片已在后台解码，同时限制内存占用
+    
+    参数:
+        image_files: 图片路径列表
+        batch_size: 每批图片数量
+        workers: 解码线程数
+        
+    返回:
+        生成器，每次产出[(图片路径, 图像, 内容哈希), ...]
+    """
+    batch_size = max(1, batch_size)
+    prefetch = batch_size * 2
+    paths = iter(image_files)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = deque()
+        for img_path in paths:
+            pending.append(executor.submit(load_image, img_path))
+            if len(pending) >= prefetch:
+                break
+        
+        batch = []
+        while pending:
+            img_path, img, digest = pending.popleft().result()
+            
+            # 补充一个解码任务，保持预读取队列长度
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(executor.submit(load_image, next_path))
+            
+            if img is None:
+                print(f"无法读取图片: {img_path}")
+                continue
+            
+            batch.append((img_path, img, digest))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        
+        if batch:
+            yield batch
+
+def format_csv_rows(img_name, detection_time, boxes, labels, confidences):
+    """
+    生成单张图片在results.csv中的行
+    
+    参数:
+        img_name: 图片文件名
+        detection_time: 检测时间(ms)
+        boxes: 检测框坐标
+        labels: 每个检测框的类别名称
+        confidences: 置信度
+        
+    返回:
+        以换行结尾的CSV文本
+    """
+    if len(boxes) == 0:
+        return f"{img_name},{detection_time:.2f},0,无,0,无\n"
+    
+    rows = []
+    for i, box in enumerate(boxes):
+        conf = confidences[i]
+        cls_name = labels[i]
+        coords = ','.join([f"{coord:.2f}" for coord in box])
+        
+        # 如果是第一个检测框，写入文件名和检测时间
+        if i == 0:
+            rows.append(f"{img_name},{detection_time:.2f},{len(boxes)},{cls_name},{conf:.4f},{coords}\n")
+        else:
+            rows.append(f",,,{cls_name},{conf:.4f},{coords}\n")
+    return ''.join(rows)
+
+def write_annotated_image(results, annotated_path):
+    """
+    绘制并保存标注后的图片（在写入线程中执行）
+    
+    参数:
+        results: 单张图片的检测结果
+        annotated_path: 保存路径
+    """
+    # 使用模型的绘图功能
+    annotated_img = results.plot()
+    if not cv2.imwrite(annotated_path, annotated_img):
+        raise IOError(f"无法写入标注图片: {annotated_path}")
+
+def write_crops(img, boxes, labels, confidences, img_crops_dir):
+    """
+    裁剪并保存每个缺陷区域（在写入线程中执行）
+    
+    参数:
+        img: 原始图像
+        boxes: 检测框坐标
+        labels: 每个检测框的类别名称
+        confidences: 置信度
+        img_crops_dir: 该图片的裁剪保存目录
+    """
+    # 为每个图片创建子目录
+    os.makedirs(img_crops_dir, exist_ok=True)
+    
+    for i, box in enumerate(boxes):
+        x1, y1, x2, y2 = map(int, box)
+        conf = confidences[i]
+        cls_name = labels[i]
+        
+        # 裁剪区域，跳过面积为0的检测框
+        crop = img[y1:y2, x1:x2]
+        if crop.size == 0:
+            continue
+        
+        # 保存裁剪区域
+        crop_filename = f"{cls_name}_{conf:.2f}_{i}.jpg"
+        crop_path = os.path.join(img_crops_dir, crop_filename)
+        if not cv2.imwrite(crop_path, crop):
+            raise IOError(f"无法写入裁剪区域: {crop_path}")
+
+def write_outputs(results, annotated_path, img, boxes, labels, confidences, img_crops_dir):
+    """
+    写入一张图片的全部输出文件（在写入线程中执行），全部写完后该图片才算处理完成
+    
+    参数:
+        results: 单张图片的检测结果
+        annotated_path: 标注图片保存路径，为None时不保存
+        img: 原始图像
+        boxes: 检测框坐标
+        labels: 每个检测框的类别名称
+        confidences: 置信度
+        img_crops_dir: 裁剪区域保存目录，为None时不保存
+    """
+    if annotated_path is not None:
+        write_annotated_image(results, annotated_path)
+    if img_crops_dir is not None:
+        write_crops(img, boxes, labels, confidences, img_crops_dir)
+
+class OutputWriter:
+    """
+    后台输出写入器
+    
+    标注图片和裁剪区域的绘制、编码与写盘都在写入线程中完成，
+    推理循环只需把任务放入有界队列。队列满时提交会等待，
+    以限制积压图片占用的内存。任务附带的清单记录在任务成功完成后才放入completed队列，
+    结果清单只记录输出文件已经写完的图片
+    """
+    
+    def __init__(self, workers=2, max_pending=32):
+        """
+        初始化写入器
+        
+        参数:
+            workers: 写入线程数
+            max_pending: 队列中最多等待的任务数
+        """
+        self.queue = queue.Queue(maxsize=max(1, max_pending))
+        self.completed = queue.Queue()  # 输出文件已全部写完的清单记录
+        self.errors = 0
+        self.threads = [
+            threading.Thread(target=self._run, name=f"writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def submit(self, func, *args, record=None):
+        """
+        提交一个写入任务
+        
+        参数:
+            func: 写入函数
+            args: 写入函数的参数
+            record: 任务对应的清单记录，任务成功完成后放入completed队列，写入失败时丢弃
+        """
+        self.queue.put((func, args, record))
+    
+    def _run(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                break
+            
+            func, args, record = task
+            try:
+                func(*args)
+                if record is not None:
+                    self.completed.put(record)
+            except Exception as e:
+                self.errors += 1
+                print(f"写入输出文件时出错: {e}")
+            finally:
+                self.queue.task_done()
+    
+    def wait(self):
+        """等待已提交的任务全部完成，写入线程继续运行"""
+        self.queue.join()
+    
+    def take_completed(self):
+        """
+        取出目前已写完的清单记录
+        
+        返回:
+            清单记录列表
+        """
+        records = []
+        while True:
+            try:
+                records.append(self.completed.get_nowait())
+            except queue.Empty:
+                return records
+    
+    def close(self):
+        """等待队列中的任务全部写完后停止写入线程"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            print(f"共有 {self.errors} 个输出文件写入失败")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def detect_batch(model, batch, conf_threshold, model_hash, output_dir, crops_dir, save_annotated, save_crops, writer,
+                 tile_size=None, tile_overlap=0.2, tile_iou=0.5, imgsz=640):
+    """
+    对一个批次的图片进行检测，生成清单记录并与输出文件一起提交给写入器，
+    每张图片的输出文件写完后其清单记录才出现在writer.completed中
+    
+    参数:
+        model: YOLO模型
+        batch: [(图片路径, 图像, 内容哈希), ...]
+        conf_threshold: 置信度阈值
+        model_hash: 模型文件哈希
+        output_dir: 输出结果目录
+        crops_dir: 裁剪区域保存目录
+        save_annotated: 是否保存标注后的图片
+        save_crops: 是否保存裁剪的缺陷区域
+        writer: OutputWriter实例
+        tile_size: 切片推理的切片边长，为None时整张图片缩放后推理
+        tile_overlap: 相邻切片的重叠比例
+        tile_iou: 合并各切片检测框时NMS的IoU阈值
+        imgsz: 推理输入尺寸，切片模式下每个切片缩放到该尺寸
+    """
+    imgs = [img for _, img, _ in batch]
+    
+    # 记录检测时间
+    start_time = time.time()
+    
+    # 使用模型对整个批次进行检测，切片模式下批次内所有图片的切片一起推理
+    if tile_size:
+        batch_results = predict_tiled(model, imgs, tile_size, tile_overlap, tile_iou,
+                                      conf=conf_threshold, imgsz=imgsz, verbose=False)
+    else:
+        batch_results = model(imgs, conf=conf_threshold, imgsz=imgsz, verbose=False)
+    
+    # 计算检测时间，按批次内图片数量平均
+    detection_time = (time.time() - start_time) * 1000 / len(batch)  # 转换为毫秒
+    
+    for (img_path, img, digest), results in zip(batch, batch_results):
+        img_name = os.path.basename(img_path)
+        
+        # 获取检测结果
+        boxes = results.boxes.xyxy.cpu().numpy() if len(results.boxes) > 0 else []
+        classes = results.boxes.cls.cpu().numpy() if len(results.boxes) > 0 else []
+        confidences = results.boxes.conf.cpu().numpy() if len(results.boxes) > 0 else []
+        labels = [results.names[int(cls_id)] for cls_id in classes]
+        
+        # 标注图片和裁剪区域的绘制、编码都交给后台写入线程
+        annotated_path = os.path.join(output_dir, f"annotated_{img_name}") if save_annotated else None
+        img_crops_dir = (os.path.join(crops_dir, os.path.splitext(img_name)[0])
+                         if save_crops and len(boxes) > 0 else None)
+        
+        stat = os.stat(img_path)
+        record = {
+            "file": img_name,
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "model": model_hash,
+            "conf": conf_threshold,
+            "annotated": save_annotated,
+            "crops": save_crops,
+            "detection_time": round(detection_time, 2),
+            "boxes": [[round(float(coord), 2) for coord in box] for box in boxes],
+            "labels": labels,
+            "confidences": [round(float(conf), 4) for conf in confidences],
+        }
+        writer.submit(write_outputs, results, annotated_path, img, boxes, labels, confidences, img_crops_dir,
+                      record=record)
+
+# 检测子进程中的状态，由init_worker初始化
+_worker_state = {}
+
+def init_worker(model_path, backend, threads, output_dir, crops_dir, conf_threshold, model_hash,
+                save_annotated, save_crops, writers, tile_size=None, tile_overlap=0.2, workers=4, tile_iou=0.5,
+                imgsz=640):
+    """
+    检测子进程初始化：限制推理线程数，加载该进程自己的模型实例
+    
+    参数:
+        model_path: 模型路径（已由主进程导出为对应后端的格式）
+        backend: 推理后端
+        threads: 该进程的torch推理线程数
+        workers: 该进程解码分片图片的线程数
+        其余参数同detect_batch
+    """
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    
+    writer = OutputWriter(writers, max_pending=max(writers, 1) * 4)
+    decoder = ThreadPoolExecutor(max_workers=max(1, workers))
+    # 子进程退出前等待写入线程把剩余输出写完
+    multiprocessing.util.Finalize(None, writer.close, exitpriority=10)
+    multiprocessing.util.Finalize(None, decoder.shutdown, exitpriority=10)
+    
+    _worker_state.update(
+        model=YOLO(model_path) if backend == "torch" else YOLO(model_path, task="detect"),
+        writer=writer,
+        decoder=decoder,
+        args=(conf_threshold, model_hash, output_dir, crops_dir, save_annotated, save_crops),
+        tiling=(tile_size, tile_overlap, tile_iou, imgsz),
+    )
+
+def process_shard(img_paths):
+    """
+    在检测子进程中处理一个分片的图片，分片内的图片由解码线程池并行读取和解码
+    
+    参数:
+        img_paths: 图片路径列表
+        
+    返回:
+        输出文件已写完的清单记录列表
+    """
+    batch = []
+    for img_path, img, digest in _worker_state["decoder"].map(load_image, img_paths):
+        if img is None:
+            print(f"无法读取图片: {img_path}")
+            continue
+        batch.append((img_path, img, digest))
+    
+    if not batch:
+        return []
+    writer = _worker_state["writer"]
+    detect_batch(_worker_state["model"], batch, *_worker_state["args"], writer, *_worker_state["tiling"])
+    # 等本分片的输出文件写完再返回记录，主进程中断时终止子进程不会让清单记录已写完但实际缺失的文件
+    writer.wait()
+    return writer.take_completed()
+
+def report_throughput(output_dir, images, elapsed, processes, threads, batch_size):
+    """
+    打印本次运行的吞吐量，并追加到输出目录的throughput.csv中，
+    以便比较不同进程数下的扩展情况
+    
+    参数:
+        output_dir: 输出结果目录
+        images: 本次处理的图片数
+        elapsed: 处理用时（秒）
+        processes: 检测进程数
+        threads: 每个进程的推理线程数
+        batch_size: 批次大小
+    
+    返回:
+        吞吐量（张/秒）
+    """
+    throughput = images / elapsed if elapsed > 0 else 0.0
+    print(f"吞吐量: {throughput:.2f} 张/秒（{images} 张，用时 {elapsed:.1f} 秒，"
+          f"{processes} 个进程 x {threads} 个线程，批次 {batch_size}）")
+    
+    report_path = os.path.join(output_dir, "throughput.csv")
+    write_header = not os.path.exists(report_path)
+    with open(report_path, 'a', encoding='utf-8') as f:
+        if write_header:
+            f.write("时间,进程数,每进程线程数,批次大小,图片数,用时(s),吞吐量(张/秒)\n")
+        f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')},{processes},{threads},{batch_size},"
+                f"{images},{elapsed:.2f},{throughput:.2f}\n")
+    return throughput
+
+def sweep_processes(process_counts, output_dir, **kwargs):
+    """
+    扩展性测试：依次用不同的检测进程数处理同一批图片，打印并保存扩展性报告scaling.csv
+    
+    每个进程数的结果写入输出目录下单独的子目录processes_N，并忽略已有的结果清单重新处理全部图片。
+    加速比和并行效率以第一个进程数的吞吐量为基准
+    
+    参数:
+        process_counts: 检测进程数列表，如[1, 2, 4]
+        output_dir: 输出结果目录
+        kwargs: 其余参数同process_images
+    
+    返回:
+        [(进程数, 吞吐量), ...]
+    """
+    rows = []
+    for processes in process_counts:
+        print(f"===== 扩展性测试: {processes} 个检测进程 =====")
+        throughput = process_images(output_dir=os.path.join(output_dir, f"processes_{processes}"),
+                                    processes=processes, force=True, **kwargs)
+        if throughput is None:
+            return rows
+        rows.append((processes, throughput))
+    
+    base_processes, base_throughput = rows[0]
+    report_path = os.path.join(output_dir, "scaling.csv")
+    print("进程数  吞吐量(张/秒)  加速比  并行效率")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write("进程数,吞吐量(张/秒),加速比,并行效率\n")
+        for processes, throughput in rows:
+            speedup = throughput / base_throughput if base_throughput > 0 else 0.0
+            efficiency = speedup / (processes / base_processes)
+            print(f"{processes:>6}  {throughput:>13.2f}  {speedup:>6.2f}  {efficiency:>8.0%}")
+            f.write(f"{processes},{throughput:.2f},{speedup:.2f},{efficiency:.2f}\n")
+    print(f"扩展性报告保存为: {report_path}")
+    return rows
+
+class ResultManifest:
+    """
+    批量检测结果清单
+    
+    以JSON Lines格式保存在输出目录的manifest.jsonl中，每处理完一张图片追加一条记录，
+    包含图片内容哈希、模型哈希、置信度阈值、输出选项和检测结果。
+    同一图片有多条记录时以最后一条为准，因此中断后重新运行可以从断点继续，
+    再次运行时未变化的图片直接复用已有结果
+    """
+    FILENAME = "manifest.jsonl"
+    
+    def __init__(self, output_dir):
+        """
+        初始化并读取已有清单
+        
+        参数:
+            output_dir: 输出结果目录
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.records = {}
+        self.file = None
+        self.load()
+    
+    def load(self):
+        """读取已有清单，忽略中断时写了一半的行"""
+        if not os.path.exists(self.path):
+            return
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records[record["file"]] = record
+    
+    def is_current(self, img_path, model_hash, conf_threshold, save_annotated, save_crops):
+        """
+        判断图片是否已用相同的模型和参数处理过、输出文件仍然存在且内容未变化
+        
+        文件大小和修改时间都未变化时直接认为内容未变，否则重新计算内容哈希比较
+        
+        参数:
+            img_path: 图片路径
+            model_hash: 模型文件哈希
+            conf_threshold: 置信度阈值
+            save_annotated: 本次是否需要标注图片
+            save_crops: 本次是否需要裁剪区域
+            
+        返回:
+            可以跳过该图片时返回True
+        """
+        record = self.records.get(os.path.basename(img_path))
+        if record is None:
+            return False
+        
+        # 模型、阈值不同，或上次没有生成本次需要的输出文件时需要重新处理
+        if record["model"] != model_hash or record["conf"] != conf_threshold:
+            return False
+        if (save_annotated and not record["annotated"]) or (save_crops and not record["crops"]):
+            return False
+        if not self.outputs_exist(record, save_annotated, save_crops):
+            return False
+        
+        stat = os.stat(img_path)
+        if record["size"] == stat.st_size and record["mtime"] == stat.st_mtime_ns:
+            return True
+        
+        # 文件被改动过，比较内容哈希；内容相同时更新记录中的文件信息
+        if file_sha256(img_path) != record["sha256"]:
+            return False
+        self.add(dict(record, size=stat.st_size, mtime=stat.st_mtime_ns))
+        return True
+    
+    def outputs_exist(self, record, save_annotated, save_crops):
+        """
+        检查记录对应的输出文件是否还在磁盘上，被删除或未写完时需要重新处理
+        
+        参数:
+            record: 清单记录
+            save_annotated: 本次是否需要标注图片
+            save_crops: 本次是否需要裁剪区域
+            
+        返回:
+            需要的输出文件都存在时返回True
+        """
+        if save_annotated and not os.path.isfile(os.path.join(self.output_dir, f"annotated_{record['file']}")):
+            return False
+        if save_crops and record["boxes"]:
+            img_crops_dir = os.path.join(self.output_dir, "crops", os.path.splitext(record["file"])[0])
+            if not os.path.isdir(img_crops_dir) or not os.listdir(img_crops_dir):
+                return False
+        return True
+    
+    def open(self):
+        """以追加方式打开清单文件"""
+        self.file = open(self.path, 'a', encoding='utf-8')
+    
+    def add(self, record):
+        """
+        添加一条记录
+        
+        参数:
+            record: 记录字典
+        """
+        self.records[record["file"]] = record
+        if self.file is not None:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def flush(self):
+        """把已追加的记录写入磁盘，保证中断后可以从这里继续"""
+        if self.file is not None:
+            self.file.flush()
+    
+    def close(self):
+        """关闭清单并压缩为每张图片一条记录"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+def process_images(input_dir, output_dir, model_path="best.pt", conf_threshold=0.25, save_annotated=True, save_crops=False,
+                   batch_size=8, workers=4, writers=2, force=False, processes=1, threads=None, backend="torch",
+                   tile_size=None, tile_overlap=0.2, tile_iou=0.5, imgsz=640):
     """
     使用YOLOv8模型处理指定文件夹中的所有图片
     
@@ -18,10 +601,21 @@ def process_images(input_dir, output_dir, model_path="best.pt", conf_threshold=0
         conf_threshold: 置信度阈值
         save_annotated: 是否保存标注后的图片
         save_crops: 是否保存裁剪的缺陷区域
-    """
-    print(f"正在加载模型: {model_path}")
-    model = YOLO(model_path)
+        batch_size: 每次送入模型的图片数量
+        workers: 预读取解码图片的线程数，多进程模式下为每个子进程的解码线程数
+        writers: 后台写入标注图片和裁剪区域的线程数
+        force: 忽略已有的结果清单，重新处理所有图片
+        processes: 检测进程数，大于1时把图片分片交给多个子进程并行处理
+        threads: 每个进程的torch推理线程数，为None时多进程模式按CPU核数平均分配
+        backend: 推理后端，torch、onnxruntime、openvino或openvino-int8
+        tile_size: 切片推理的切片边长（像素），为None时整张图片缩放后推理一次
+        tile_overlap: 相邻切片的重叠比例
+        tile_iou: 合并各切片检测框时NMS的IoU阈值
+        imgsz: 推理输入尺寸，也是导出后端模型时使用的尺寸
     
+    返回:
+        本次处理的吞吐量（张/秒），没有需要处理的图片时为None
+    """
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
     
@@ -40,89 +634,113 @@ def process_images(input_dir, output_dir, model_path="best.pt", conf_threshold=0
     
     if not image_files:
         print(f"在 {input_dir} 中未找到图片文件")
-        return
+        return None
     
     print(f"发现 {len(image_files)} 个图片文件")
     
-    # 创建结果CSV文件
-    csv_path = os.path.join(output_dir, "results.csv")
-    with open(csv_path, 'w', encoding='utf-8') as f:
-        f.write("文件名,检测时间(ms),检测到的缺陷数,类别,置信度,坐标\n")
+    # 读取结果清单，跳过已用相同模型和参数处理过且内容未变化的图片
+    manifest_path = os.path.join(output_dir, ResultManifest.FILENAME)
+    if force and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = ResultManifest(output_dir)
+    model_hash = file_sha256(model_path) if os.path.isfile(model_path) else model_path
+    if backend != "torch":
+        model_hash = f"{model_hash}:{backend}"
+    if tile_size:
+        # 切片参数不同时检测结果不同，需要重新处理
+        model_hash = f"{model_hash}:tile{tile_size}x{tile_overlap}x{tile_iou}"
+    if imgsz != 640:
+        model_hash = f"{model_hash}:imgsz{imgsz}"
     
-    # 处理每个图片
-    for img_path in image_files:
-        img_name = os.path.basename(img_path)
-        print(f"正在处理: {img_name}")
-        
-        # 读取图片
-        img = cv2.imread(str(img_path))
-        if img is None:
-            print(f"无法读取图片: {img_path}")
-            continue
-        
-        # 记录检测时间
+    pending_files = [
+        img_path for img_path in image_files
+        if not manifest.is_current(img_path, model_hash, conf_threshold, save_annotated, save_crops)
+    ]
+    skipped = len(image_files) - len(pending_files)
+    if skipped:
+        print(f"跳过 {skipped} 个已处理且未变化的图片，待处理 {len(pending_files)} 个")
+    
+    manifest.open()
+    throughput = None
+    try:
         start_time = time.time()
-        
-        # 使用模型检测
-        results = model(img, conf=conf_threshold)[0]
-        
-        # 计算检测时间
-        detection_time = (time.time() - start_time) * 1000  # 转换为毫秒
-        
-        # 获取检测结果
-        boxes = results.boxes.xyxy.cpu().numpy() if len(results.boxes) > 0 else []
-        classes = results.boxes.cls.cpu().numpy() if len(results.boxes) > 0 else []
-        confidences = results.boxes.conf.cpu().numpy() if len(results.boxes) > 0 else []
-        class_names = results.names
-        
-        # 保存结果到CSV
-        with open(csv_path, 'a', encoding='utf-8') as f:
-            if len(boxes) == 0:
-                f.write(f"{img_name},{detection_time:.2f},0,无,0,无\n")
-            else:
-                for i, box in enumerate(boxes):
-                    cls_id = int(classes[i])
-                    conf = confidences[i]
-                    cls_name = class_names[cls_id]
-                    coords = ','.join([f"{coord:.2f}" for coord in box])
-                    
-                    # 如果是第一个检测框，写入文件名和检测时间
-                    if i == 0:
-                        f.write(f"{img_name},{detection_time:.2f},{len(boxes)},{cls_name},{conf:.4f},{coords}\n")
-                    else:
-                        f.write(f",,,{cls_name},{conf:.4f},{coords}\n")
-        
-        # 如果需要保存标注后的图片
-        if save_annotated:
-            # 使用模型的绘图功能
-            annotated_img = results.plot()
+        if pending_files and processes > 1:
+            # 多进程模式：每个子进程加载自己的模型，按批次分片处理，结果按原顺序合并
+            chunks = [pending_files[i:i + batch_size] for i in range(0, len(pending_files), batch_size)]
+            threads = threads or max(1, (os.cpu_count() or 1) // processes)
+            print(f"启动 {processes} 个检测进程，每个进程 {threads} 个推理线程")
             
-            # 保存标注后的图片
-            annotated_path = os.path.join(output_dir, f"annotated_{img_name}")
-            cv2.imwrite(annotated_path, annotated_img)
-        
-        # 如果需要保存裁剪区域
-        if save_crops and len(boxes) > 0:
-            # 为每个图片创建子目录
-            img_crops_dir = os.path.join(crops_dir, os.path.splitext(img_name)[0])
-            os.makedirs(img_crops_dir, exist_ok=True)
+            # 在主进程中完成模型导出，子进程直接加载缓存的模型
+            worker_model_path, worker_backend = resolve_model(model_path, backend, imgsz)
             
-            for i, box in enumerate(boxes):
-                x1, y1, x2, y2 = map(int, box)
-                cls_id = int(classes[i])
-                conf = confidences[i]
-                cls_name = class_names[cls_id]
-                
-                # 裁剪区域
-                crop = img[y1:y2, x1:x2]
-                
-                # 保存裁剪区域
-                crop_filename = f"{cls_name}_{conf:.2f}_{i}.jpg"
-                crop_path = os.path.join(img_crops_dir, crop_filename)
-                cv2.imwrite(crop_path, crop)
+            # 主进程已导入torch并可能运行过模型导出，fork出的子进程会继承OpenMP线程池的状态而死锁，
+            # 因此与benchmark.py一样使用spawn启动子进程
+            pool = multiprocessing.get_context("spawn").Pool(
+                processes,
+                initializer=init_worker,
+                initargs=(worker_model_path, worker_backend, threads, output_dir, crops_dir, conf_threshold, model_hash,
+                          save_annotated, save_crops, writers, tile_size, tile_overlap, workers, tile_iou, imgsz)
+            )
+            try:
+                for records in pool.imap(process_shard, chunks):
+                    for record in records:
+                        print(f"已处理: {record['file']}")
+                        manifest.add(record)
+                    # 每个分片处理完后落盘，中断后可以从这里继续
+                    manifest.flush()
+                # 正常关闭进程池，让子进程写完剩余的输出文件后再退出
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        elif pending_files:
+            if threads:
+                torch.set_num_threads(threads)
+            print(f"正在加载模型: {model_path}")
+            model, _ = load_model(model_path, backend, imgsz)
+            
+            writer = OutputWriter(writers, max_pending=max(writers, batch_size) * 4)
+            try:
+                # 按批次处理图片，解码在后台线程中提前进行
+                for batch in iter_image_batches(pending_files, batch_size, workers):
+                    for img_path, _, _ in batch:
+                        print(f"正在处理: {os.path.basename(img_path)}")
+                    
+                    detect_batch(model, batch, conf_threshold, model_hash, output_dir, crops_dir,
+                                 save_annotated, save_crops, writer, tile_size, tile_overlap, tile_iou, imgsz)
+                    
+                    # 输出文件已写完的图片落盘，中断后可以从这里继续
+                    for record in writer.take_completed():
+                        manifest.add(record)
+                    manifest.flush()
+            finally:
+                # 中断时也等已提交的输出文件写完，再记录这些图片
+                writer.close()
+                for record in writer.take_completed():
+                    manifest.add(record)
+        
+        if pending_files:
+            throughput = report_throughput(output_dir, len(pending_files), time.time() - start_time,
+                                           processes, threads or torch.get_num_threads(), batch_size)
+    finally:
+        manifest.close()
+    
+    # 根据结果清单按图片顺序生成CSV文件，只打开一次并使用缓冲写入
+    csv_path = os.path.join(output_dir, "results.csv")
+    with open(csv_path, 'w', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csv_file:
+        csv_file.write("文件名,检测时间(ms),检测到的缺陷数,类别,置信度,坐标\n")
+        for img_path in image_files:
+            record = manifest.records.get(os.path.basename(img_path))
+            if record is None:
+                continue
+            csv_file.write(format_csv_rows(record["file"], record["detection_time"], record["boxes"],
+                                           record["labels"], record["confidences"]))
     
     print(f"处理完成！检测结果保存在: {output_dir}")
     print(f"结果摘要保存为: {csv_path}")
+    return throughput
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="使用YOLOv8批量检测图片中的铁链缺陷")
@@ -132,14 +750,49 @@ if __name__ == "__main__":
     parser.add_argument("--conf", "-c", type=float, default=0.6, help="置信度阈值")
     parser.add_argument("--no-save", action="store_false", dest="save_annotated", help="不保存标注后的图片")
     parser.add_argument("--crops", action="store_true", help="保存裁剪的缺陷区域")
+    parser.add_argument("--batch", "-b", type=int, default=8, help="每次送入模型的图片数量")
+    parser.add_argument("--workers", "-w", type=int, default=4,
+                        help="预读取解码图片的线程数（多进程模式下为每个进程的解码线程数）")
+    parser.add_argument("--writers", type=int, default=2, help="后台写入输出图片的线程数")
+    parser.add_argument("--force", action="store_true", help="忽略已有的结果清单，重新处理所有图片")
+    parser.add_argument("--processes", "-p", type=int, default=1, help="检测进程数，每个进程加载自己的模型")
+    parser.add_argument("--threads", type=int, default=None, help="每个进程的推理线程数（默认按CPU核数平均分配）")
+    parser.add_argument("--sweep", type=int, nargs="+", default=None, metavar="N",
+                        help="扩展性测试：依次用各个进程数重新处理全部图片，生成scaling.csv（忽略--processes和--force）")
+    parser.add_argument("--backend", type=str, default="torch", choices=BACKENDS, help="推理后端")
+    parser.add_argument("--verify-backend", type=int, default=0, metavar="N",
+                        help="处理前用前N张图片检查所选后端与torch后端的检测框是否一致")
+    parser.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                        help="切片推理：把图片切成SIZE像素的重叠方块一起推理，适合大图中的小缺陷")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="切片推理时相邻切片的重叠比例")
+    parser.add_argument("--tile-iou", type=float, default=0.5, help="切片推理时合并各切片检测框的NMS IoU阈值")
+    parser.add_argument("--imgsz", type=int, default=640, help="推理输入尺寸，切片推理时每个切片缩放到该尺寸")
     
     args = parser.parse_args()
     
-    process_images(
+    if args.backend != "torch" and args.verify_backend > 0:
+        sample_files = sorted(Path(args.input).glob("*"))[:args.verify_backend]
+        sample_images = [img for img in (cv2.imread(str(path)) for path in sample_files) if img is not None]
+        matched, total = verify_backend(args.model, args.backend, sample_images, args.conf, args.imgsz)
+        print(f"{args.backend}后端一致性检查: {matched}/{total} 张图片的检测框与torch后端一致")
+    
+    options = dict(
         input_dir=args.input, 
-        output_dir=args.output, 
         model_path=args.model,
         conf_threshold=args.conf,
         save_annotated=args.save_annotated,
-        save_crops=args.crops
-    ) 
\ No newline at end of file
+        save_crops=args.crops,
+        batch_size=args.batch,
+        workers=args.workers,
+        writers=args.writers,
+        threads=args.threads,
+        backend=args.backend,
+        tile_size=args.tile,
+        tile_overlap=args.tile_overlap,
+        tile_iou=args.tile_iou,
+        imgsz=args.imgsz
+    )
+    if args.sweep:
+        sweep_processes(args.sweep, args.output, **options)
+    else:
+        process_images(output_dir=args.output, force=args.force, processes=args.processes, **options) 
\ No newline at end of file
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+
+class BlobModel:
+    """
+    代替YOLO模型的桩：把每张输入图像中非零像素的外接框作为一个检测结果（置信度0.9、类别0），
+    并记录每次调用的输入图像和参数
+    """
+    names = {0: "crack"}
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, **predict_args):
+        self.calls.append((images, predict_args))
+        results = []
+        for image in images:
+            ys, xs = np.nonzero(image[:, :, 0])
+            boxes = torch.zeros((0, 6))
+            if len(xs):
+                boxes = torch.tensor([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 0]], dtype=torch.float32)
+            results.append(Results(image, path="", names=self.names, boxes=boxes,
+                                   speed={"preprocess": 1.0, "inference": 2.0, "postprocess": 0.5}))
+        return results
+
+
+@pytest.fixture
+def blob_model():
+    return BlobModel()
+
+
+def blob_frame(box, shape=(100, 200, 3)):
+    """生成在box=(x1, y1, x2, y2)处有一块白色区域的黑色图像"""
+    frame = np.zeros(shape, dtype=np.uint8)
+    x1, y1, x2, y2 = box
+    frame[y1:y2, x1:x2] = 255
+    return frame
@@ -0,0 +1,69 @@
+import numpy as np
+from app.detector.BoxTracker import BoxTracker
+from app.utils.geometry import box_iou
+
+FRAME = np.zeros((100, 100, 3), dtype=np.uint8)
+
+
+def test_box_iou():
+    iou = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    np.testing.assert_allclose(iou, [[1.0, 1 / 3, 0.0]], rtol=1e-5)
+
+
+def test_confirms_after_consecutive_hits():
+    tracker = BoxTracker(confirm_frames=2)
+    assert len(tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])) == 0
+    assert tracker.has_candidates()
+
+    confirmed = tracker.update(FRAME, [[12, 11, 32, 31, 0.8, 0]])
+    np.testing.assert_allclose(confirmed, [[12, 11, 32, 31, 0.8, 0]])
+    assert not tracker.has_candidates()
+    # 已确认的缺陷不会重复报告
+    assert len(tracker.update(FRAME, [[12, 11, 32, 31, 0.8, 0]])) == 0
+
+
+def test_miss_resets_confirmation_count():
+    tracker = BoxTracker(confirm_frames=2, max_missed=1)
+    tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])
+    assert len(tracker.update(FRAME, [])) == 0
+    # 漏检后再次检出不与漏检前的检出合并计数
+    assert len(tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])) == 0
+    assert tracker.has_candidates()
+    assert len(tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])) == 1
+
+
+def test_matching_requires_same_class_and_iou():
+    tracker = BoxTracker(confirm_frames=2)
+    tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])
+    assert len(tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 1]])) == 0  # 类别不同
+    assert len(tracker.update(FRAME, [[60, 60, 80, 80, 0.9, 0]])) == 0  # 不重叠
+    assert max(track.hits for track in tracker.tracks) == 1
+    assert not any(track.confirmed for track in tracker.tracks)
+
+
+def test_each_detection_matches_one_track():
+    tracker = BoxTracker(confirm_frames=2)
+    tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0], [50, 50, 70, 70, 0.9, 0]])
+    confirmed = tracker.update(FRAME, [[11, 11, 31, 31, 0.9, 0], [51, 51, 71, 71, 0.9, 0]])
+    assert len(confirmed) == 2
+    assert len(tracker.tracks) == 2
+
+
+def test_unmatched_tracks_expire():
+    tracker = BoxTracker(max_missed=1)
+    tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])
+    tracker.update(FRAME, [])
+    assert len(tracker.tracks) == 1
+    tracker.update(FRAME, [])
+    assert tracker.tracks == []
+
+
+def test_detect_interval():
+    tracker = BoxTracker(detect_interval=3)
+    assert tracker.should_detect()
+    tracker.update(FRAME, [[10, 10, 30, 30, 0.9, 0]])
+    assert not tracker.should_detect()
+    np.testing.assert_allclose(tracker.track(FRAME), [[10, 10, 30, 30, 0.9, 0]])
+    assert not tracker.should_detect()
+    tracker.track(FRAME)
+    assert tracker.should_detect()
@@ -0,0 +1,57 @@
+import json
+import pytest
+from app.utils.camera_config import load_camera_config
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "cameras.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    return str(path)
+
+
+def test_defaults_without_config_file(tmp_path):
+    config = load_camera_config(str(tmp_path / "missing.json"))
+    assert config["policy"] == "fair"
+    assert config["max_batch"] == 4
+    assert [camera["device"] for camera in config["cameras"]] == [0, 1, 2, 3]
+    assert [camera["name"] for camera in config["cameras"]] == [f"Camera {i}" for i in range(1, 5)]
+
+
+def test_camera_entries(tmp_path):
+    path = write_config(tmp_path, {"policy": "priority", "deadline_ms": 500, "cameras": [
+        {"name": "Line 1", "priority": 2, "roi": [0, 0.3, 1, 0.7]},
+        {"source": 3, "deadline_ms": 200},
+        {"source": "line3.mp4"},
+    ]})
+    cameras = load_camera_config(path)["cameras"]
+    assert [camera["name"] for camera in cameras] == ["Line 1", "Camera 2", "Camera 3"]
+    assert cameras[0]["roi"] == (0.0, 0.3, 1.0, 0.7)
+    assert cameras[0]["priority"] == 2.0
+    assert (cameras[0]["device"], cameras[0]["source"]) == (0, None)
+    assert (cameras[1]["device"], cameras[1]["deadline"]) == (3, 0.2)
+    assert cameras[2]["source"] == "line3.mp4" and cameras[2]["deadline"] == 0.5
+
+
+def test_sources_override_configured_cameras(tmp_path):
+    path = write_config(tmp_path, {"cameras": [{"source": 0}, {"source": 1}]})
+    cameras = load_camera_config(path, ["a.mp4", None])["cameras"]
+    assert [camera["source"] for camera in cameras] == ["a.mp4", None]
+
+
+def test_extra_sources_add_cameras(tmp_path, capsys):
+    path = write_config(tmp_path, {"cameras": [{"name": "Line 1", "source": 2}]})
+    config = load_camera_config(path, [None, "b.mp4", None])
+    cameras = config["cameras"]
+    assert [camera["name"] for camera in cameras] == ["Line 1", "Camera 2", "Camera 3"]
+    assert [(camera["device"], camera["source"]) for camera in cameras] == [(2, None), (1, "b.mp4"), (2, None)]
+    assert config["max_batch"] == 3
+    assert "增加2路" in capsys.readouterr().out
+
+
+def test_invalid_entries(tmp_path):
+    with pytest.raises(ValueError, match="摄像头1"):
+        load_camera_config(write_config(tmp_path, {"cameras": [{"roi": [0, 0.7, 1, 0.3]}]}))
+    with pytest.raises(ValueError):
+        load_camera_config(write_config(tmp_path, {"cameras": [{"priority": 0}]}))
+    with pytest.raises(ValueError):
+        load_camera_config(write_config(tmp_path, {"policy": "random"}))
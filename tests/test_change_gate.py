@@ -0,0 +1,30 @@
+import numpy as np
+from app.detector.ChangeGate import ChangeGate
+
+
+def frame(value):
+    return np.full((72, 128, 3), value, dtype=np.uint8)
+
+
+def test_skips_static_frames():
+    gate = ChangeGate(threshold=2.0)
+    assert gate.changed(frame(100))
+    assert not gate.changed(frame(101))
+    assert gate.changed(frame(120))
+    assert gate.skip_ratio() == 1 / 3
+
+
+def test_max_skip_forces_inference():
+    gate = ChangeGate(threshold=2.0, max_skip=2)
+    results = [gate.changed(frame(100)) for _ in range(5)]
+    assert results == [True, False, False, True, False]
+
+
+def test_reset_and_disabled_gate():
+    gate = ChangeGate(threshold=2.0)
+    gate.changed(frame(100))
+    gate.reset()
+    assert gate.changed(frame(100))
+
+    disabled = ChangeGate(threshold=0)
+    assert all(disabled.changed(frame(100)) for _ in range(3))
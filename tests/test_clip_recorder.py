@@ -0,0 +1,120 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.clip_recorder import ClipRecorder, FrameRingBuffer, describe_detections
+
+
+def make_frame(value, shape=(48, 64, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_jpeg_round_trip():
+    buffer = FrameRingBuffer(seconds=5.0, fps=0)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[:, :, 0] = np.arange(64, dtype=np.uint8) * 4
+    frame[:, :, 2] = 200
+    buffer.push(frame, 100.0)
+
+    [(timestamp, data)] = buffer.snapshot(0, 200)
+    assert timestamp == 100.0
+    decoded = decode(data)
+    assert decoded.shape == frame.shape
+    assert np.abs(decoded.astype(int) - frame.astype(int)).mean() < 3
+
+
+def test_push_is_rate_limited():
+    buffer = FrameRingBuffer(seconds=5.0, fps=10)
+    for timestamp in (0.0, 0.05, 0.1, 0.12, 0.25):
+        buffer.push(make_frame(0), timestamp)
+    assert [timestamp for timestamp, _ in buffer.snapshot(0, 1)] == [0.0, 0.1, 0.25]
+
+
+def test_old_frames_are_evicted_by_time_and_size():
+    buffer = FrameRingBuffer(seconds=1.0, fps=0)
+    for i in range(30):
+        buffer.push(make_frame(i), i / 10)
+    timestamps = [timestamp for timestamp, _ in buffer.snapshot(0, 10)]
+    # 只保留最新一帧之前1秒内的图像
+    assert len(timestamps) in (10, 11)
+    assert timestamps[0] >= 1.9 - 1e-9
+    assert timestamps[-1] == 2.9
+    assert buffer.total_bytes == sum(len(data) for _, data in buffer.frames)
+
+    frame_bytes = buffer.total_bytes // len(buffer.frames)
+    small = FrameRingBuffer(seconds=100.0, fps=0, max_bytes=frame_bytes * 3)
+    for i in range(10):
+        small.push(make_frame(i), float(i))
+    assert len(small.frames) <= 3
+    assert small.frames[-1][0] == 9.0
+    assert small.total_bytes <= frame_bytes * 3
+
+    small.clear()
+    assert small.snapshot(0, 100) == [] and small.total_bytes == 0
+
+
+def test_snapshot_returns_pre_trigger_window():
+    buffer = FrameRingBuffer(seconds=10.0, fps=0)
+    for i in range(10):
+        buffer.push(make_frame(i * 20), float(i))
+    frames = buffer.snapshot(4.0, 6.0)
+    assert [timestamp for timestamp, _ in frames] == [4.0, 5.0, 6.0]
+    assert [int(decode(data).mean() + 0.5) for _, data in frames] == [80, 100, 120]
+
+
+def test_clip_contains_pre_and_post_trigger_frames(tmp_path):
+    recorder = ClipRecorder(str(tmp_path), pre_seconds=0.25, post_seconds=0.25)
+    recorder.start()
+    buffer = FrameRingBuffer(seconds=5.0, fps=0)
+    trigger_time = time.time()
+    for k in range(-4, 1):
+        buffer.push(make_frame(100 + k * 20), trigger_time + k * 0.1)
+    recorder.record(0, buffer, trigger_time, detections=np.array([[1, 2, 30, 40, 0.87654, 0]]),
+                    class_names={0: "crack"}, extra={"imgsz": 640})
+    # 触发后的画面在线程等待post_seconds期间继续写入缓冲区
+    for k in range(1, 4):
+        buffer.push(make_frame(100 + k * 20), trigger_time + k * 0.1)
+    recorder.stop(timeout=10)
+    assert not recorder.is_alive()
+
+    [metadata_path] = list(tmp_path.glob("*/camera_1_*.json"))
+    metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+    assert metadata["camera"] == 1
+    assert metadata["frame_offsets"] == [-0.2, -0.1, 0.0, 0.1, 0.2]
+    assert metadata["detections"] == [{"class": "crack", "confidence": 0.8765, "box": [1.0, 2.0, 30.0, 40.0]}]
+    assert metadata["imgsz"] == 640
+
+    capture = cv2.VideoCapture(str(metadata_path.parent / metadata["clip"]))
+    brightness = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        brightness.append(frame.mean())
+    capture.release()
+    assert len(brightness) == 5
+    assert brightness == sorted(brightness)
+
+
+def test_clip_without_frames_is_skipped(tmp_path):
+    recorder = ClipRecorder(str(tmp_path), pre_seconds=0.1, post_seconds=0.0)
+    recorder.start()
+    done = []
+    recorder.record(0, FrameRingBuffer(), time.time())
+    recorder.submit(done.append, "task")
+    recorder.stop(timeout=10)
+
+    assert done == ["task"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_describe_detections():
+    assert describe_detections(None) == []
+    assert describe_detections([[0, 0, 10.04, 10, 0.5, 3]]) == [
+        {"class": "3", "confidence": 0.5, "box": [0.0, 0.0, 10.0, 10.0]}]
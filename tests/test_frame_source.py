@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.utils import frame_source
+from app.utils.frame_source import (ImageSequenceSource, VideoFileSource, open_capture, open_frame_source)
+
+
+class FakeTime:
+    """替换frame_source中的time模块，sleep只推进虚拟时钟"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), np.full((20, 30, 3), i * 50, dtype=np.uint8))
+    (tmp_path / "1_broken.jpg").write_bytes(b"not an image")
+    (tmp_path / "notes.txt").write_text("ignored")
+    return tmp_path
+
+
+def read_values(source, count):
+    values = []
+    for _ in range(count):
+        ret, frame = source.read()
+        values.append(int(frame[0, 0, 0]) if ret else None)
+    return values
+
+
+def test_image_sequence_skips_undecodable_files_and_loops(image_dir):
+    source = ImageSequenceSource(str(image_dir), realtime=False)
+    assert source.isOpened()
+    assert source.get(cv2.CAP_PROP_FRAME_COUNT) == 4.0
+
+    assert read_values(source, 7) == [0, 50, 100, 0, 50, 100, 0]
+    assert source.get(cv2.CAP_PROP_FRAME_WIDTH) == 30.0
+    assert source.get(cv2.CAP_PROP_FRAME_HEIGHT) == 20.0
+
+
+def test_image_sequence_without_loop_stops(image_dir):
+    source = ImageSequenceSource(str(image_dir), realtime=False, loop=False)
+    assert read_values(source, 4) == [0, 50, 100, None]
+
+
+def test_source_without_readable_frames_does_not_loop_forever(tmp_path):
+    (tmp_path / "broken.png").write_bytes(b"")
+    source = ImageSequenceSource(str(tmp_path), realtime=False)
+    assert source.isOpened()
+    assert source.read() == (False, None)
+
+
+def test_realtime_playback_paces_and_realigns(monkeypatch, image_dir):
+    clock = FakeTime()
+    monkeypatch.setattr(frame_source, "time", clock)
+    source = ImageSequenceSource(str(image_dir), realtime=True, fps=10)
+
+    source.read()
+    source.read()
+    source.read()
+    assert clock.sleeps == [0.1, 0.1]
+
+    # 落后超过1秒时不追赶，从当前时刻重新对齐节拍
+    clock.now += 5.0
+    source.read()
+    assert clock.sleeps == [0.1, 0.1]
+    source.read()
+    assert clock.sleeps == [0.1, 0.1, 0.1]
+
+    # 落后不足1秒时不等待，直接读取下一帧追赶
+    clock.now += 0.5
+    source.read()
+    source.read()
+    assert clock.sleeps == [0.1, 0.1, 0.1]
+
+
+def test_video_file_source_loops(tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 5.0, (32, 24))
+    for value in (0, 120, 240):
+        writer.write(np.full((24, 32, 3), value, dtype=np.uint8))
+    writer.release()
+
+    source = VideoFileSource(path, realtime=False)
+    assert source.isOpened()
+    assert source.get(cv2.CAP_PROP_FPS) == pytest.approx(5.0)
+    assert source.get(cv2.CAP_PROP_FRAME_WIDTH) == 32.0
+
+    values = read_values(source, 5)
+    # 视频编码有损，只比较亮度顺序：读完三帧后回到第一帧
+    assert values[0] < values[1] < values[2]
+    assert abs(values[3] - values[0]) < 10 and abs(values[4] - values[1]) < 10
+    source.release()
+
+
+def test_open_frame_source_dispatch(tmp_path, image_dir):
+    video_path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"MJPG"), 5.0, (32, 24))
+    writer.write(np.zeros((24, 32, 3), dtype=np.uint8))
+    writer.release()
+
+    assert isinstance(open_frame_source(str(image_dir), realtime=False), ImageSequenceSource)
+    assert open_frame_source(str(image_dir), fps=7).fps == 7
+    assert isinstance(open_frame_source(str(video_path), realtime=False), VideoFileSource)
+    assert open_frame_source(str(image_dir / "notes.txt")) is None
+    assert open_frame_source(str(tmp_path / "missing.mp4")) is None
+
+
+def test_open_capture_rejects_unopenable_source(tmp_path):
+    empty_dir = tmp_path / "empty"
+    empty_dir.mkdir()
+    assert open_capture(str(empty_dir)) is None
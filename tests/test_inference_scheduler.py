@@ -0,0 +1,69 @@
+from app.detector.InferenceScheduler import InferenceScheduler
+
+
+def run(scheduler, rounds):
+    """每轮所有摄像头都放入新画面，返回每批推理的摄像头ID"""
+    batches = []
+    for _ in range(rounds):
+        for i in range(scheduler.camera_count):
+            scheduler.offer(i, None, 0.0)
+        batches.append(scheduler.next_batch()[0])
+    return batches
+
+
+def test_fair_policy_round_robins():
+    scheduler = InferenceScheduler(3, "fair", max_batch=1)
+    assert run(scheduler, 6) == [[0], [1], [2], [0], [1], [2]]
+    assert scheduler.scheduled == [2, 2, 2]
+
+
+def test_priority_policy_shares_by_weight():
+    scheduler = InferenceScheduler(2, "priority", priorities=[3, 1], max_batch=1)
+    run(scheduler, 40)
+    assert scheduler.scheduled == [30, 10]
+
+
+def test_priorities_are_ignored_by_fair_policy():
+    scheduler = InferenceScheduler(2, "fair", priorities=[3, 1], max_batch=1)
+    run(scheduler, 10)
+    assert scheduler.scheduled == [5, 5]
+
+
+def test_earlier_deadline_breaks_ties():
+    scheduler = InferenceScheduler(2, deadlines=[1.0, 0.2], max_batch=1)
+    scheduler.offer(0, None, 0.0)
+    scheduler.offer(1, None, 0.0)
+    assert scheduler.next_batch()[0] == [1]
+
+
+def test_idle_camera_does_not_monopolize():
+    scheduler = InferenceScheduler(2, max_batch=1)
+    for _ in range(5):
+        scheduler.offer(0, None, 0.0)
+        scheduler.next_batch()
+    # 摄像头1空闲期间没有积累虚拟时间差，重新出现后与摄像头0轮流推理
+    assert run(scheduler, 4) == [[1], [0], [1], [0]]
+
+
+def test_batch_respects_max_batch_and_exclude():
+    scheduler = InferenceScheduler(4, max_batch=2)
+    for i in range(4):
+        scheduler.offer(i, f"frame{i}", float(i))
+    camera_ids, frames, timestamps = scheduler.next_batch(exclude={0})
+    assert camera_ids == [1, 2]
+    assert frames == ["frame1", "frame2"]
+    assert timestamps == [1.0, 2.0]
+    assert scheduler.next_batch()[0] == [0, 3]
+    assert scheduler.next_batch() == ([], [], [])
+
+
+def test_replace_and_expire():
+    scheduler = InferenceScheduler(2, deadlines=[0.5, None])
+    scheduler.offer(0, "old", 0.0)
+    scheduler.offer(0, "new", 0.1)
+    scheduler.offer(1, "frame", 0.0)
+    assert scheduler.replaced == [1, 0]
+
+    assert scheduler.expire(1.0) == [0]
+    assert scheduler.dropped(0) == 2
+    assert scheduler.next_batch()[1] == ["frame"]
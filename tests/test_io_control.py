@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+from app.utils import io_control
+from app.utils.io_control import IOController, LoopbackDevice
+
+
+class FlakyDevice(LoopbackDevice):
+    """前fail_open次打开、前fail_low次拉低、前fail_high次恢复都抛出异常的回环设备"""
+
+    def __init__(self, fail_open=0, fail_low=0, fail_high=0):
+        super().__init__()
+        self.fail_open = fail_open
+        self.fail_low = fail_low
+        self.fail_high = fail_high
+
+    def open(self):
+        if self.fail_open:
+            self.fail_open -= 1
+            raise OSError("设备未连接")
+        super().open()
+
+    def set_low(self):
+        if self.fail_low:
+            self.fail_low -= 1
+            raise OSError("写入失败")
+        super().set_low()
+
+    def set_high(self):
+        if self.fail_high:
+            self.fail_high -= 1
+            raise OSError("写入失败")
+        super().set_high()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture
+def start_controller():
+    controllers = []
+
+    def start(device, pulse_duration=0.05):
+        controller = IOController(device, pulse_duration=pulse_duration)
+        controller.start()
+        assert wait_until(lambda: device.opened or controller.error_count)
+        controllers.append(controller)
+        return controller
+
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def levels(device):
+    return [level for _, level in device.events]
+
+
+def test_pulse_holds_low_for_pulse_duration(start_controller):
+    device = LoopbackDevice()
+    controller = start_controller(device, pulse_duration=0.05)
+
+    controller.trigger(camera=1)
+
+    assert wait_until(lambda: len(device.events) == 2)
+    (low_time, low), (high_time, high) = device.events
+    assert (low, high) == (0, 1)
+    assert 0.05 <= high_time - low_time < 0.15
+    assert controller.trigger_count == 1
+    assert len(controller.latencies) == 1
+
+
+def test_retrigger_while_low_extends_the_pulse(start_controller):
+    device = LoopbackDevice()
+    controller = start_controller(device, pulse_duration=0.1)
+
+    controller.trigger()
+    assert wait_until(lambda: device.level == 0)
+    time.sleep(0.06)
+    controller.trigger()
+
+    assert wait_until(lambda: len(device.events) == 2)
+    assert levels(device) == [0, 1]
+    low_time, high_time = device.events[0][0], device.events[1][0]
+    assert high_time - low_time >= 0.16
+    assert controller.trigger_count == 2
+    assert len(controller.latencies) == 2
+
+
+def test_failed_write_is_kept_pending_and_sent_after_reconnect(start_controller):
+    device = FlakyDevice(fail_low=1)
+    controller = start_controller(device)
+
+    controller.trigger()
+
+    assert wait_until(lambda: len(device.events) == 2)
+    assert levels(device) == [0, 1]
+    assert controller.error_count == 1
+    assert controller.lost_count == 0
+    assert controller.latencies[0] >= io_control.WRITE_RETRY_INTERVAL
+
+
+def test_trigger_waits_for_device_to_open(monkeypatch, start_controller):
+    monkeypatch.setattr(io_control, "OPEN_RETRY_INTERVAL", 0.05)
+    device = FlakyDevice(fail_open=2)
+    controller = start_controller(device)
+
+    controller.trigger()
+    controller.trigger()
+
+    assert wait_until(lambda: len(device.events) == 2)
+    # 设备恢复前的两次触发合并为一个脉冲
+    assert levels(device) == [0, 1]
+    assert controller.trigger_count == 2
+    assert controller.error_count == 2
+    assert len(controller.latencies) == 1
+
+
+def test_failed_restore_is_retried(start_controller):
+    device = FlakyDevice(fail_high=1)
+    controller = start_controller(device)
+
+    controller.trigger()
+
+    assert wait_until(lambda: len(device.events) == 2)
+    assert levels(device) == [0, 1]
+    assert controller.error_count == 1
+
+
+def test_trigger_is_lost_after_pending_timeout(monkeypatch, start_controller):
+    monkeypatch.setattr(io_control, "PENDING_TIMEOUT", 0.1)
+    monkeypatch.setattr(io_control, "WRITE_RETRY_INTERVAL", 0.02)
+    device = FlakyDevice(fail_low=1000)
+    controller = start_controller(device)
+
+    controller.trigger()
+
+    assert wait_until(lambda: controller.lost_count == 1)
+    assert levels(device) == []
+    stats = controller.latency_stats()
+    assert stats["count"] == 0
+    assert stats["lost"] == 1
+    assert stats["p95"] is None
+
+
+def test_latency_stats():
+    controller = IOController(LoopbackDevice())
+    assert controller.latency_stats() is None
+
+    controller.latencies.extend(i / 1000 for i in range(1, 101))
+    stats = controller.latency_stats()
+
+    assert stats["count"] == 100
+    assert stats["lost"] == 0
+    assert stats["mean"] == pytest.approx(50.5)
+    assert stats["p50"] == pytest.approx(51)
+    assert stats["p95"] == pytest.approx(96)
+    assert stats["max"] == pytest.approx(100)
@@ -0,0 +1,50 @@
+import time
+from app.detector.LatencyController import LatencyController
+
+
+def feed(controller, latency):
+    """送入一个统计窗口的延迟，返回最后一次observe()的结果"""
+    change = None
+    for _ in range(controller.window):
+        change = controller.observe(latency, time.time())
+    return change
+
+
+def test_imgsz_is_rounded_and_clamped():
+    controller = LatencyController(0.1, 650, min_imgsz=300, max_imgsz=1000)
+    assert (controller.min_imgsz, controller.imgsz, controller.max_imgsz) == (288, 640, 992)
+
+
+def test_shrinks_imgsz_before_batch():
+    controller = LatencyController(0.1, 640, min_imgsz=416, batch=2, min_batch=1, window=5)
+    change = feed(controller, 0.4)
+    assert change["imgsz"] == (640, 512)  # 每次最多缩小到1/1.25
+    assert change["batch"] == (2, 2)
+
+    assert feed(controller, 0.4)["imgsz"] == (512, 416)
+    change = feed(controller, 0.4)
+    assert change["batch"] == (2, 1)
+    assert feed(controller, 0.4) is None  # 已到下限
+
+
+def test_restores_batch_before_imgsz():
+    controller = LatencyController(0.1, 320, max_imgsz=416, batch=2, min_batch=1, window=5)
+    controller.batch = 1
+    assert feed(controller, 0.01)["batch"] == (1, 2)
+    assert feed(controller, 0.01)["imgsz"] == (320, 384)
+    assert feed(controller, 0.01)["imgsz"] == (384, 416)
+    assert feed(controller, 0.01) is None
+
+
+def test_holds_within_headroom():
+    controller = LatencyController(0.1, 640, window=5)
+    assert feed(controller, 0.08) is None
+    assert controller.imgsz == 640
+
+
+def test_ignores_frames_captured_before_change():
+    controller = LatencyController(0.1, 640, window=5)
+    captured = time.time()
+    feed(controller, 0.5)
+    assert controller.observe(0.5, captured) is None
+    assert controller.samples == []
@@ -0,0 +1,114 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.utils.metrics import (BUCKETS, METRIC_NAME, WINDOW_METRIC_NAME, MetricsRegistry, MetricsServer,
+                               escape_label, quantile, record_batch)
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name + "{") or line.startswith(name + "_")]
+
+
+def test_empty_registry():
+    registry = MetricsRegistry()
+    assert registry.summary() == {}
+    assert registry.render_prometheus().splitlines() == [
+        f"# HELP {METRIC_NAME} Per-stage pipeline latency.",
+        f"# TYPE {METRIC_NAME} histogram",
+        f"# HELP {WINDOW_METRIC_NAME} Per-stage latency quantiles over the last 60 seconds.",
+        f"# TYPE {WINDOW_METRIC_NAME} gauge",
+    ]
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    for seconds in (0.002, 0.02, 0.02, 3.0, 20.0):
+        registry.observe("inference", 1, seconds)
+    text = registry.render_prometheus()
+
+    assert text.endswith("\n")
+    lines = sample_lines(text, METRIC_NAME)
+    labels = 'stage="inference",camera="1"'
+    buckets = {line.split('le="')[1].split('"')[0]: int(line.split()[-1])
+               for line in lines if line.startswith(f"{METRIC_NAME}_bucket{{{labels},")}
+    # 分桶计数是累计的，超出最大桶上限的样本只计入+Inf
+    assert list(buckets) == [f"{bound:g}" for bound in BUCKETS] + ["+Inf"]
+    assert buckets["0.001"] == 0
+    assert buckets["0.0025"] == 1
+    assert buckets["0.025"] == 3
+    assert buckets["5"] == 4
+    assert buckets["10"] == 4
+    assert buckets["+Inf"] == 5
+    assert f"{METRIC_NAME}_sum{{{labels}}} 23.042000" in lines
+    assert f"{METRIC_NAME}_count{{{labels}}} 5" in lines
+
+
+def test_window_quantiles():
+    registry = MetricsRegistry()
+    for i in range(1, 101):
+        registry.observe("end_to_end", "all", i / 1000)
+    lines = sample_lines(registry.render_prometheus(), WINDOW_METRIC_NAME)
+
+    assert lines == [
+        f'{WINDOW_METRIC_NAME}{{stage="end_to_end",camera="all",quantile="0.5"}} 0.051000',
+        f'{WINDOW_METRIC_NAME}{{stage="end_to_end",camera="all",quantile="0.95"}} 0.096000',
+        f'{WINDOW_METRIC_NAME}{{stage="end_to_end",camera="all",quantile="0.99"}} 0.100000',
+    ]
+    assert registry.summary()[("end_to_end", "all")] == {"count": 100, "p50": 0.051, "p95": 0.096, "max": 0.1}
+    assert quantile([], 0.5) is None
+
+
+def test_label_values_are_escaped():
+    assert escape_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+    registry = MetricsRegistry()
+    registry.observe('odd"stage', "cam\\1", 0.01)
+    text = registry.render_prometheus()
+    assert f'{METRIC_NAME}_count{{stage="odd\\"stage",camera="cam\\\\1"}} 1' in text
+
+
+def test_summary_is_in_pipeline_order_and_filters_camera():
+    registry = MetricsRegistry()
+    registry.observe("render", 2, 0.01)
+    registry.observe("inference", 1, 0.05)
+    registry.observe("capture", 1, 0.001)
+    with registry.timer("track", 1):
+        pass
+
+    assert list(registry.summary()) == [("capture", "1"), ("inference", "1"), ("track", "1"), ("render", "2")]
+    assert list(registry.summary(camera=2)) == [("render", "2")]
+
+
+def test_record_batch_adds_overhead_to_postprocess():
+    registry = MetricsRegistry()
+    speeds = [{"preprocess": 2.0, "inference": 10.0, "postprocess": 1.0},
+              {"preprocess": 2.0, "inference": 10.0, "postprocess": None}]
+    record_batch(registry, [0, 3], speeds, elapsed=0.05)
+
+    summary = registry.summary()
+    assert set(summary) == {(stage, camera) for stage in ("preprocess", "inference", "postprocess")
+                            for camera in ("1", "4")}
+    assert summary[("preprocess", "1")]["max"] == pytest.approx(0.004)
+    assert summary[("inference", "4")]["max"] == pytest.approx(0.02)
+    # 批次总耗时中未被ultralytics计入的部分算作后处理
+    assert summary[("postprocess", "1")]["max"] == pytest.approx(0.026)
+
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.observe("signal", "all", 0.003)
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        with urllib.request.urlopen(server.address, timeout=5) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert response.read().decode("utf-8") == registry.render_prometheus()
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(server.address.replace("/metrics", "/other"), timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.stop()
@@ -0,0 +1,105 @@
+import json
+import os
+import pytest
+from predict_images import ResultManifest
+from app.utils.model_export import file_sha256
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "input" / "chain.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"image data")
+    return path
+
+
+def make_record(img_path, boxes=()):
+    """按detect_batch的格式生成清单记录"""
+    stat = os.stat(img_path)
+    return {
+        "file": os.path.basename(img_path),
+        "sha256": file_sha256(img_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "model": "model-hash",
+        "conf": 0.25,
+        "annotated": True,
+        "crops": False,
+        "detection_time": 1.0,
+        "boxes": [list(box) for box in boxes],
+        "labels": ["crack"] * len(boxes),
+        "confidences": [0.9] * len(boxes),
+    }
+
+
+def write_manifest(output_dir, record):
+    manifest = ResultManifest(str(output_dir))
+    manifest.open()
+    manifest.add(record)
+    manifest.close()
+    (output_dir / f"annotated_{record['file']}").write_bytes(b"annotated")
+
+
+def test_resume_skips_unchanged_image(tmp_path, image):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    write_manifest(output_dir, make_record(image))
+
+    manifest = ResultManifest(str(output_dir))
+    assert manifest.is_current(str(image), "model-hash", 0.25, True, False)
+    assert not manifest.is_current(str(image), "other-model", 0.25, True, False)
+    assert not manifest.is_current(str(image), "model-hash", 0.5, True, False)
+    assert not manifest.is_current(str(image), "model-hash", 0.25, True, True)  # 上次没有保存裁剪区域
+
+
+def test_resume_ignores_partial_line(tmp_path, image):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    write_manifest(output_dir, make_record(image))
+    with open(output_dir / ResultManifest.FILENAME, "a", encoding="utf-8") as f:
+        f.write(json.dumps(make_record(image))[:20])  # 中断时写了一半的行
+
+    manifest = ResultManifest(str(output_dir))
+    assert list(manifest.records) == ["chain.jpg"]
+    assert manifest.is_current(str(image), "model-hash", 0.25, True, False)
+
+
+def test_missing_outputs_are_reprocessed(tmp_path, image):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    write_manifest(output_dir, make_record(image, boxes=[(1, 2, 3, 4)]))
+    manifest = ResultManifest(str(output_dir))
+
+    os.remove(output_dir / "annotated_chain.jpg")
+    assert not manifest.is_current(str(image), "model-hash", 0.25, True, False)
+    assert manifest.is_current(str(image), "model-hash", 0.25, False, False)
+
+
+def test_crops_must_exist_for_boxes(tmp_path, image):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    record = dict(make_record(image, boxes=[(1, 2, 3, 4)]), crops=True)
+    write_manifest(output_dir, record)
+    manifest = ResultManifest(str(output_dir))
+    assert not manifest.is_current(str(image), "model-hash", 0.25, True, True)
+
+    crops_dir = output_dir / "crops" / "chain"
+    crops_dir.mkdir(parents=True)
+    (crops_dir / "crack_0.90_0.jpg").write_bytes(b"crop")
+    assert manifest.is_current(str(image), "model-hash", 0.25, True, True)
+
+
+def test_touched_image_is_compared_by_content(tmp_path, image):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    write_manifest(output_dir, make_record(image))
+    manifest = ResultManifest(str(output_dir))
+
+    # 只改修改时间，内容相同时仍然跳过，并更新记录中的文件信息
+    stat = os.stat(image)
+    os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.is_current(str(image), "model-hash", 0.25, True, False)
+    assert manifest.records["chain.jpg"]["mtime"] == os.stat(image).st_mtime_ns
+
+    image.write_bytes(b"new image data")
+    assert not manifest.is_current(str(image), "model-hash", 0.25, True, False)
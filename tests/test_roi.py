@@ -0,0 +1,33 @@
+import json
+import numpy as np
+import pytest
+from app.utils.roi import crop_roi, load_roi_config, parse_roi, roi_to_pixels
+
+
+def test_roi_to_pixels():
+    assert roi_to_pixels(None, (100, 200, 3)) == (0, 0, 200, 100)
+    assert roi_to_pixels((0.25, 0.5, 0.75, 1.0), (100, 200, 3)) == (50, 50, 150, 100)
+    # 很小的ROI至少保留1个像素
+    assert roi_to_pixels((0.5, 0.5, 0.501, 0.501), (100, 200, 3)) == (100, 50, 101, 51)
+
+
+def test_crop_roi_is_view_with_offset():
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    crop, offset = crop_roi(frame, (0.25, 0.5, 0.75, 1.0))
+    assert crop.shape == (50, 100, 3)
+    assert offset == (50, 50)
+    assert np.shares_memory(crop, frame)
+    assert crop_roi(frame, None) == (frame, (0, 0))
+
+
+def test_parse_roi():
+    assert parse_roi([0, "0.2", 1, 0.8], 0) == (0.0, 0.2, 1.0, 0.8)
+    with pytest.raises(ValueError, match="摄像头2"):
+        parse_roi([0.5, 0, 0.2, 1], 1)
+
+
+def test_load_roi_config(tmp_path):
+    path = tmp_path / "roi.json"
+    path.write_text(json.dumps({"0": [0, 0.3, 1, 0.7], "5": [0, 0, 1, 1]}), encoding="utf-8")
+    assert load_roi_config(str(path), 2) == [(0.0, 0.3, 1.0, 0.7), None]
+    assert load_roi_config(str(tmp_path / "missing.json"), 2) == [None, None]
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from app.utils.shm_inference import InferenceProcessPool, SharedFrameRing, fit_frame
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(2, (4, 4, 3))
+    yield ring
+    ring.close()
+
+
+@pytest.fixture
+def pool():
+    # 不调用start()，只测试主进程中的共享内存槽位管理
+    pool = InferenceProcessPool({}, processes=1, max_batch=2, max_shape=(8, 8, 3))
+    yield pool
+    pool.close()
+
+
+def test_ring_put_and_release(ring):
+    frame = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+    slot, shape = ring.put(frame)
+    assert shape == frame.shape
+    np.testing.assert_array_equal(ring.view(slot, shape), frame)
+
+    assert ring.put(frame) is not None
+    assert ring.put(frame) is None  # 槽位已用完
+
+    ring.release(slot)
+    assert ring.put(frame)[0] == slot
+
+
+def test_ring_rejects_oversized_frame(ring):
+    with pytest.raises(ValueError):
+        ring.put(np.zeros((5, 5, 3), dtype=np.uint8))
+    assert len(ring.free) == 2
+
+
+def test_ring_releases_slot_when_copy_fails(ring):
+    # 字节数未超过槽位但形状与图像不一致，复制失败
+    with pytest.raises(ValueError):
+        ring.put(np.zeros((4, 4, 3), dtype=np.float16)[:, :, :2])
+    assert len(ring.free) == 2
+
+
+def test_fit_frame_downscales_to_slot():
+    frame = np.zeros((40, 80, 3), dtype=np.uint8)
+    small, scale = fit_frame(frame, 8 * 8 * 3)
+    assert small.nbytes <= 8 * 8 * 3
+    assert scale == pytest.approx(small.shape[1] / 80)
+
+    same, scale = fit_frame(frame, frame.nbytes)
+    assert same is frame and scale == 1.0
+
+
+def test_submit_releases_slots_when_ring_is_full(pool):
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    pool.submit([frame])
+    assert len(pool.ring.free) == 1
+
+    # 第二张图像没有空闲槽位，本批次已占用的槽位要全部归还
+    with pytest.raises(RuntimeError):
+        pool.submit([frame, frame])
+    assert len(pool.ring.free) == 1
+
+
+def test_submit_releases_slots_when_copy_fails(pool, monkeypatch):
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    put = pool.ring.put
+    calls = []
+
+    def failing_put(image):
+        calls.append(image)
+        if len(calls) == 2:
+            raise ValueError("copy failed")
+        return put(image)
+
+    monkeypatch.setattr(pool.ring, "put", failing_put)
+    with pytest.raises(ValueError):
+        pool.submit([frame, frame])
+    assert len(pool.ring.free) == 2
+    assert pool.jobs == {}
+
+
+def test_submit_downscales_oversized_frame(pool):
+    job_id = pool.submit([np.zeros((16, 32, 3), dtype=np.uint8)])
+    _, slots, _, _ = pool.tasks.get(timeout=5)
+    (slot, shape, scale), = slots
+    assert np.prod(shape) <= pool.ring.slot_bytes
+    assert scale < 1.0
+    assert pool.jobs[job_id] == [slot]
+
+
+def test_get_result_returns_slots(pool):
+    job_id = pool.submit([np.zeros((8, 8, 3), dtype=np.uint8)] * 2)
+    assert not pool.ring.free
+    pool.results.put(("result", job_id, [], [], 0.0))
+    assert pool.get_result(timeout=5)[1] == job_id
+    assert len(pool.ring.free) == 2
+
+
+class ExitedProcess:
+    """代替已意外退出的检测进程"""
+    exitcode = -9
+
+    def is_alive(self):
+        return False
+
+
+def test_dead_worker_fails_its_job_and_restarts(pool, monkeypatch):
+    restarted = []
+    monkeypatch.setattr(pool, "_start_worker", lambda index: (restarted.append(index),
+                                                              pool.workers.__setitem__(index, None)))
+    pool.workers = [ExitedProcess()]
+    job_id = pool.submit([np.zeros((8, 8, 3), dtype=np.uint8)] * 2)
+    pool.current_jobs[0] = job_id  # 检测进程取到任务后退出
+
+    message = pool.get_result(timeout=5)
+    assert message[:2] == ("error", job_id)
+    assert "-9" in message[2]
+    assert len(pool.ring.free) == 2
+    assert restarted == [0]
+    assert pool.get_result(timeout=0) is None
+
+
+def test_late_result_of_failed_job_is_dropped(pool):
+    pool.workers = [ExitedProcess()]
+    pool.restarts = [pool.MAX_RESTARTS]
+    job_id = pool.submit([np.zeros((8, 8, 3), dtype=np.uint8)])
+    pool.current_jobs[0] = job_id
+    assert pool.get_result(timeout=5)[0] == "error"
+
+    # 进程退出前发出的结果晚到时不再返回，槽位也不会被重复归还
+    pool.results.put(("result", job_id, [], [], 0.0))
+    assert pool.get_result(timeout=1) is None
+    assert len(pool.ring.free) == 2
+
+
+def test_submit_fails_when_no_worker_is_left(pool):
+    pool.workers = [ExitedProcess()]
+    pool.restarts = [pool.MAX_RESTARTS]
+    assert pool.get_result(timeout=0) is None
+    assert pool.workers == [None]
+    with pytest.raises(RuntimeError):
+        pool.submit([np.zeros((8, 8, 3), dtype=np.uint8)])
+    assert len(pool.ring.free) == 2
@@ -0,0 +1,42 @@
+import numpy as np
+from app.utils.tiling import make_tiles, predict_tiled, tile_origins
+from conftest import blob_frame
+
+
+def test_tile_origins_cover_image():
+    assert tile_origins(500, 640, 0.2) == [0]
+    assert tile_origins(1000, 640, 0.2) == [0, 360]
+    origins = tile_origins(2000, 640, 0.25)
+    assert origins[-1] == 2000 - 640
+    assert all(b - a <= 480 for a, b in zip(origins, origins[1:]))
+
+
+def test_make_tiles_are_views():
+    image = np.zeros((100, 180, 3), dtype=np.uint8)
+    tiles = make_tiles(image, tile_size=100, overlap=0.5)
+    assert [offset for _, offset in tiles] == [(0, 0), (50, 0), (80, 0)]
+    assert all(tile.shape == (100, 100, 3) and np.shares_memory(tile, image) for tile, _ in tiles)
+
+
+def test_predict_tiled_merges_overlapping_tiles(blob_model):
+    image = blob_frame((55, 10, 75, 40), shape=(100, 180, 3))  # 同时位于前两个切片中
+    blank = np.zeros((100, 100, 3), dtype=np.uint8)
+
+    merged, empty = predict_tiled(blob_model, [image, blank], tile_size=100, overlap=0.5, conf=0.3)
+    assert len(blob_model.calls) == 1  # 两张图的全部切片作为一个批次推理
+    assert len(blob_model.calls[0][0]) == 4
+    assert blob_model.calls[0][1] == {"conf": 0.3}
+    np.testing.assert_allclose(merged.boxes.data.numpy(), [[55, 10, 75, 40, 0.9, 0]])
+    assert merged.orig_img is image
+    assert merged.speed["inference"] == 6.0  # 三个切片的耗时之和
+    assert len(empty.boxes) == 0
+    assert empty.speed["inference"] == 2.0
+
+
+def test_predict_tiled_merge_iou_threshold(blob_model):
+    # 跨越切片边界的缺陷在各切片中被截断成不同的框，IoU阈值决定哪些框合并
+    image = blob_frame((40, 10, 110, 40), shape=(100, 180, 3))
+    [loose] = predict_tiled(blob_model, [image], tile_size=100, overlap=0.5, iou_threshold=0.3)
+    [strict] = predict_tiled(blob_model, [image], tile_size=100, overlap=0.5, iou_threshold=0.9)
+    assert len(loose.boxes) == 2
+    assert len(strict.boxes) == 3
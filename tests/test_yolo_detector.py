@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import app.detector.YoloDetector as yolo_detector
+from app.detector.YoloDetector import YoloDetector
+from conftest import blob_frame
+
+
+@pytest.fixture
+def detector(blob_model, monkeypatch):
+    monkeypatch.setattr(yolo_detector, "load_model", lambda *args, **kwargs: (blob_model, "torch"))
+    return YoloDetector("stub.pt", conf_threshold=0.4, imgsz=320)
+
+
+def boxes(result):
+    return result.boxes.xyxy.numpy().tolist()
+
+
+def test_batch_is_one_forward_pass_in_input_order(detector, blob_model):
+    frames = [blob_frame((10, 10, 20, 20)), blob_frame((30, 40, 50, 60)), blob_frame((0, 0, 5, 5))]
+    results = detector.detect_batch(frames)
+
+    assert len(blob_model.calls) == 1
+    images, predict_args = blob_model.calls[0]
+    assert len(images) == 3
+    assert predict_args["conf"] == 0.4 and predict_args["imgsz"] == 320
+    assert [boxes(result) for result in results] == [[[10, 10, 20, 20]], [[30, 40, 50, 60]], [[0, 0, 5, 5]]]
+    assert detector.last_results is results[-1]
+
+
+def test_roi_boxes_are_mapped_back_to_full_frame(detector, blob_model):
+    frames = [blob_frame((120, 60, 140, 80)), blob_frame((120, 60, 140, 80))]
+    results = detector.detect_batch(frames, [(0.5, 0.5, 1.0, 1.0), None])
+
+    images, _ = blob_model.calls[0]
+    assert images[0].shape == (50, 100, 3)  # 只把ROI送入模型
+    assert images[1].shape == (100, 200, 3)
+    assert boxes(results[0]) == [[120, 60, 140, 80]]
+    assert boxes(results[1]) == [[120, 60, 140, 80]]
+    assert results[0].orig_img is frames[0]
+    np.testing.assert_allclose(YoloDetector.to_detections(results[0]), [[120, 60, 140, 80, 0.9, 0]], rtol=1e-6)
+
+
+def test_empty_batch_skips_the_model(detector, blob_model):
+    assert detector.detect_batch([]) == []
+    assert blob_model.calls == []
+
+
+def test_detect_and_empty_detections(detector):
+    result = detector.detect(np.zeros((100, 200, 3), dtype=np.uint8), (0.0, 0.0, 0.5, 0.5))
+    assert len(result.boxes) == 0
+    assert YoloDetector.to_detections(result).shape == (0, 6)
+    assert YoloDetector.to_detections(None).shape == (0, 6)
+
+
+def test_tiled_detection_passes_merge_iou_and_imgsz(blob_model, monkeypatch):
+    monkeypatch.setattr(yolo_detector, "load_model", lambda *args, **kwargs: (blob_model, "torch"))
+    calls = []
+
+    def predict_tiled(model, images, *args, **kwargs):
+        calls.append((args, kwargs))
+        return model(list(images))
+
+    monkeypatch.setattr(yolo_detector, "predict_tiled", predict_tiled)
+    detector = YoloDetector("stub.pt", imgsz=320, tile_size=100, tile_overlap=0.25, tile_iou=0.7)
+    detector.detect_batch([blob_frame((10, 10, 20, 20))])
+
+    [(args, kwargs)] = calls
+    assert args == (100, 0.25, 0.7)
+    assert kwargs["imgsz"] == 320